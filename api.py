@@ -0,0 +1,308 @@
+import argparse
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from data_access import dataset_version, get_backend, source_signature
+from models import ModelRegistry
+from result_cache import SingleFlightCache
+from utils import calc_fairness_metrics, detect_outliers, forecast_measures, load_data, pred_errors_ready, shared_pred_errors
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+MAX_FORECAST_PERIODS = 24
+# Every date in a response, e.g. a month as 2024-03-01
+DATE_FORMAT = '%Y-%m-%d'
+# How often a request may stat the source files to notice new data
+RELOAD_CHECK_SECONDS = 5.0
+CACHE_MAX_AGE = 60
+
+class ApiState:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self.signature = None
+        self.registry = ModelRegistry(compact=True)
+        self.responses = SingleFlightCache(max_entries=2048)
+        self.measure_forecasts = SingleFlightCache(max_entries=8)
+        self.background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="api-fit")
+        self._pending = set()
+        self._load()
+
+    def _load(self):
+        self.signature = source_signature()
+        self.df, self.data_type = load_data()
+        self.version = dataset_version(self.df)
+        self.backend = get_backend(self.df)
+        self._store = None
+
+    def refresh(self):
+        with self._lock:
+            if time.monotonic() - self._checked < RELOAD_CHECK_SECONDS:
+                return
+            self._checked = time.monotonic()
+            if source_signature() != self.signature:
+                self._load()
+
+    @property
+    def store(self):
+        if self._store is None:
+            from series_store import open_series_matrix
+            self._store = open_series_matrix(self.df)
+        return self._store
+
+    def schedule(self, key, job):
+        # Work that is too slow for the request path runs once in the background;
+        # callers get 202 until it is cached
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+
+        def run():
+            try:
+                job()
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+        self.background.submit(run)
+
+state = None
+
+class PendingError(Exception):
+    pass
+
+def to_records(df):
+    dates = df.select_dtypes(include=['datetime', 'datetimetz']).columns
+    if len(dates):
+        df = df.assign(**{column: df[column].dt.strftime(DATE_FORMAT) for column in dates})
+    return json.loads(df.to_json(orient='records'))
+
+def etag_for(request):
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.items()))
+    digest = hashlib.sha1(f"{request.url.path}?{query}".encode()).hexdigest()[:12]
+    return f'"{state.version}-{digest}"'
+
+def int_param(request, name, default, low, high):
+    # Clamped to [low, high]; anything that is not a whole number is a 400
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a whole number, got '{value}'.") from None
+    return min(max(value, low), high)
+
+def alpha_param(request, default=0.05):
+    value = request.query_params.get('alpha')
+    if value is None:
+        return default
+    try:
+        alpha = float(value)
+    except ValueError:
+        raise ValueError(f"alpha must be a number, got '{value}'.") from None
+    if not 0 < alpha < 1:
+        raise ValueError(f"alpha must be between 0 and 1, got {value}.")
+    return alpha
+
+def error_response(e, status_code=400):
+    return JSONResponse({'error': str(e.args[0]) if e.args else type(e).__name__}, status_code=status_code)
+
+def paginate(records, request):
+    page = int_param(request, 'page', 1, 1, 10 ** 9)
+    page_size = int_param(request, 'page_size', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+    start = (page - 1) * page_size
+    return {
+        'items': records[start:start + page_size],
+        'page': page,
+        'page_size': page_size,
+        'total': len(records),
+        'next_page': page + 1 if start + page_size < len(records) else None
+    }
+
+def cached_endpoint(compute, paged=False):
+    # Bodies are cached per dataset version, path and query, and served with an
+    # ETag so unchanged results cost clients a 304
+    async def endpoint(request):
+        await run_in_threadpool(state.refresh)
+        etag = etag_for(request)
+        headers = {'ETag': etag, 'Cache-Control': f'max-age={CACHE_MAX_AGE}', 'X-Dataset-Version': state.version}
+        if request.headers.get('if-none-match') == etag:
+            return Response(status_code=304, headers=headers)
+        
+        try:
+            payload = await run_in_threadpool(state.responses.get_or_compute, (state.version, etag), lambda: compute(request))
+        except PendingError as e:
+            # Errors are not cached, so the next request checks again
+            return JSONResponse({'status': 'pending', 'detail': str(e)}, status_code=202, headers={'Retry-After': '5'})
+        except KeyError as e:
+            # A well-formed request for a series or group that does not exist
+            return error_response(e, 404)
+        except ValueError as e:
+            return error_response(e)
+        
+        if paged and request.query_params.get('format') == 'ndjson':
+            # Streams every record, one JSON object per line, without paging
+            async def lines():
+                for record in payload:
+                    yield json.dumps(record) + "\n"
+            return StreamingResponse(lines(), media_type='application/x-ndjson', headers=headers)
+        try:
+            body = paginate(payload, request) if paged else payload
+        except ValueError as e:
+            return error_response(e)
+        return JSONResponse(body, headers=headers)
+    return endpoint
+
+def date_range(request):
+    start = request.query_params.get('start')
+    end = request.query_params.get('end')
+    return (pd.Timestamp(start) if start else None), (pd.Timestamp(end) if end else None)
+
+def version_info(request):
+    return {
+        'version': state.version,
+        'data_type': state.data_type,
+        'months': [state.df['YEAR_MONTH'].min().strftime(DATE_FORMAT), state.df['YEAR_MONTH'].max().strftime(DATE_FORMAT)],
+        'rows': len(state.df)
+    }
+
+def region_aggregates(request):
+    start, end = date_range(request)
+    totals = state.backend.region_totals(start, end)
+    return to_records(totals.rename('TOTAL_COST').reset_index())
+
+def monthly_aggregates(request):
+    start, end = date_range(request)
+    region = request.query_params.get('region')
+    categories = [request.query_params['category']] if 'category' in request.query_params else None
+    if request.query_params.get('measures') == 'all':
+        return to_records(state.backend.monthly_measure_totals(region, categories, start, end))
+    return to_records(state.backend.monthly_totals(region, categories, start, end))
+
+def series_list(request):
+    return [{'REGIONAL_OFFICE_NAME': region, 'BNF_CHAPTER_PLUS_CODE': bnf_code} for region, bnf_code in state.store.keys]
+
+def series_forecast(request):
+    if 'region' not in request.query_params or 'category' not in request.query_params:
+        raise ValueError("Both region and category are required.")
+    key = (request.query_params['region'], request.query_params['category'])
+    periods = int_param(request, 'periods', 5, 1, MAX_FORECAST_PERIODS)
+    alpha = alpha_param(request)
+    if key not in state.store.key_index:
+        raise KeyError(f"Unknown series: {key[0]} / {key[1]}")
+    
+    ts_data = state.store.series(state.store.key_index[key])
+    if state.registry.peek(key, ts_data) is None:
+        state.schedule(('fit',) + key, lambda: state.registry.get(key, ts_data))
+        raise PendingError("Model is being fitted.")
+    return to_records(state.registry.get(key, ts_data).forecast(periods, alpha))
+
+def json_number(value):
+    # NaN and infinity are not valid JSON
+    return float(value) if np.isfinite(value) else None
+
+def measure_forecasts(request):
+    # One batched fit covers every series, measure and horizon up to
+    # MAX_FORECAST_PERIODS; it runs once per dataset version in the background
+    # and each request slices the months it asked for
+    periods = int_param(request, 'periods', 5, 1, MAX_FORECAST_PERIODS)
+    df, version = state.df, state.version
+    if version not in state.measure_forecasts:
+        state.schedule(('measures', version), lambda: state.measure_forecasts.get_or_compute(
+            version, lambda: forecast_measures(df, MAX_FORECAST_PERIODS)))
+        raise PendingError("Measure forecasts are being fitted.")
+    result = state.measure_forecasts.get_or_compute(version, lambda: forecast_measures(df, MAX_FORECAST_PERIODS))
+    region = request.query_params.get('region')
+    category = request.query_params.get('category')
+    
+    records = []
+    for i, (series_region, bnf_code) in enumerate(result['keys']):
+        if (region and series_region != region) or (category and bnf_code != category):
+            continue
+        for j, measure in enumerate(result['measures']):
+            for h, date in enumerate(result['dates'][:periods]):
+                records.append({
+                    'REGIONAL_OFFICE_NAME': series_region,
+                    'BNF_CHAPTER_PLUS_CODE': bnf_code,
+                    'MEASURE': measure,
+                    'YEAR_MONTH': date.strftime(DATE_FORMAT),
+                    'FORECAST': json_number(result['mean'][i, j, h]),
+                    'CONFIDENCE_LOWER': json_number(result['lower'][i, j, h]),
+                    'CONFIDENCE_UPPER': json_number(result['upper'][i, j, h])
+                })
+    return records
+
+def outlier_list(request):
+    start, end = date_range(request)
+    df = state.backend.filter_months(start, end)
+    outliers = detect_outliers(df, "Isolation Forest", 1.5, 0.1, 'regional')
+    return to_records(outliers.reset_index(drop=True)) if len(outliers) else []
+
+def fairness_metrics(request):
+    engine = request.query_params.get('engine', 'arima')
+    if engine not in ('arima', 'global'):
+        raise ValueError(f"Unknown engine: {engine}")
+    if not pred_errors_ready(state.df, engine=engine):
+        state.schedule(('fairness', engine), lambda: shared_pred_errors(state.df, engine=engine))
+        raise PendingError("Fairness backtest is running.")
+    
+    metrics = calc_fairness_metrics(shared_pred_errors(state.df, engine=engine))
+    tests = {name: (None if value is None else json_number(value)) for name, value in metrics['statistical_tests'].items()}
+    return {
+        'parity': to_records(metrics['parity_df']),
+        'parity_gap': json_number(metrics['parity_gap']),
+        'statistical_tests': tests
+    }
+
+def precompute():
+    # Fit every series and run the fairness sweep up front so requests never wait
+    for i, key in enumerate(state.store.keys):
+        try:
+            state.registry.get(key, state.store.series(i))
+        except ValueError:
+            continue
+    shared_pred_errors(state.df, engine='arima')
+
+routes = [
+    Route("/api/version", cached_endpoint(version_info)),
+    Route("/api/aggregates/regions", cached_endpoint(region_aggregates, paged=True)),
+    Route("/api/aggregates/monthly", cached_endpoint(monthly_aggregates, paged=True)),
+    Route("/api/series", cached_endpoint(series_list, paged=True)),
+    Route("/api/forecast", cached_endpoint(series_forecast)),
+    Route("/api/forecast/measures", cached_endpoint(measure_forecasts, paged=True)),
+    Route("/api/outliers", cached_endpoint(outlier_list, paged=True)),
+    Route("/api/fairness", cached_endpoint(fairness_metrics))
+]
+
+def create_app():
+    global state
+    state = ApiState()
+    return Starlette(routes=routes)
+
+def main():
+    import uvicorn
+    
+    parser = argparse.ArgumentParser(description="Serve dashboard figures as JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--precompute", action="store_true", help="Fit every series and run the fairness sweep at startup")
+    args = parser.parse_args()
+    
+    app = create_app()
+    if args.precompute:
+        state.background.submit(precompute)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,18 @@
+import time
+SCRIPT_START = time.perf_counter()
+
+import os
+import sys
+import importlib
 import streamlit as st
 from utils import load_data
+from data_access import source_signature
+from config import PAGE_MODULES
+from rendering import SHOW_RENDER_REPORT, render_report
+from profiling import profile
+from prefetch import get_prefetcher
 
-from nav.dashboard import dashboard
-from nav.forecasting import forecasting
-from nav.fairness import fairness_analysis
-from nav.outliers import outlier_analysis
-from nav.clustering import clustering_analysis
-from nav.categories import category_analysis
+SHOW_IMPORT_REPORT = os.environ.get("EPD_IMPORT_REPORT", "0") == "1"
 
 st.set_page_config(
     page_title="NHS Dashboard",
@@ -75,7 +81,7 @@ st.markdown("""
 def main():
     if 'current_page' not in st.session_state:
         st.session_state.current_page = 'dashboard'
-    df, data_type = load_and_cache_data()
+    df, data_type = load_and_cache_data(source_signature())
     
     if data_type == "real":
         st.success("Successfully loaded NHS prescription data")
@@ -84,7 +90,14 @@ def main():
     
     create_nav()
     create_sidebar()
-    route_to_page(df)
+    st.session_state['render_stats'] = {}
+    with get_prefetcher().foreground(), profile(f"page_{st.session_state.current_page}"):
+        route_to_page(df)
+
+    if SHOW_IMPORT_REPORT:
+        import_report()
+    if SHOW_RENDER_REPORT:
+        render_report()
 
 def create_nav():
     pages = {
@@ -93,7 +106,8 @@ def create_nav():
         "Fairness": "fairness",
         "Anomaly": "outliers",
         "Grouping": "clustering",
-        "Categories": "categories"
+        "Categories": "categories",
+        "Budget": "scenarios"
     }
     
     st.markdown('<div class="nav-bar">', unsafe_allow_html=True)
@@ -124,7 +138,8 @@ def create_sidebar():
         "Fairness": "fairness",
         "Anomaly": "outliers",
         "Grouping": "clustering",
-        "Categories": "categories"
+        "Categories": "categories",
+        "Budget": "scenarios"
     }
     
     current_page = st.session_state.current_page
@@ -139,34 +154,51 @@ def create_sidebar():
             st.session_state.current_page = page_key
             st.rerun()
 
-@st.cache_data
-def load_and_cache_data():
+# Keyed on the source files' size and mtime, so an edited file is reloaded;
+# one shared frame keeps its dataset version and month index across reruns
+@st.cache_resource(max_entries=1)
+def load_and_cache_data(signature):
     return load_data()
 
+def load_page(page_key):
+    module_name, function_name = PAGE_MODULES[page_key]
+    
+    # Always go through import_module: it waits while another session's
+    # thread is still executing the same module, where sys.modules would
+    # hand back a half-initialised one
+    cold = module_name not in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    if cold:
+        import_times = st.session_state.setdefault('import_times', {})
+        import_times[module_name] = time.perf_counter() - start
+    
+    return getattr(module, function_name)
+
 def route_to_page(df):
     current_page = st.session_state.current_page
     
     try:
-        if current_page == "dashboard":
-            dashboard(df)
-        elif current_page == "forecasting":
-            forecasting(df)
-        elif current_page == "fairness":
-            fairness_analysis(df)
-        elif current_page == "outliers":
-            outlier_analysis(df)
-        elif current_page == "clustering":
-            clustering_analysis(df)
-        elif current_page == "categories":
-            category_analysis(df)
+        if current_page in PAGE_MODULES:
+            load_page(current_page)(df)
         else:
             st.error(f"Unknown page: {current_page}")
-            dashboard(df)
+            load_page("dashboard")(df)
             
     except Exception as e:
         st.error(f"Error loading page '{current_page}': {str(e)}")
         st.info("Falling back to dashboard.")
-        dashboard(df)
+        load_page("dashboard")(df)
+
+def import_report():
+    render_time = time.perf_counter() - SCRIPT_START
+    import_times = st.session_state.get('import_times', {})
+    
+    with st.sidebar.expander("Import Times", expanded=True):
+        st.write(f"**Script run to first paint**: {render_time * 1000:,.0f} ms")
+        for module_name, seconds in import_times.items():
+            st.write(f"**{module_name}**: {seconds * 1000:,.0f} ms (cold import)")
+        st.caption("Only the first import in this server process is cold. Run `python import_report.py` for a per-page breakdown.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
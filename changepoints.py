@@ -0,0 +1,176 @@
+import os
+import numpy as np
+import pandas as pd
+
+from result_cache import SingleFlightCache
+
+# Shortest regime a break may leave on either side, in months
+MIN_SEGMENT = 12
+MAX_BREAKS = 3
+# BIC-style penalty per break, times log(series length). Tuned on simulated
+# trending series with no break, which it flags about 5% of the time at any slope.
+PENALTY = 4.0
+CHUNK_ROWS = 2048
+# Bumped whenever detection changes, so results cached on disk are recomputed
+DETECTOR_VERSION = 2
+
+_changepoint_cache = SingleFlightCache(max_entries=8)
+
+def _prepare(matrix):
+    # Each series loses its month-of-year profile, so seasonality is not read
+    # as regime changes. The profile is taken around a straight-line trend, so
+    # a steady rise does not leak into it. Missing months stay NaN and are left
+    # out of every estimate, so a series that starts late has no made-up run.
+    x = np.asarray(matrix, dtype=float)
+    observed = np.isfinite(x)
+    n_obs = np.maximum(observed.sum(axis=1, keepdims=True), 1)
+    t = np.where(observed, np.arange(x.shape[1], dtype=float), 0.0)
+    t_mean = t.sum(axis=1, keepdims=True) / n_obs
+    x_mean = np.where(observed, x, 0.0).sum(axis=1, keepdims=True) / n_obs
+    dt = np.where(observed, t - t_mean, 0.0)
+    sxx = (dt ** 2).sum(axis=1, keepdims=True)
+    slope = np.where(observed, dt * (x - x_mean), 0.0).sum(axis=1, keepdims=True) / np.maximum(sxx, 1.0)
+    trend = x_mean + slope * (np.arange(x.shape[1]) - t_mean)
+    residual = x - trend
+    month_of_year = np.arange(x.shape[1]) % 12
+    for m in range(min(12, x.shape[1])):
+        columns = month_of_year == m
+        seen = observed[:, columns]
+        profile = np.where(seen, residual[:, columns], 0.0).sum(axis=1, keepdims=True) / np.maximum(seen.sum(axis=1, keepdims=True), 1)
+        residual[:, columns] -= profile
+    return trend + residual
+
+def _segment_costs(sums, a, b):
+    # Gaussian cost of a straight line with its own level, slope and variance
+    # per segment, for arrays of segment bounds [a, b) taken along the month
+    # axis of the prefix sums. Sums are over observed months only. A trend
+    # that carries on unchanged costs nothing to keep in one segment, so only
+    # changes in level, slope or spread split.
+    n, t, tt, y, yy, ty = (np.take_along_axis(cs, b, axis=1) - np.take_along_axis(cs, a, axis=1) for cs in sums)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sxx = tt - t ** 2 / n
+        sxy = ty - t * y / n
+        syy = yy - y ** 2 / n
+        rss = syy - np.where(sxx > 0, sxy ** 2 / sxx, 0)
+        return np.where(n > 0, n * np.log(np.maximum(rss / n, 1e-8)), 0.0)
+
+def binary_segmentation(matrix, max_breaks=MAX_BREAKS, min_segment=MIN_SEGMENT, penalty=PENALTY):
+    # Every round splits, in every series at once, the segment with the
+    # largest cost reduction, as long as it beats the penalty. Returns a
+    # (series, month) boolean matrix, True where a new regime starts; a break
+    # always falls on an observed month and leaves min_segment observed
+    # months on either side.
+    x = _prepare(matrix)
+    n_series, n_months = x.shape
+    breaks = np.zeros((n_series, n_months), dtype=bool)
+    if n_months < 2 * min_segment:
+        return breaks
+    
+    # Standardised so one penalty and variance floor suit every series
+    observed = np.isfinite(x)
+    n_obs = np.maximum(observed.sum(axis=1, keepdims=True), 1)
+    w = observed.astype(float)
+    x = np.where(observed, x, 0.0)
+    mean = x.sum(axis=1, keepdims=True) / n_obs
+    scale = np.sqrt((w * (x - mean) ** 2).sum(axis=1, keepdims=True) / n_obs)
+    scale[scale == 0] = 1.0
+    x = w * (x - mean) / scale
+    t = w * np.arange(n_months) / n_months
+    zeros = np.zeros((n_series, 1))
+    sums = [np.hstack([zeros, np.cumsum(v, axis=1)]) for v in (w, t, t * t, x, x * x, t * x)]
+    counts = sums[0]
+    
+    positions = np.arange(n_months + 1)
+    rows = np.arange(n_series)[:, None]
+    starts_observed = np.hstack([observed, np.zeros((n_series, 1), bool)])
+    threshold = penalty * np.log(n_months)
+    for _ in range(max_breaks):
+        boundary = np.hstack([np.ones((n_series, 1), bool), breaks[:, 1:], np.ones((n_series, 1), bool)])
+        # Start and end of the segment each candidate split point falls in
+        start = np.maximum.accumulate(np.where(boundary, positions, 0), axis=1)
+        end = np.minimum.accumulate(np.where(boundary, positions, n_months)[:, ::-1], axis=1)[:, ::-1]
+        split = np.broadcast_to(positions, (n_series, n_months + 1))
+        
+        left = counts[rows, split] - counts[rows, start]
+        right = counts[rows, end] - counts[rows, split]
+        valid = (left >= min_segment) & (right >= min_segment) & ~boundary & starts_observed
+        gain = (_segment_costs(sums, start, end) - _segment_costs(sums, start, split) - _segment_costs(sums, split, end))
+        gain = np.where(valid, gain, -np.inf)
+        
+        best = gain.argmax(axis=1)
+        accept = gain[np.arange(n_series), best] > threshold
+        if not accept.any():
+            break
+        breaks[np.flatnonzero(accept), best[accept]] = True
+    return breaks
+
+def _segment_rows(task):
+    matrix, max_breaks, min_segment, penalty = task
+    return binary_segmentation(matrix, max_breaks, min_segment, penalty)
+
+def detect_changepoints(df, max_breaks=MAX_BREAKS, min_segment=MIN_SEGMENT, penalty=PENALTY, executor=None):
+    from executors import get_executor
+    from utils import build_series_matrix
+    
+    matrix, keys, months = build_series_matrix(df)
+    chunks = [(matrix[start:start + CHUNK_ROWS], max_breaks, min_segment, penalty) for start in range(0, len(matrix), CHUNK_ROWS)]
+    with get_executor(executor if len(chunks) > 1 else 'serial') as pool:
+        breaks = np.vstack(pool.map(_segment_rows, chunks)) if chunks else np.zeros((0, len(months)), bool)
+    
+    rows = []
+    for i, j in zip(*np.nonzero(breaks)):
+        region, bnf_code = keys[i]
+        values = matrix[i]
+        later = np.flatnonzero(breaks[i, j + 1:])
+        end = j + 1 + later[0] if len(later) else len(months)
+        earlier = np.flatnonzero(breaks[i, :j])
+        begin = earlier[-1] if len(earlier) else 0
+        before, after = values[begin:j], values[j:end]
+        rows.append({
+            'REGIONAL_OFFICE_NAME': region,
+            'BNF_CHAPTER_PLUS_CODE': bnf_code,
+            'BREAK_MONTH': months[j],
+            'MEAN_BEFORE': np.nanmean(before),
+            'MEAN_AFTER': np.nanmean(after),
+            'STD_BEFORE': np.nanstd(before),
+            'STD_AFTER': np.nanstd(after)
+        })
+    columns = ['REGIONAL_OFFICE_NAME', 'BNF_CHAPTER_PLUS_CODE', 'BREAK_MONTH', 'MEAN_BEFORE', 'MEAN_AFTER', 'STD_BEFORE', 'STD_AFTER']
+    return pd.DataFrame(rows, columns=columns)
+
+def _changepoints_path(version):
+    from utils import CACHE_DIR
+    # Settings are part of the name, so retuning them does not serve stale breaks
+    return os.path.join(CACHE_DIR, f"changepoints_{version}_v{DETECTOR_VERSION}_{MAX_BREAKS}_{MIN_SEGMENT}_{PENALTY:g}.pkl")
+
+def shared_changepoints(df):
+    from data_access import dataset_version
+    from utils import CACHE_DIR, temp_path
+    
+    # Detected once per dataset version for the whole process, and kept on disk
+    version = dataset_version(df)
+    path = _changepoints_path(version)
+
+    def compute():
+        if os.path.exists(path):
+            return pd.read_pickle(path)
+        changepoints = detect_changepoints(df)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = temp_path(path)
+        changepoints.to_pickle(tmp)
+        os.replace(tmp, path)
+        return changepoints
+    
+    return _changepoint_cache.get_or_compute(version, compute).copy()
+
+def last_breaks(changepoints):
+    latest = changepoints.groupby(['REGIONAL_OFFICE_NAME', 'BNF_CHAPTER_PLUS_CODE'])['BREAK_MONTH'].max()
+    return latest.to_dict()
+
+def current_regime(ts_data, break_month, min_length=MIN_SEGMENT):
+    # The months from the last break on, or the whole series if that would
+    # leave too little to fit
+    if break_month is None:
+        return ts_data
+    regime = ts_data[ts_data['YEAR_MONTH'] >= break_month]
+    return regime.reset_index(drop=True) if len(regime) >= min_length else ts_data
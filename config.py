@@ -1,5 +1,36 @@
 import streamlit as st
 
+# Page modules pull in plotly, statsmodels and sklearn, so they are only
+# imported when app.route_to_page first sends a user to them.
+PAGE_MODULES = {
+    "dashboard": ("nav.dashboard", "dashboard"),
+    "forecasting": ("nav.forecasting", "forecasting"),
+    "fairness": ("nav.fairness", "fairness_analysis"),
+    "outliers": ("nav.outliers", "outlier_analysis"),
+    "clustering": ("nav.clustering", "clustering_analysis"),
+    "categories": ("nav.categories", "category_analysis"),
+    "scenarios": ("nav.scenarios", "scenario_analysis")
+}
+
+# One registry for the whole server, so every session reuses the same fits.
+# Resolve it on the script thread and hand the object to background work.
+@st.cache_resource
+def get_model_registry():
+    from models import ModelRegistry
+    return ModelRegistry()
+
+@st.cache_resource(show_spinner="Training forecast model on all series...")
+def get_global_forecaster(_df, version, holdout=0):
+    from utils import train_global
+    return train_global(_df, holdout=holdout)
+
+# Forecast model choices shared by the Forecast and Fairness pages
+FORECAST_ENGINES = {
+    "Per category": "arima",
+    "All series together (faster)": "global",
+    "Best model per category": "selected"
+}
+
 def create_region_selector(df):
     regions = sorted(df['REGIONAL_OFFICE_NAME'].unique())
     
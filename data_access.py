@@ -0,0 +1,283 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+# Point EPD_PARQUET at a Parquet file, directory or glob of raw EPD extracts to
+# run aggregations in DuckDB instead of holding every row in pandas.
+PARQUET_SOURCE = os.environ.get("EPD_PARQUET")
+CSV_SOURCE = "monthly_summary.csv"
+RAW_COST_COLUMN = os.environ.get("EPD_COST_COLUMN", "ACTUAL_COST")
+
+# TOTAL_COST drives the dashboard; the others are carried wherever the source
+# has them. Raw extracts call the quantity column TOTAL_QUANTITY.
+MEASURES = ['TOTAL_COST', 'ITEMS', 'QUANTITY', 'NIC', 'ACTUAL_COST']
+RAW_MEASURE_COLUMNS = {'ITEMS': ['ITEMS'], 'QUANTITY': ['TOTAL_QUANTITY', 'QUANTITY'], 'NIC': ['NIC'], 'ACTUAL_COST': ['ACTUAL_COST']}
+
+def measure_columns(df):
+    return [measure for measure in MEASURES if measure in df.columns]
+
+class MonthIndex:
+    def __init__(self, df):
+        # load_data hands over month-sorted frames, so this is normally a linear scan
+        if not df['YEAR_MONTH'].is_monotonic_increasing:
+            df = df.sort_values('YEAR_MONTH', kind='stable')
+        self.df = df
+        
+        values = df['YEAR_MONTH'].values
+        starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]]) if len(values) else np.array([], dtype=int)
+        self.months = values[starts]
+        self.offsets = np.r_[starts, len(values)]
+    
+    def _bounds(self, start=None, end=None):
+        lo = 0 if start is None else np.searchsorted(self.months, np.datetime64(pd.Timestamp(start)), side='left')
+        hi = len(self.months) if end is None else np.searchsorted(self.months, np.datetime64(pd.Timestamp(end)), side='right')
+        return self.offsets[lo], self.offsets[max(lo, hi)]
+    
+    def slice(self, start=None, end=None):
+        row_start, row_end = self._bounds(start, end)
+        return self.df.iloc[row_start:row_end]
+    
+    def row_range(self, start=None, end=None):
+        return self._bounds(start, end)
+
+class DatasetSnapshot:
+    def __init__(self, df):
+        index = MonthIndex(df)
+        row_hashes = pd.util.hash_pandas_object(index.df[sorted(df.columns)], index=False).values
+        # Summing row hashes within a month makes a partition's hash independent of row order
+        sums = np.add.reduceat(row_hashes, index.offsets[:-1]) if len(row_hashes) else []
+        self.partitions = {
+            pd.Timestamp(month).strftime('%Y-%m'): f"{int(total):016x}"
+            for month, total in zip(index.months, sums)
+        }
+        self.version = hashlib.sha1(json.dumps(sorted(self.partitions.items())).encode()).hexdigest()[:16]
+    
+    def changed_months(self, other):
+        months = set(self.partitions) | set(other.partitions)
+        return sorted(m for m in months if self.partitions.get(m) != other.partitions.get(m))
+
+class PandasBackend:
+    name = 'pandas'
+
+    def __init__(self, df):
+        self.df = df
+        self._month_index = None
+
+    @property
+    def month_index(self):
+        if self._month_index is None:
+            self._month_index = MonthIndex(self.df)
+        return self._month_index
+
+    def _filter(self, start=None, end=None, region=None, categories=None):
+        df = self.df
+        if start is not None or end is not None:
+            df = self.month_index.slice(start, end)
+        if region is not None:
+            df = df[df['REGIONAL_OFFICE_NAME'] == region]
+        if categories is not None:
+            df = df[df['BNF_CHAPTER_PLUS_CODE'].isin(categories)]
+        return df
+
+    def regions(self):
+        return sorted(self.df['REGIONAL_OFFICE_NAME'].unique())
+
+    def categories(self, region=None):
+        return sorted(self._filter(region=region)['BNF_CHAPTER_PLUS_CODE'].unique())
+
+    def region_totals(self, start=None, end=None):
+        return self._filter(start, end).groupby('REGIONAL_OFFICE_NAME')['TOTAL_COST'].sum()
+
+    def category_totals(self, region=None, categories=None, start=None, end=None):
+        return self._filter(start, end, region, categories).groupby('BNF_CHAPTER_PLUS_CODE')['TOTAL_COST'].sum()
+
+    def monthly_totals(self, region=None, categories=None, start=None, end=None):
+        return self._filter(start, end, region, categories).groupby('YEAR_MONTH')['TOTAL_COST'].sum().reset_index()
+
+    def monthly_category_totals(self, region=None, categories=None, start=None, end=None):
+        df = self._filter(start, end, region, categories)
+        return df.groupby(['YEAR_MONTH', 'BNF_CHAPTER_PLUS_CODE'])['TOTAL_COST'].sum().reset_index()
+
+    def top_n(self, n, start=None, end=None, region=None):
+        return self._filter(start, end, region).nlargest(n, 'TOTAL_COST')
+
+    def measures(self):
+        return measure_columns(self.df)
+
+    def monthly_measure_totals(self, region=None, categories=None, start=None, end=None):
+        # Every measure comes out of the same groupby
+        df = self._filter(start, end, region, categories)
+        return df.groupby('YEAR_MONTH')[self.measures()].sum().reset_index()
+
+    def filter_months(self, start=None, end=None):
+        return self.month_index.slice(start, end)
+
+    def summary(self, start=None, end=None):
+        df = self._filter(start, end)
+        return df.groupby(['YEAR_MONTH', 'REGIONAL_OFFICE_NAME', 'BNF_CHAPTER_PLUS_CODE'])[self.measures()].sum().reset_index()
+
+class DuckDBBackend:
+    name = 'duckdb'
+
+    def __init__(self, source, cost_column=RAW_COST_COLUMN):
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("EPD_PARQUET is set but duckdb is not installed. Run 'pip install duckdb'.")
+        
+        if os.path.isdir(source):
+            source = os.path.join(source, '**', '*.parquet')
+        self.con = duckdb.connect()
+        self._local = threading.local()
+        scan = f"read_parquet('{source.replace(chr(39), chr(39) * 2)}')"
+        
+        columns = dict(self.con.execute(f"SELECT column_name, column_type FROM (DESCRIBE SELECT * FROM {scan})").fetchall())
+        # Raw EPD extracts store the month as an integer like 202401
+        if 'INT' in columns['YEAR_MONTH']:
+            month = "CAST(strptime(CAST(YEAR_MONTH AS VARCHAR), '%Y%m') AS TIMESTAMP)"
+        else:
+            month = "CAST(YEAR_MONTH AS TIMESTAMP)"
+        cost = 'TOTAL_COST' if 'TOTAL_COST' in columns else cost_column
+        self.measure_list = ['TOTAL_COST']
+        measure_sql = [f"CAST({cost} AS DOUBLE) AS TOTAL_COST"]
+        for measure, candidates in RAW_MEASURE_COLUMNS.items():
+            column = next((c for c in candidates if c in columns), None)
+            if column is not None:
+                self.measure_list.append(measure)
+                measure_sql.append(f"CAST({column} AS DOUBLE) AS {measure}")
+        
+        self.con.execute(f"""
+            CREATE VIEW epd AS
+            SELECT {month} AS YEAR_MONTH, REGIONAL_OFFICE_NAME, BNF_CHAPTER_PLUS_CODE, {', '.join(measure_sql)}
+            FROM {scan}
+        """)
+
+    def _query(self, sql, params=()):
+        # DuckDB connections are not shared across threads; each gets a cursor
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is None:
+            cursor = self._local.cursor = self.con.cursor()
+        return cursor.execute(sql, list(params)).df()
+
+    def _where(self, start=None, end=None, region=None, categories=None):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("YEAR_MONTH >= ?")
+            params.append(pd.Timestamp(start).to_pydatetime())
+        if end is not None:
+            clauses.append("YEAR_MONTH <= ?")
+            params.append(pd.Timestamp(end).to_pydatetime())
+        if region is not None:
+            clauses.append("REGIONAL_OFFICE_NAME = ?")
+            params.append(region)
+        if categories is not None:
+            clauses.append(f"BNF_CHAPTER_PLUS_CODE IN ({', '.join('?' * len(categories))})" if categories else "FALSE")
+            params.extend(categories)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def regions(self):
+        return self._query("SELECT DISTINCT REGIONAL_OFFICE_NAME FROM epd ORDER BY 1")['REGIONAL_OFFICE_NAME'].tolist()
+
+    def categories(self, region=None):
+        where, params = self._where(region=region)
+        return self._query(f"SELECT DISTINCT BNF_CHAPTER_PLUS_CODE FROM epd{where} ORDER BY 1", params)['BNF_CHAPTER_PLUS_CODE'].tolist()
+
+    def region_totals(self, start=None, end=None):
+        where, params = self._where(start, end)
+        result = self._query(f"SELECT REGIONAL_OFFICE_NAME, SUM(TOTAL_COST) AS TOTAL_COST FROM epd{where} GROUP BY 1 ORDER BY 1", params)
+        return result.set_index('REGIONAL_OFFICE_NAME')['TOTAL_COST']
+
+    def category_totals(self, region=None, categories=None, start=None, end=None):
+        where, params = self._where(start, end, region, categories)
+        result = self._query(f"SELECT BNF_CHAPTER_PLUS_CODE, SUM(TOTAL_COST) AS TOTAL_COST FROM epd{where} GROUP BY 1 ORDER BY 1", params)
+        return result.set_index('BNF_CHAPTER_PLUS_CODE')['TOTAL_COST']
+
+    def monthly_totals(self, region=None, categories=None, start=None, end=None):
+        where, params = self._where(start, end, region, categories)
+        return self._query(f"SELECT YEAR_MONTH, SUM(TOTAL_COST) AS TOTAL_COST FROM epd{where} GROUP BY 1 ORDER BY 1", params)
+
+    def monthly_category_totals(self, region=None, categories=None, start=None, end=None):
+        where, params = self._where(start, end, region, categories)
+        return self._query(
+            f"SELECT YEAR_MONTH, BNF_CHAPTER_PLUS_CODE, SUM(TOTAL_COST) AS TOTAL_COST FROM epd{where} GROUP BY 1, 2 ORDER BY 1, 2",
+            params
+        )
+
+    def top_n(self, n, start=None, end=None, region=None):
+        where, params = self._where(start, end, region)
+        return self._query(f"SELECT * FROM epd{where} ORDER BY TOTAL_COST DESC LIMIT {int(n)}", params)
+
+    def measures(self):
+        return list(self.measure_list)
+
+    def _measure_sums(self):
+        return ", ".join(f"SUM({measure}) AS {measure}" for measure in self.measure_list)
+
+    def monthly_measure_totals(self, region=None, categories=None, start=None, end=None):
+        where, params = self._where(start, end, region, categories)
+        return self._query(f"SELECT YEAR_MONTH, {self._measure_sums()} FROM epd{where} GROUP BY 1 ORDER BY 1", params)
+
+    def filter_months(self, start=None, end=None):
+        return self.summary(start, end)
+
+    def summary(self, start=None, end=None):
+        where, params = self._where(start, end)
+        return self._query(
+            f"SELECT YEAR_MONTH, REGIONAL_OFFICE_NAME, BNF_CHAPTER_PLUS_CODE, {self._measure_sums()} FROM epd{where} GROUP BY 1, 2, 3 ORDER BY 1, 2, 3",
+            params
+        )
+
+_duckdb_backend = None
+_duckdb_lock = threading.Lock()
+_pandas_backend = None
+_snapshot = None
+
+def parquet_configured():
+    return bool(PARQUET_SOURCE)
+
+def source_files():
+    if parquet_configured():
+        if os.path.isdir(PARQUET_SOURCE):
+            return sorted(glob.glob(os.path.join(PARQUET_SOURCE, '**', '*.parquet'), recursive=True))
+        return sorted(glob.glob(PARQUET_SOURCE))
+    return [CSV_SOURCE]
+
+def source_signature():
+    # A stat per file is enough to notice an edit without reading the data
+    signature = []
+    for path in source_files():
+        if os.path.exists(path):
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+def dataset_snapshot(df):
+    global _snapshot
+    
+    # Hashed once per loaded frame; every derived cache keys on its version
+    snapshot = _snapshot
+    if snapshot is None or snapshot[0] is not df:
+        snapshot = _snapshot = (df, DatasetSnapshot(df))
+    return snapshot[1]
+
+def dataset_version(df):
+    return dataset_snapshot(df).version
+
+def get_backend(df=None):
+    global _duckdb_backend, _pandas_backend
+    
+    if parquet_configured():
+        with _duckdb_lock:
+            if _duckdb_backend is None:
+                _duckdb_backend = DuckDBBackend(PARQUET_SOURCE)
+        return _duckdb_backend
+
+    # Reuse the backend, and its month index, while the same frame is in use
+    backend = _pandas_backend
+    if backend is None or backend.df is not df:
+        backend = _pandas_backend = PandasBackend(df)
+    return backend
@@ -0,0 +1,134 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+# EPD_EXECUTOR picks where batch sweeps run: serial, threads, processes, dask
+# or ray. Left empty, CPU-heavy sweeps such as model fitting use processes and
+# everything else runs serially, since forking the threaded server and
+# pickling data costs more than light work saves. EPD_EXECUTOR_ADDRESS points
+# dask or ray at a running cluster; left empty they start a local in-process one.
+EXECUTOR_KIND = os.environ.get("EPD_EXECUTOR", "").lower()
+EXECUTOR_ADDRESS = os.environ.get("EPD_EXECUTOR_ADDRESS", "")
+EXECUTOR_WORKERS = int(os.environ.get("EPD_WORKERS", "0")) or None
+EXECUTOR_KINDS = ('serial', 'threads', 'processes', 'dask', 'ray')
+
+class SerialExecutor:
+    name = 'serial'
+
+    def map_unordered(self, func, tasks):
+        for i, task in enumerate(tasks):
+            yield i, func(task)
+
+    def map(self, func, tasks):
+        return [func(task) for task in tasks]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+class PoolExecutor(SerialExecutor):
+    def __init__(self, pool_class, max_workers):
+        self.name = 'processes' if pool_class is ProcessPoolExecutor else 'threads'
+        self.pool = pool_class(max_workers=max_workers)
+
+    def map_unordered(self, func, tasks):
+        # Yields (task index, result) as each task finishes
+        futures = {self.pool.submit(func, task): i for i, task in enumerate(tasks)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+    def map(self, func, tasks):
+        return list(self.pool.map(func, tasks))
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+class DaskExecutor(SerialExecutor):
+    name = 'dask'
+
+    def __init__(self, address, max_workers):
+        try:
+            from dask.distributed import Client, LocalCluster
+        except ImportError:
+            raise ImportError("EPD_EXECUTOR=dask but dask.distributed is not installed. Run 'pip install \"dask[distributed]\"'.")
+        
+        self.cluster = None
+        if address:
+            self.client = Client(address)
+        else:
+            self.cluster = LocalCluster(n_workers=max_workers or 1, processes=False, dashboard_address=None)
+            self.client = Client(self.cluster)
+
+    def map_unordered(self, func, tasks):
+        from dask.distributed import as_completed as dask_completed
+        
+        futures = {self.client.submit(func, task, pure=False): i for i, task in enumerate(tasks)}
+        for future in dask_completed(futures):
+            yield futures[future], future.result()
+
+    def map(self, func, tasks):
+        return self.client.gather(self.client.map(func, list(tasks), pure=False))
+
+    def close(self):
+        self.client.close()
+        if self.cluster is not None:
+            self.cluster.close()
+
+class RayExecutor(SerialExecutor):
+    name = 'ray'
+
+    def __init__(self, address, max_workers):
+        try:
+            import ray
+        except ImportError:
+            raise ImportError("EPD_EXECUTOR=ray but ray is not installed. Run 'pip install ray'.")
+        
+        self.ray = ray
+        if not ray.is_initialized():
+            if address:
+                ray.init(address=address, ignore_reinit_error=True)
+            else:
+                ray.init(num_cpus=max_workers, include_dashboard=False, ignore_reinit_error=True)
+
+    def map_unordered(self, func, tasks):
+        remote = self.ray.remote(func)
+        refs = {remote.remote(task): i for i, task in enumerate(tasks)}
+        pending = list(refs)
+        while pending:
+            done, pending = self.ray.wait(pending, num_returns=1)
+            yield refs[done[0]], self.ray.get(done[0])
+
+    def map(self, func, tasks):
+        remote = self.ray.remote(func)
+        return self.ray.get([remote.remote(task) for task in tasks])
+
+def get_executor(kind=None, max_workers=None, in_process=False, cpu_bound=False):
+    # Tasks must be top-level functions of picklable arguments so every
+    # backend can run them. On a cluster the workers read the series matrix
+    # from EPD_CACHE_DIR, so it has to be on storage all nodes share.
+    kind = (kind or EXECUTOR_KIND or ('processes' if cpu_bound else 'serial')).lower()
+    if kind not in EXECUTOR_KINDS:
+        raise ValueError(f"Unknown executor '{kind}'. Use one of: {', '.join(EXECUTOR_KINDS)}.")
+    max_workers = max_workers or EXECUTOR_WORKERS
+    
+    # Work that reads or fills in-process state, like the session-shared model
+    # registry, stays in this process
+    if in_process and kind != 'serial':
+        kind = 'threads'
+    if kind in ('threads', 'processes') and (max_workers or os.cpu_count() or 1) == 1:
+        kind = 'serial'
+    
+    if kind == 'serial':
+        return SerialExecutor()
+    if kind == 'threads':
+        return PoolExecutor(ThreadPoolExecutor, max_workers or os.cpu_count())
+    if kind == 'processes':
+        return PoolExecutor(ProcessPoolExecutor, max_workers or os.cpu_count())
+    if kind == 'dask':
+        return DaskExecutor(EXECUTOR_ADDRESS, max_workers)
+    return RayExecutor(EXECUTOR_ADDRESS, max_workers)
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import math
+import os
+import pickle
+import numpy as np
+
+from result_cache import SingleFlightCache
+
+# EPD_REGIONS_GEOJSON points at NHS England region boundaries (for example the
+# ONS "NHS England Regions" boundary file, exported as WGS84 GeoJSON; see the
+# README). Without it the dashboard warns and falls back to region points.
+REGIONS_GEOJSON = os.environ.get("EPD_REGIONS_GEOJSON", os.path.join(os.path.dirname(os.path.abspath(__file__)), "regions.geojson"))
+# Feature property with the region name; left empty, the NHSERyyNM field or
+# "name" is used
+NAME_PROPERTY = os.environ.get("EPD_REGIONS_NAME_PROPERTY", "")
+
+# Douglas-Peucker tolerance in degrees for each detail level, coarsest first
+DETAIL_TOLERANCES = {'low': 0.02, 'medium': 0.005, 'high': 0.001}
+# Lowest map zoom at which each level is used. Streamlit does not report the
+# zoom a user pans to, so this is the zoom a view opens at: England as a whole
+# opens near 6, a single large region near 8 and London near 10.
+DETAIL_ZOOMS = {'low': 0.0, 'medium': 7.0, 'high': 9.0}
+
+_geometry_cache = SingleFlightCache(max_entries=4)
+
+def geojson_signature(path=None):
+    path = path or REGIONS_GEOJSON
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+def _region_name(properties):
+    if NAME_PROPERTY:
+        return properties.get(NAME_PROPERTY)
+    for key in sorted(properties, reverse=True):
+        if key.upper().startswith('NHSER') and key.upper().endswith('NM'):
+            return properties[key]
+    return properties.get('name') or properties.get('NAME')
+
+def douglas_peucker(points, tolerance):
+    # Keeps the points of a line that lie further than `tolerance` from the
+    # chord of the stretch they sit in; iterative, so long rings cannot hit
+    # the recursion limit
+    n = len(points)
+    if n < 3:
+        return points
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        segment = points[first + 1:last]
+        start, end = points[first], points[last]
+        chord = end - start
+        length = np.hypot(chord[0], chord[1])
+        if length == 0:
+            distances = np.hypot(segment[:, 0] - start[0], segment[:, 1] - start[1])
+        else:
+            distances = np.abs(chord[0] * (segment[:, 1] - start[1]) - chord[1] * (segment[:, 0] - start[0])) / length
+        farthest = int(distances.argmax())
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+def simplify_ring(ring, tolerance):
+    # A closed ring is split at the vertex furthest from its start, so both
+    # halves have a proper chord. Returns None if the ring collapses.
+    points = np.asarray(ring, dtype=float)[:, :2]
+    if len(points) < 4:
+        return None
+    if tolerance <= 0:
+        return points
+    far = int(np.hypot(points[:, 0] - points[0, 0], points[:, 1] - points[0, 1]).argmax())
+    simplified = np.vstack([douglas_peucker(points[:far + 1], tolerance)[:-1], douglas_peucker(points[far:], tolerance)])
+    return simplified if len(simplified) >= 4 else None
+
+def _polygons(geometry):
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    return []
+
+def simplify_geometry(geometry, tolerance):
+    decimals = max(int(math.ceil(-math.log10(tolerance))) + 1, 3) if tolerance > 0 else 6
+    polygons = []
+    for polygon in _polygons(geometry):
+        rings = [simplify_ring(ring, tolerance) for ring in polygon]
+        # Islands and holes smaller than the tolerance are dropped with their ring
+        if rings and rings[0] is not None:
+            polygons.append([np.round(ring, decimals).tolist() for ring in rings if ring is not None])
+    if not polygons:
+        # Never lose a whole region: keep its largest part at full detail
+        largest = max(_polygons(geometry), key=lambda polygon: len(polygon[0]))
+        polygons = [[np.round(np.asarray(largest[0], dtype=float)[:, :2], 6).tolist()]]
+    return {'type': 'MultiPolygon', 'coordinates': polygons}
+
+def _bounds(geometry):
+    points = np.vstack([np.asarray(polygon[0])[:, :2] for polygon in geometry['coordinates']])
+    return tuple(points.min(axis=0)) + tuple(points.max(axis=0))
+
+class RegionGeometries:
+    # Region boundaries simplified once per detail level. Features carry the
+    # upper-cased region name as their id, matching REGIONAL_OFFICE_NAME.
+    def __init__(self, geojson, tolerances=DETAIL_TOLERANCES):
+        self.levels = {}
+        self.bounds = {}
+        for feature in geojson.get('features', []):
+            name = _region_name(feature.get('properties') or {})
+            if not name or not feature.get('geometry') or not _polygons(feature['geometry']):
+                continue
+            name = str(name).strip().upper()
+            for level, tolerance in tolerances.items():
+                self.levels.setdefault(level, {})[name] = simplify_geometry(feature['geometry'], tolerance)
+            finest = min(tolerances, key=tolerances.get)
+            self.bounds[name] = _bounds(self.levels[finest][name])
+        if not self.levels:
+            raise ValueError("The region GeoJSON has no polygon features with a region name.")
+
+    @property
+    def regions(self):
+        return sorted(self.bounds)
+
+    def region_bounds(self, regions=None):
+        boxes = np.array([self.bounds[region] for region in (regions or self.regions) if region in self.bounds])
+        return tuple(boxes[:, :2].min(axis=0)) + tuple(boxes[:, 2:].max(axis=0))
+
+    def feature_collection(self, zoom, view=None):
+        # Regions inside the view get the detail the zoom calls for; the rest
+        # only frame it, so they stay at the coarsest level
+        level = detail_for_zoom(zoom)
+        coarsest = next(iter(DETAIL_TOLERANCES))
+        features = []
+        for region, bounds in self.bounds.items():
+            visible = view is None or (bounds[0] <= view[2] and bounds[2] >= view[0] and bounds[1] <= view[3] and bounds[3] >= view[1])
+            geometry = self.levels[level if visible else coarsest][region]
+            features.append({'type': 'Feature', 'id': region, 'properties': {'name': region}, 'geometry': geometry})
+        return {'type': 'FeatureCollection', 'features': features}
+
+def detail_for_zoom(zoom):
+    level = next(iter(DETAIL_TOLERANCES))
+    for name, min_zoom in DETAIL_ZOOMS.items():
+        if zoom >= min_zoom:
+            level = name
+    return level
+
+def zoom_for_bounds(bounds, width=700, height=500, padding=0.1):
+    # Web Mercator zoom at which the box fills the figure, less some padding
+    west, south, east, north = bounds
+    def mercator(lat):
+        return math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+    lon_span = max((east - west) * (1 + padding), 1e-6)
+    lat_span = max((mercator(north) - mercator(south)) * (1 + padding), 1e-6)
+    zoom_x = math.log2(width * 360 / (256 * lon_span))
+    zoom_y = math.log2(height * 2 * math.pi / (256 * lat_span))
+    return min(zoom_x, zoom_y)
+
+def _geometry_cache_path(signature):
+    from utils import CACHE_DIR
+    digest = hashlib.sha1(repr((signature, DETAIL_TOLERANCES, NAME_PROPERTY)).encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"regions_{digest}.pkl")
+
+def load_region_geometries(path=None):
+    # Simplified once per version of the file for the whole process and kept on
+    # disk; returns None when there is no boundary file
+    from utils import CACHE_DIR, temp_path
+    
+    signature = geojson_signature(path)
+    if signature is None:
+        return None
+    cache_path = _geometry_cache_path(signature)
+
+    def compute():
+        if os.path.exists(cache_path):
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        with open(signature[0], encoding='utf-8') as f:
+            geometries = RegionGeometries(json.load(f))
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = temp_path(cache_path)
+        with open(tmp, 'wb') as f:
+            pickle.dump(geometries, f)
+        os.replace(tmp, cache_path)
+        return geometries
+    
+    return _geometry_cache.get_or_compute(signature, compute)
+
+def write_simplified(source, target, tolerance=min(DETAIL_TOLERANCES.values())):
+    # Shrinks a full-resolution boundary download to the finest detail level,
+    # keeping only the region name on each feature
+    with open(source, encoding='utf-8') as f:
+        geojson = json.load(f)
+    features = []
+    for feature in geojson.get('features', []):
+        name = _region_name(feature.get('properties') or {})
+        if name and feature.get('geometry') and _polygons(feature['geometry']):
+            features.append({'type': 'Feature', 'properties': {'name': str(name).strip()},
+                             'geometry': simplify_geometry(feature['geometry'], tolerance)})
+    with open(target, 'w', encoding='utf-8') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f, separators=(',', ':'))
+    return len(features)
+
+if __name__ == "__main__":
+    import sys
+    
+    if len(sys.argv) not in (2, 3):
+        sys.exit("usage: python geometry.py <boundaries.geojson> [output.geojson]")
+    target = sys.argv[2] if len(sys.argv) == 3 else REGIONS_GEOJSON
+    count = write_simplified(sys.argv[1], target)
+    print(f"Wrote {count} regions to {target} ({os.path.getsize(target) / 1024:.0f} KB)")
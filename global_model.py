@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+GLOBAL_MODEL_TYPES = ['gbm', 'linear']
+
+class GlobalForecaster:
+    def __init__(self, n_lags=12, model_type='gbm', max_train_rows=None):
+        if model_type not in GLOBAL_MODEL_TYPES:
+            raise ValueError(f"Unknown global model type: {model_type}")
+        self.n_lags = n_lags
+        self.model_type = model_type
+        self.max_train_rows = max_train_rows
+        self._predictions = {}
+
+    def _features(self, windows, target_months):
+        # windows: (rows, n_lags) of level-scaled history; target_months: (rows,)
+        angle = 2 * np.pi * (target_months - 1) / 12
+        recent_mean = np.nanmean(windows[:, -3:], axis=1, keepdims=True)
+        return np.hstack([windows, recent_mean, np.sin(angle)[:, None], np.cos(angle)[:, None]])
+
+    def fit(self, matrix, months, keys):
+        if matrix.shape[1] <= self.n_lags:
+            raise ValueError(f"Insufficient data for global model. Need more than {self.n_lags} months.")
+        
+        self.keys = list(keys)
+        self.key_index = {key: i for i, key in enumerate(self.keys)}
+        self.months = pd.DatetimeIndex(months)
+        self.scale = np.nanmean(matrix, axis=1)
+        self.scale[~np.isfinite(self.scale) | (self.scale == 0)] = 1.0
+        self.history = matrix / self.scale[:, None]
+        
+        # Every (series, month) window becomes one training row, built without
+        # a Python loop over series
+        windows = np.lib.stride_tricks.sliding_window_view(self.history, self.n_lags + 1, axis=1)
+        X_lags = windows[..., :self.n_lags].reshape(-1, self.n_lags)
+        y = windows[..., self.n_lags].reshape(-1)
+        target_months = np.tile(self.months.month.values[self.n_lags:], len(self.keys))
+        X = self._features(X_lags, target_months)
+        
+        usable = np.isfinite(y) & (np.isfinite(X).all(axis=1) if self.model_type == 'linear' else True)
+        X, y = X[usable], y[usable]
+        if len(y) == 0:
+            raise ValueError("No complete training windows for global model.")
+        if self.max_train_rows is not None and len(y) > self.max_train_rows:
+            # A fixed sample of windows keeps the fit cost flat as rows are added
+            sample = np.sort(np.random.default_rng(42).choice(len(y), self.max_train_rows, replace=False))
+            X, y = X[sample], y[sample]
+        
+        if self.model_type == 'gbm':
+            from sklearn.ensemble import HistGradientBoostingRegressor
+            self.model = HistGradientBoostingRegressor(max_iter=200, learning_rate=0.05, random_state=42)
+        else:
+            from sklearn.linear_model import Ridge
+            self.model = Ridge(alpha=1.0)
+        self.model.fit(X, y)
+        
+        self.residuals = np.sort(np.abs(y - self.model.predict(X)))
+        self._predictions = {}
+        return self
+
+    def predict(self, forecast_periods, alpha=0.05):
+        cache_key = (forecast_periods, alpha)
+        if cache_key in self._predictions:
+            return self._predictions[cache_key]
+        
+        window = self.history[:, -self.n_lags:].copy()
+        if self.model_type == 'linear':
+            row_means = np.nanmean(window, axis=1, keepdims=True)
+            window = np.where(np.isfinite(window), window, row_means)
+        
+        forecast_dates = pd.date_range(
+            start=self.months[-1] + pd.DateOffset(months=1),
+            periods=forecast_periods,
+            freq='MS'
+        )
+        
+        # One batched predict call per step covers every series
+        steps = []
+        for date in forecast_dates:
+            X = self._features(window, np.full(len(window), date.month))
+            step = self.model.predict(X)
+            steps.append(step)
+            window = np.hstack([window[:, 1:], step[:, None]])
+        
+        mean = np.column_stack(steps)
+        # In-sample one-step residual quantile, widened with the horizon
+        width = np.quantile(self.residuals, 1 - alpha) * np.sqrt(np.arange(1, forecast_periods + 1))
+        result = {
+            'dates': forecast_dates,
+            'mean': mean * self.scale[:, None],
+            'lower': (mean - width) * self.scale[:, None],
+            'upper': (mean + width) * self.scale[:, None]
+        }
+        self._predictions[cache_key] = result
+        return result
+
+    def forecast(self, key, forecast_periods=5, alpha=0.05):
+        if key not in self.key_index:
+            raise ValueError(f"Series {key} was not part of the global model's training data.")
+        i = self.key_index[key]
+        result = self.predict(forecast_periods, alpha)
+        
+        return pd.DataFrame({
+            'YEAR_MONTH': result['dates'],
+            'FORECAST': result['mean'][i],
+            'CONFIDENCE_LOWER': result['lower'][i],
+            'CONFIDENCE_UPPER': result['upper'][i]
+        })
+
+    def forecast_sum(self, keys, forecast_periods=5, alpha=0.05):
+        rows = [self.key_index[key] for key in keys if key in self.key_index]
+        result = self.predict(forecast_periods, alpha)
+        
+        # Summing member forecasts keeps the total coherent with its categories.
+        # Member intervals are added as if their errors move together, which
+        # is the wide end for series that share the same regional shocks.
+        mean = np.nansum(result['mean'][rows], axis=0)
+        return pd.DataFrame({
+            'YEAR_MONTH': result['dates'],
+            'FORECAST': mean,
+            'CONFIDENCE_LOWER': mean - np.nansum(result['mean'][rows] - result['lower'][rows], axis=0),
+            'CONFIDENCE_UPPER': mean + np.nansum(result['upper'][rows] - result['mean'][rows], axis=0)
+        })
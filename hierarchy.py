@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+RECONCILIATION_METHODS = ['bottom_up', 'ols', 'wls', 'mint_shrink']
+# Bottom-level key for everything outside the requested categories
+REMAINDER = 'OTHER'
+
+def build_hierarchy(df, levels=('REGIONAL_OFFICE_NAME', 'BNF_CHAPTER_PLUS_CODE'), key_prefix=()):
+    levels = list(levels)
+    bottom = df.pivot_table(index=levels, columns='YEAR_MONTH', values='TOTAL_COST', aggfunc='sum', fill_value=0)
+    bottom_paths = [path if isinstance(path, tuple) else (path,) for path in bottom.index]
+    
+    # Aggregate nodes are keyed as their path plus 'ALL', bottom nodes by their
+    # path, so keys line up with the ones the Forecast page already registers.
+    nodes = []
+    rows = []
+    for depth in range(len(levels)):
+        parents = sorted({path[:depth] for path in bottom_paths})
+        for parent in parents:
+            nodes.append(tuple(key_prefix) + parent + ('ALL',))
+            rows.append([path[:depth] == parent for path in bottom_paths])
+    for path in bottom_paths:
+        nodes.append(tuple(key_prefix) + path)
+    
+    S = np.vstack([np.array(rows, dtype=float).reshape(-1, len(bottom_paths)), np.eye(len(bottom_paths))])
+    return {
+        'nodes': nodes,
+        'S': S,
+        'bottom': bottom.values,
+        'months': bottom.columns
+    }
+
+def shrunk_covariance(residuals):
+    # Schafer-Strimmer shrinkage towards the diagonal, as used for MinT
+    n = residuals.shape[0]
+    covm = residuals.T @ residuals / n
+    sd = np.sqrt(np.diag(covm))
+    sd[sd == 0] = 1
+    scaled = residuals / sd
+    corm = covm / np.outer(sd, sd)
+    v = (scaled ** 2).T @ (scaled ** 2) - (scaled.T @ scaled) ** 2 / n
+    v /= n * (n - 1)
+    np.fill_diagonal(v, 0)
+    d = corm ** 2
+    np.fill_diagonal(d, 0)
+    shrinkage = min(1.0, max(0.0, v.sum() / d.sum())) if d.sum() > 0 else 1.0
+    target = np.diag(np.diag(covm))
+    return shrinkage * target + (1 - shrinkage) * covm
+
+def reconcile(base_forecasts, S, method='ols', residuals=None):
+    n_bottom = S.shape[1]
+    
+    if method == 'bottom_up':
+        return S @ base_forecasts[-n_bottom:]
+    
+    if method == 'ols':
+        W_inv = np.eye(S.shape[0])
+    elif method == 'wls':
+        W_inv = np.diag(1 / S.sum(axis=1))
+    elif method == 'mint_shrink':
+        if residuals is None:
+            raise ValueError("MinT reconciliation needs in-sample residuals for every node.")
+        W_inv = np.linalg.pinv(shrunk_covariance(residuals))
+    else:
+        raise ValueError(f"Unknown reconciliation method: {method}")
+    
+    # G maps base forecasts at every node to coherent bottom-level forecasts;
+    # all horizons are reconciled in the same solve.
+    StW = S.T @ W_inv
+    G = np.linalg.solve(StW @ S, StW)
+    return S @ (G @ base_forecasts)
+
+def hierarchical_forecast(df, forecast_periods, get_model, method='ols', alpha=0.05,
+                          levels=('REGIONAL_OFFICE_NAME', 'BNF_CHAPTER_PLUS_CODE'), key_prefix=(), categories=None):
+    if categories is not None:
+        # Bottom nodes outside `categories` are fitted as one remainder series
+        # per parent, so the work grows with the selection, not the region
+        bottom_level = list(levels)[-1]
+        df = df.assign(**{bottom_level: df[bottom_level].where(df[bottom_level].isin(categories), REMAINDER)})
+    hierarchy = build_hierarchy(df, levels, key_prefix)
+    S, nodes, months = hierarchy['S'], hierarchy['nodes'], hierarchy['months']
+    node_series = S @ hierarchy['bottom']
+    n_bottom = S.shape[1]
+    
+    # Bottom-up only needs base models for the bottom level
+    fit_rows = range(len(nodes) - n_bottom, len(nodes)) if method == 'bottom_up' else range(len(nodes))
+    
+    base = np.zeros((len(nodes), forecast_periods))
+    lower = np.full((len(nodes), forecast_periods), np.nan)
+    upper = np.full((len(nodes), forecast_periods), np.nan)
+    residuals = np.zeros((len(months) - 1, len(nodes)))
+    forecast_dates = None
+    
+    for i in fit_rows:
+        ts_data = pd.DataFrame({'YEAR_MONTH': months, 'TOTAL_COST': node_series[i]})
+        model = get_model(nodes[i], ts_data)
+        forecast_df = model.forecast(forecast_periods, alpha=alpha)
+        base[i] = forecast_df['FORECAST'].values
+        lower[i] = forecast_df['CONFIDENCE_LOWER'].values
+        upper[i] = forecast_df['CONFIDENCE_UPPER'].values
+        # The first residual of a differenced model absorbs the diffuse start
+        residuals[:, i] = model.residuals()[1:]
+        forecast_dates = forecast_df['YEAR_MONTH']
+    
+    reconciled = reconcile(base, S, method, residuals if method == 'mint_shrink' else None)
+    half_width = (upper - lower) / 2
+    if method == 'bottom_up':
+        # Aggregates have no base model of their own, so their width combines
+        # the bottom-level widths as if those series were independent
+        half_width = np.sqrt(S @ half_width[-n_bottom:] ** 2)
+    
+    frames = []
+    for i, node in enumerate(nodes):
+        frames.append(pd.DataFrame({
+            'NODE': [node] * forecast_periods,
+            'LEVEL': len(node) - len(key_prefix) - (1 if node[-1] == 'ALL' else 0),
+            'YEAR_MONTH': forecast_dates.values,
+            'BASE_FORECAST': base[i] if i in fit_rows else np.nan,
+            'FORECAST': reconciled[i],
+            # Intervals keep each base model's width, centred on the coherent forecast
+            'CONFIDENCE_LOWER': reconciled[i] - half_width[i],
+            'CONFIDENCE_UPPER': reconciled[i] + half_width[i]
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+def select_node(forecasts, node):
+    node = tuple(node)
+    return forecasts[[n == node for n in forecasts['NODE']]].reset_index(drop=True)
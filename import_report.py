@@ -0,0 +1,58 @@
+import re
+import subprocess
+import sys
+
+from config import PAGE_MODULES
+
+BASE_MODULES = ["streamlit", "utils"]
+IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def measure_imports(modules):
+    code = "; ".join(f"import {name}" for name in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True
+    )
+    
+    timings = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            timings.append({
+                'module': name,
+                'cumulative_ms': int(cumulative_us) / 1000,
+                'depth': (len(indent) - 1) // 2
+            })
+    return timings
+
+def top_level_cost(timings, names):
+    return sum(t['cumulative_ms'] for t in timings if t['depth'] == 0 and t['module'] in names)
+
+def heaviest_packages(timings, top_n=5):
+    packages = {}
+    for timing in timings:
+        if timing['depth'] == 1:
+            package = timing['module'].split('.')[0]
+            packages[package] = packages.get(package, 0) + timing['cumulative_ms']
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top_n]
+
+def main():
+    base = measure_imports(BASE_MODULES)
+    print(f"Startup (streamlit + utils): {top_level_cost(base, BASE_MODULES):,.0f} ms")
+    print()
+    print(f"{'Page':<14}{'Module':<20}{'Cold import (ms)':>18}  Heaviest packages (ms)")
+    
+    for page_key, (module_name, _) in PAGE_MODULES.items():
+        timings = measure_imports(BASE_MODULES + [module_name])
+        # -X importtime prints children before parents, so everything after
+        # the last base module line belongs to the page import
+        last_base = max(i for i, t in enumerate(timings) if t['depth'] == 0 and t['module'] in BASE_MODULES)
+        page_timings = timings[last_base + 1:]
+        cost = sum(t['cumulative_ms'] for t in page_timings if t['depth'] == 0)
+        heavy = ", ".join(f"{name} {ms:,.0f}" for name, ms in heaviest_packages(page_timings))
+        print(f"{page_key:<14}{module_name:<20}{cost:>18,.0f}  {heavy}")
+
+if __name__ == "__main__":
+    main()
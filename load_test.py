@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from config import PAGE_MODULES
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+RSS_SAMPLE_SECONDS = 0.2
+# app.route_to_page shows a failing page as an st.error starting with this and
+# falls back to the dashboard, so the run itself raises nothing
+PAGE_ERROR_PREFIX = "Error loading page"
+
+def change_region(at, i):
+    selector = at.selectbox(key="region_selector")
+    return selector.select_index(i % len(selector.options))
+
+def change_horizon(at, i):
+    return at.slider[0].set_value(3 + i % 10)
+
+def change_grouping(at, i):
+    return at.multiselect(key="fairness_dimensions").set_value(['Region', 'Cost Tier'] if i % 2 else ['Region', 'BNF Category'])
+
+def change_date_range(at, i):
+    date_input = at.date_input[0]
+    start = date_input.min + (date_input.max - date_input.min) * (i % 4) / 8
+    return date_input.set_value((start, date_input.max))
+
+def change_groups(at, i):
+    return at.slider[0].set_value(2 + i % 5)
+
+def change_categories(at, i):
+    multiselect = at.multiselect[0]
+    return multiselect.set_value(multiselect.options[i % 3:i % 3 + 5])
+
+def change_budget_period(at, i):
+    return at.slider[0].set_value(12 - i % 6)
+
+# One widget change per page, the kind an analyst makes after landing on it
+PAGE_ACTIONS = {
+    'dashboard': ("region", change_region),
+    'forecasting': ("horizon", change_horizon),
+    'fairness': ("grouping", change_grouping),
+    'outliers': ("date range", change_date_range),
+    'clustering': ("groups", change_groups),
+    'categories': ("categories", change_categories),
+    'scenarios': ("period", change_budget_period)
+}
+
+def current_rss_mb():
+    # /proc gives the live figure on Linux; elsewhere fall back to the peak
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError):
+        scale = 1024 ** 2 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+class RssSampler(threading.Thread):
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.samples.append(current_rss_mb())
+            self._stop_event.wait(RSS_SAMPLE_SECONDS)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.samples.append(current_rss_mb())
+
+def script_error(at):
+    if at.exception:
+        return at.exception[0].value
+    for element in at.error:
+        if str(element.value).startswith(PAGE_ERROR_PREFIX):
+            return element.value
+    return None
+
+def run_session(session_id, pages, iterations, timeout):
+    from streamlit.testing.v1 import AppTest
+    
+    timings = []
+
+    def record(page, action, step):
+        start = time.perf_counter()
+        error = None
+        try:
+            step()
+            error = script_error(at)
+        except Exception as e:
+            error = str(e)
+        timings.append({
+            'session': session_id,
+            'page': page,
+            'action': action,
+            'seconds': time.perf_counter() - start,
+            'error': error
+        })
+    
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    record('dashboard', 'open', lambda: at.run())
+    
+    for i in range(iterations):
+        # Sessions start on different pages so they do not move in lockstep
+        for page in pages[session_id % len(pages):] + pages[:session_id % len(pages)]:
+            record(page, 'navigate', lambda: at.button(key=f"nav_{page}").click().run())
+            if page in PAGE_ACTIONS:
+                action, change = PAGE_ACTIONS[page]
+                record(page, action, lambda: change(at, session_id + i).run())
+    return timings
+
+def summarise(timings):
+    groups = {}
+    for timing in timings:
+        groups.setdefault((timing['page'], timing['action']), []).append(timing)
+    
+    rows = []
+    for (page, action), group in sorted(groups.items()):
+        seconds = np.array([t['seconds'] for t in group]) * 1000
+        rows.append({
+            'page': page,
+            'action': action,
+            'runs': len(group),
+            'errors': sum(t['error'] is not None for t in group),
+            'error_rate': sum(t['error'] is not None for t in group) / len(group),
+            'p50_ms': float(np.percentile(seconds, 50)),
+            'p90_ms': float(np.percentile(seconds, 90)),
+            'p99_ms': float(np.percentile(seconds, 99)),
+            'max_ms': float(seconds.max())
+        })
+    return rows
+
+def run_load_test(sessions=4, iterations=2, pages=None, timeout=600, warmup=True):
+    pages = list(pages or PAGE_MODULES)
+    if warmup:
+        # Fill the shared caches first so the measured runs reflect a warm server
+        run_session(0, pages, 1, timeout)
+    
+    sampler = RssSampler()
+    sampler.start()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        results = list(executor.map(lambda s: run_session(s, pages, iterations, timeout), range(sessions)))
+    
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    sampler.stop()
+    timings = [timing for session in results for timing in session]
+    
+    return {
+        'sessions': sessions,
+        'iterations': iterations,
+        'wall_seconds': wall,
+        'cpu_seconds': cpu,
+        # Above 1.0 means more than one core was busy on average
+        'cpu_utilisation': cpu / wall if wall > 0 else 0.0,
+        'rss_start_mb': sampler.samples[0],
+        'rss_peak_mb': max(sampler.samples),
+        'rss_end_mb': sampler.samples[-1],
+        'pages': summarise(timings),
+        'error_rate': sum(t['error'] is not None for t in timings) / len(timings) if timings else 0.0,
+        'errors': [t for t in timings if t['error'] is not None][:20]
+    }
+
+def print_report(report):
+    print(f"{report['sessions']} sessions x {report['iterations']} iterations in {report['wall_seconds']:,.1f} s")
+    print(f"CPU: {report['cpu_seconds']:,.1f} s ({report['cpu_utilisation']:.2f} cores)")
+    print(f"RSS: {report['rss_start_mb']:,.0f} MB -> peak {report['rss_peak_mb']:,.0f} MB, "
+          f"end {report['rss_end_mb']:,.0f} MB ({report['rss_end_mb'] - report['rss_start_mb']:+,.0f} MB)")
+    print(f"Errors: {report['error_rate']:.1%} of runs, including pages that fell back to the dashboard")
+    print()
+    print(f"{'Page':<14}{'Action':<12}{'Runs':>6}{'Errors':>8}{'Error %':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'Max ms':>10}")
+    for row in report['pages']:
+        print(f"{row['page']:<14}{row['action']:<12}{row['runs']:>6}{row['errors']:>8}{row['error_rate']:>9.0%}"
+              f"{row['p50_ms']:>10,.0f}{row['p90_ms']:>10,.0f}{row['p99_ms']:>10,.0f}{row['max_ms']:>10,.0f}")
+    for error in report['errors']:
+        print(f"Session {error['session']} {error['page']}/{error['action']}: {error['error']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive concurrent headless sessions through the dashboard.")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=2)
+    parser.add_argument("--pages", nargs="+", choices=list(PAGE_MODULES), default=list(PAGE_MODULES))
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds allowed for a single script run")
+    parser.add_argument("--no-warmup", action="store_true", help="Measure cold caches as well")
+    parser.add_argument("--json", help="Also write the report to this file, e.g. to compare runs")
+    args = parser.parse_args()
+    
+    report = run_load_test(args.sessions, args.iterations, args.pages, args.timeout, not args.no_warmup)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=1)
+
+if __name__ == "__main__":
+    main()
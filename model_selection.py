@@ -0,0 +1,222 @@
+import json
+import os
+import threading
+import time
+import warnings
+import numpy as np
+import pandas as pd
+
+from models import FittedArima, fit_arima, series_fingerprint
+from utils import CACHE_DIR, SERIES_KEYS, temp_path
+
+TOURNAMENT_HORIZON = 6
+TOURNAMENT_ORIGINS = 3
+TIME_BUDGET = 5.0
+# Candidates whose backtest error is this far above the leader stop racing
+PRUNE_RATIO = 1.5
+SELECTION_PATH = os.path.join(CACHE_DIR, "model_selection.json")
+
+# Sessions saving at once would otherwise each merge into a stale copy
+_selection_lock = threading.Lock()
+
+class SeasonalNaive:
+    model_name = 'seasonal_naive'
+
+    def __init__(self, ts_data, season=12):
+        values = ts_data['TOTAL_COST'].values
+        self.season = season
+        self.last_season = values[-season:]
+        self.last_date = ts_data['YEAR_MONTH'].iloc[-1]
+        self.sigma = np.std(values[season:] - values[:-season])
+
+    def forecast(self, forecast_periods=5, alpha=0.05):
+        from scipy.stats import norm
+        
+        steps = np.arange(forecast_periods)
+        forecast = self.last_season[steps % self.season]
+        width = norm.ppf(1 - alpha / 2) * self.sigma * np.sqrt(steps // self.season + 1)
+        
+        return pd.DataFrame({
+            'YEAR_MONTH': pd.date_range(start=self.last_date + pd.DateOffset(months=1), periods=forecast_periods, freq='MS'),
+            'FORECAST': forecast,
+            'CONFIDENCE_LOWER': forecast - width,
+            'CONFIDENCE_UPPER': forecast + width
+        })
+
+class FittedEts:
+    model_name = 'ets'
+
+    def __init__(self, results, last_date):
+        self.results = results
+        self.last_date = last_date
+        self.aic = results.aic
+
+    def forecast(self, forecast_periods=5, alpha=0.05):
+        n_obs = int(self.results.nobs)
+        frame = self.results.get_prediction(start=n_obs, end=n_obs + forecast_periods - 1).summary_frame(alpha=alpha)
+        
+        return pd.DataFrame({
+            'YEAR_MONTH': pd.date_range(start=self.last_date + pd.DateOffset(months=1), periods=forecast_periods, freq='MS'),
+            'FORECAST': frame['mean'].values,
+            'CONFIDENCE_LOWER': frame['pi_lower'].values,
+            'CONFIDENCE_UPPER': frame['pi_upper'].values
+        })
+
+def fit_seasonal_naive(ts_data):
+    if len(ts_data) < 24:
+        raise ValueError("Seasonal naive needs at least two full years of data.")
+    return SeasonalNaive(ts_data)
+
+def fit_ets(ts_data):
+    from statsmodels.tsa.exponential_smoothing.ets import ETSModel
+    warnings.filterwarnings('ignore')
+    
+    if len(ts_data) < 24:
+        raise ValueError("ETS needs at least two full years of data.")
+    endog = ts_data['TOTAL_COST'].reset_index(drop=True)
+    results = ETSModel(endog, error='add', trend='add', damped_trend=True, seasonal='add', seasonal_periods=12).fit(disp=False)
+    return FittedEts(results, ts_data['YEAR_MONTH'].iloc[-1])
+
+def fit_sarima(ts_data):
+    from statsmodels.tsa.arima.model import ARIMA
+    warnings.filterwarnings('ignore')
+    
+    if len(ts_data) < 26:
+        raise ValueError("Seasonal ARIMA needs at least 26 months of data.")
+    results = ARIMA(ts_data['TOTAL_COST'].reset_index(drop=True), order=(1,1,1), seasonal_order=(0,1,1,12)).fit()
+    return FittedArima(results, (1,1,1), ts_data['YEAR_MONTH'].iloc[-1], model_name='sarima')
+
+# Ordered cheapest first so fast models set the bar slow ones have to beat
+CANDIDATES = {
+    'seasonal_naive': fit_seasonal_naive,
+    'ets': fit_ets,
+    'arima': fit_arima,
+    'sarima': fit_sarima
+}
+
+def fit_model(model_name, ts_data):
+    if model_name not in CANDIDATES:
+        raise ValueError(f"Unknown model: {model_name}")
+    return CANDIDATES[model_name](ts_data)
+
+def _shared_mae(scores, names):
+    # Mean error of each candidate over the origins every one of them was
+    # scored on, so candidates cut short by the budget compare like for like
+    origins = set.intersection(*(set(scores[name]) for name in names))
+    return {name: np.mean([scores[name][origin] for origin in origins]) for name in names}
+
+def run_series_tournament(ts_data, horizon=TOURNAMENT_HORIZON, n_origins=TOURNAMENT_ORIGINS, time_budget=TIME_BUDGET):
+    start = time.perf_counter()
+    origins = [len(ts_data) - horizon * i for i in range(n_origins, 0, -1)]
+    origins = [origin for origin in origins if origin >= 12]
+    scores = {name: {} for name in CANDIDATES}
+    alive = list(CANDIDATES)
+    
+    for origin in reversed(origins):
+        train = ts_data.iloc[:origin]
+        actual = ts_data['TOTAL_COST'].values[origin:origin + horizon]
+        scored = []
+        failed = []
+        out_of_time = False
+        
+        for name in alive:
+            if time.perf_counter() - start > time_budget and any(scores.values()):
+                out_of_time = True
+                break
+            try:
+                forecast = fit_model(name, train).forecast(len(actual))['FORECAST'].values
+                scores[name][origin] = np.mean(np.abs(actual - forecast))
+                scored.append(name)
+            except Exception:
+                failed.append(name)
+        
+        # Only models that failed drop out; those the budget did not reach
+        # keep their place and are judged on the origins they share
+        if scored:
+            alive = [name for name in alive if name not in failed]
+            mae = _shared_mae(scores, [name for name in alive if scores[name]])
+            best = min(mae.values())
+            alive = [name for name in alive if name not in mae or mae[name] <= best * PRUNE_RATIO]
+        if out_of_time or not scored:
+            break
+    
+    evaluated = sum(len(s) for s in scores.values())
+    if evaluated == 0:
+        return {'MODEL': 'arima', 'MAE': np.nan, 'EVALUATED': 0, 'SECONDS': time.perf_counter() - start}
+    
+    mae = _shared_mae(scores, [name for name in alive if scores[name]])
+    winner = min(mae, key=mae.get)
+    return {
+        'MODEL': winner,
+        'MAE': float(np.mean(list(scores[winner].values()))),
+        'EVALUATED': evaluated,
+        'SECONDS': time.perf_counter() - start
+    }
+
+def _warm_worker():
+    # Keep library import time out of each series' fitting budget; only a
+    # worker's first task pays for the imports
+    from scipy.stats import norm
+    from statsmodels.tsa.arima.model import ARIMA
+    from statsmodels.tsa.exponential_smoothing.ets import ETSModel
+
+def _tournament_task(task):
+    key, ts_data, time_budget = task
+    _warm_worker()
+    result = run_series_tournament(ts_data, time_budget=time_budget)
+    result.update(dict(zip(SERIES_KEYS, key)))
+    result['FINGERPRINT'] = series_fingerprint(ts_data)
+    return result
+
+def run_tournament(df, time_budget=TIME_BUDGET, max_workers=None, executor=None):
+    from executors import get_executor
+    
+    tasks = []
+    for key, series_data in df.groupby(SERIES_KEYS):
+        ts_data = series_data.groupby('YEAR_MONTH')['TOTAL_COST'].sum().reset_index()
+        tasks.append((key, ts_data, time_budget))
+    
+    with get_executor(executor, max_workers, cpu_bound=True) as pool:
+        results = pool.map(_tournament_task, tasks)
+    
+    return pd.DataFrame(results, columns=SERIES_KEYS + ['MODEL', 'MAE', 'EVALUATED', 'SECONDS', 'FINGERPRINT'])
+
+def load_selections(path=SELECTION_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_selections(selections_df, path=SELECTION_PATH):
+    with _selection_lock:
+        selections = load_selections(path)
+        for row in selections_df.to_dict('records'):
+            selections['|'.join(row[k] for k in SERIES_KEYS)] = {
+                'model': row['MODEL'],
+                'mae': row['MAE'],
+                'fingerprint': row['FINGERPRINT']
+            }
+        
+        # Written aside and renamed, so a reader never sees a partial file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = temp_path(path)
+        with open(tmp, 'w') as f:
+            json.dump(selections, f, indent=1)
+        os.replace(tmp, path)
+    return selections
+
+def selected_model(selections, key, ts_data):
+    # A stored winner only applies to the exact data it was selected on
+    entry = selections.get('|'.join(key))
+    if entry is None or entry['fingerprint'] != series_fingerprint(ts_data):
+        return None
+    return entry['model']
+
+if __name__ == "__main__":
+    from utils import load_data
+    
+    df, data_type = load_data()
+    results = run_tournament(df)
+    save_selections(results)
+    print(results.groupby('MODEL').size().to_string())
+    print(f"Saved {len(results)} selections to {SELECTION_PATH}")
@@ -0,0 +1,342 @@
+import hashlib
+import json
+import struct
+import threading
+import warnings
+import numpy as np
+import pandas as pd
+
+from result_cache import SingleFlightCache
+
+ARIMA_ORDERS = [(1,1,1), (2,1,1), (1,0,1), (0,1,1), (1,1,0)]
+BACKTEST_PERIODS = 12
+
+# Online updates keep the estimated parameters until one of these fires
+REFIT_EVERY = 12
+DRIFT_Z = 3.0
+DRIFT_WINDOW = 6
+
+class FittedArima:
+    def __init__(self, results, order, last_date, months_since_refit=0, model_name='arima'):
+        self.results = results
+        self.order = order
+        self.model_name = model_name
+        self.aic = results.aic
+        self.n_obs = int(results.nobs)
+        self.last_date = last_date
+        self.months_since_refit = months_since_refit
+
+    def forecast(self, forecast_periods=5, alpha=0.05):
+        forecast_result = self.results.get_forecast(steps=forecast_periods)
+        forecast = forecast_result.predicted_mean
+        conf_int = forecast_result.conf_int(alpha=alpha)
+
+        forecast_dates = pd.date_range(
+            start=self.last_date + pd.DateOffset(months=1),
+            periods=forecast_periods,
+            freq='MS'
+        )
+
+        return pd.DataFrame({
+            'YEAR_MONTH': forecast_dates,
+            'FORECAST': forecast.values,
+            'CONFIDENCE_LOWER': conf_int.iloc[:, 0].values,
+            'CONFIDENCE_UPPER': conf_int.iloc[:, 1].values
+        })
+
+    def update(self, new_ts_data):
+        # Runs the Kalman filter over the new months with the current
+        # parameters; no likelihood optimisation takes place.
+        results = self.results.append(new_ts_data['TOTAL_COST'].values, refit=False)
+        return FittedArima(
+            results,
+            self.order,
+            new_ts_data['YEAR_MONTH'].iloc[-1],
+            self.months_since_refit + len(new_ts_data),
+            self.model_name
+        )
+
+    def residuals(self):
+        # One-step-ahead in-sample errors, one per observed month
+        return np.asarray(self.results.resid, dtype=float)
+
+    def recent_errors(self):
+        errors = self.results.standardized_forecasts_error[0]
+        return errors[-min(DRIFT_WINDOW, self.months_since_refit):] if self.months_since_refit > 0 else errors[:0]
+
+    def drift_detected(self):
+        return drift_in(self.recent_errors())
+
+    def needs_refit(self):
+        return self.months_since_refit >= REFIT_EVERY or self.drift_detected()
+
+    def artifact(self):
+        return ArimaArtifact.from_fitted(self)
+
+def drift_in(recent):
+    recent = np.asarray(recent)
+    recent = recent[np.isfinite(recent)]
+    if len(recent) == 0:
+        return False
+    jump = np.abs(recent).max() > DRIFT_Z
+    level_shift = abs(recent.mean()) * np.sqrt(len(recent)) > DRIFT_Z
+    return bool(jump or level_shift)
+
+class ArimaArtifact:
+    # What a fitted ARIMA needs to forecast, without the data, covariance
+    # matrices and filter output statsmodels keeps: the order and parameters
+    # rebuild the state-space matrices, and the predicted state and its
+    # covariance after the last month carry the history. The in-sample
+    # residuals are kept too, since reconciliation estimates covariances from them
+    def __init__(self, order, seasonal_order, trend, params, state, state_cov, last_date, diagnostics,
+                 months_since_refit=0, recent=(), model_name='arima', resid=()):
+        self.order = tuple(order)
+        self.seasonal_order = tuple(seasonal_order)
+        self.trend = trend
+        self.params = np.asarray(params, dtype=float)
+        self.state = np.asarray(state, dtype=float)
+        self.state_cov = np.asarray(state_cov, dtype=float)
+        self.last_date = pd.Timestamp(last_date)
+        self.diagnostics = diagnostics
+        self.aic = diagnostics['aic']
+        self.n_obs = diagnostics['n_obs']
+        self.months_since_refit = months_since_refit
+        self.recent = np.asarray(recent, dtype=float)
+        self.model_name = model_name
+        self.resid = np.asarray(resid, dtype=float)
+        self._system = None
+
+    @classmethod
+    def from_fitted(cls, fitted):
+        results = fitted.results
+        return cls(
+            fitted.order,
+            results.model.seasonal_order,
+            results.model.trend,
+            results.params,
+            results.predicted_state[:, -1],
+            results.predicted_state_cov[:, :, -1],
+            fitted.last_date,
+            {'aic': float(results.aic), 'bic': float(results.bic), 'llf': float(results.llf), 'n_obs': int(results.nobs)},
+            fitted.months_since_refit,
+            fitted.recent_errors(),
+            fitted.model_name,
+            fitted.residuals()
+        )
+
+    def system(self):
+        if self._system is None:
+            from statsmodels.tsa.arima.model import ARIMA
+            warnings.filterwarnings('ignore')
+            
+            model = ARIMA(np.zeros(2), order=self.order, seasonal_order=self.seasonal_order, trend=self.trend)
+            model.update(self.params)
+            ssm = model.ssm
+            # A constant enters as a regression, so its intercept varies by month in form only
+            self._system = (
+                ssm['design'].reshape(1, -1),
+                float(np.ravel(ssm['obs_intercept'])[-1]),
+                float(ssm['obs_cov'].ravel()[0]),
+                ssm['transition'].copy(),
+                ssm['state_intercept'].ravel().copy(),
+                ssm['selection'] @ ssm['state_cov'] @ ssm['selection'].T
+            )
+        return self._system
+
+    def forecast(self, forecast_periods=5, alpha=0.05):
+        from scipy.stats import norm
+        
+        Z, d, H, T, c, RQR = self.system()
+        a, P = self.state, self.state_cov
+        means = np.empty(forecast_periods)
+        variances = np.empty(forecast_periods)
+        for h in range(forecast_periods):
+            means[h] = (Z @ a)[0] + d
+            variances[h] = (Z @ P @ Z.T)[0, 0] + H
+            a = T @ a + c
+            P = T @ P @ T.T + RQR
+        width = norm.ppf(1 - alpha / 2) * np.sqrt(variances)
+        
+        return pd.DataFrame({
+            'YEAR_MONTH': pd.date_range(start=self.last_date + pd.DateOffset(months=1), periods=forecast_periods, freq='MS'),
+            'FORECAST': means,
+            'CONFIDENCE_LOWER': means - width,
+            'CONFIDENCE_UPPER': means + width
+        })
+
+    def update(self, new_ts_data):
+        # The same Kalman filter step FittedArima.update runs, on the stored state
+        Z, d, H, T, c, RQR = self.system()
+        a, P = self.state, self.state_cov
+        errors = []
+        resid = []
+        for y in new_ts_data['TOTAL_COST'].values:
+            v = y - (Z @ a)[0] - d
+            F = (Z @ P @ Z.T)[0, 0] + H
+            gain = P @ Z.T[:, 0] / F
+            a = T @ (a + gain * v) + c
+            P = T @ (P - np.outer(gain, Z @ P)) @ T.T + RQR
+            errors.append(v / np.sqrt(F))
+            resid.append(v)
+        
+        diagnostics = dict(self.diagnostics, n_obs=self.n_obs + len(new_ts_data))
+        updated = ArimaArtifact(
+            self.order, self.seasonal_order, self.trend, self.params, a, (P + P.T) / 2,
+            new_ts_data['YEAR_MONTH'].iloc[-1], diagnostics, self.months_since_refit + len(new_ts_data),
+            np.concatenate([self.recent, errors])[-DRIFT_WINDOW:], self.model_name,
+            np.concatenate([self.resid, resid])
+        )
+        updated._system = self._system
+        return updated
+
+    def residuals(self):
+        return self.resid
+
+    def drift_detected(self):
+        return drift_in(self.recent[-min(DRIFT_WINDOW, self.months_since_refit):] if self.months_since_refit > 0 else [])
+
+    def needs_refit(self):
+        return self.months_since_refit >= REFIT_EVERY or self.drift_detected()
+
+    def to_bytes(self):
+        # A short JSON header, then the parameters, state, upper triangle of
+        # the state covariance, recent errors and residuals as float64
+        k = len(self.state)
+        header = json.dumps({
+            'o': self.order, 's': self.seasonal_order, 't': self.trend, 'm': self.model_name,
+            'd': self.last_date.strftime('%Y-%m-%d'), 'r': self.months_since_refit,
+            'n': [len(self.params), k, len(self.recent), len(self.resid)], 'x': self.diagnostics
+        }, separators=(',', ':')).encode()
+        arrays = np.concatenate([self.params, self.state, self.state_cov[np.triu_indices(k)], self.recent, self.resid])
+        return struct.pack('<H', len(header)) + header + arrays.astype('<f8').tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        (length,) = struct.unpack_from('<H', data)
+        header = json.loads(data[2:2 + length])
+        n_params, k, n_recent, n_resid = header['n']
+        arrays = np.frombuffer(data, dtype='<f8', offset=2 + length)
+        
+        state_cov = np.zeros((k, k))
+        rows, cols = np.triu_indices(k)
+        n_cov = len(rows)
+        state_cov[rows, cols] = arrays[n_params + k:n_params + k + n_cov]
+        state_cov[cols, rows] = state_cov[rows, cols]
+        recent_end = n_params + k + n_cov + n_recent
+        return cls(
+            header['o'], header['s'], header['t'],
+            arrays[:n_params], arrays[n_params:n_params + k], state_cov,
+            header['d'], header['x'], header['r'],
+            arrays[n_params + k + n_cov:recent_end], header['m'], arrays[recent_end:recent_end + n_resid]
+        )
+
+def fit_arima(ts_data):
+    from statsmodels.tsa.arima.model import ARIMA
+    # statsmodels installs its own warning filters on first import
+    warnings.filterwarnings('ignore')
+
+    if len(ts_data) < 3:
+        raise ValueError("Insufficient data for ARIMA modeling. Need at least 3 data points.")
+
+    best_model = None
+    best_order = None
+    best_aic = float('inf')
+
+    for order in ARIMA_ORDERS:
+        try:
+            model = ARIMA(ts_data['TOTAL_COST'], order=order)
+            fitted_model = model.fit()
+            if fitted_model.aic < best_aic:
+                best_aic = fitted_model.aic
+                best_model = fitted_model
+                best_order = order
+        except:
+            continue
+
+    if best_model is None:
+        raise ValueError("All ARIMA models failed to converge. Cannot generate forecast.")
+
+    return FittedArima(best_model, best_order, ts_data['YEAR_MONTH'].iloc[-1])
+
+def refresh_model(model, ts_data, fit=fit_arima):
+    new_data = ts_data[ts_data['YEAR_MONTH'] > model.last_date]
+    if new_data.empty:
+        return model
+    
+    updated = model.update(new_data)
+    if updated.needs_refit():
+        return fit(ts_data)
+    return updated
+
+def series_fingerprint(ts_data):
+    hashed = pd.util.hash_pandas_object(ts_data[['YEAR_MONTH', 'TOTAL_COST']], index=False)
+    return hashlib.sha1(hashed.values.tobytes()).hexdigest()
+
+def backtest_split(ts_data):
+    # The holdout is fixed per series so every forecast horizon is scored
+    # against the same fitted model instead of refitting per slider value.
+    test_periods = min(BACKTEST_PERIODS, len(ts_data) - 3)
+    return ts_data.iloc[:-test_periods], ts_data.iloc[-test_periods:]
+
+class ModelRegistry:
+    def __init__(self, max_entries=4096, compact=False):
+        # Fits are keyed on the series content, so sessions looking at the same
+        # data share them; concurrent requests for one fit wait on a single run.
+        # A compact registry keeps ArimaArtifacts, which forecast, update and
+        # give residuals but hold no other statsmodels results.
+        self._fits = SingleFlightCache(max_entries)
+        self.compact = compact
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key, ts_data, fit):
+        fingerprint = series_fingerprint(ts_data)
+        entry = self._fits.get_or_compute((key, fingerprint), lambda: self._fit_entry(key, ts_data, fit, fingerprint))
+
+        if entry['error'] is not None:
+            raise entry['error']
+        return entry['model']
+
+    def _fit_entry(self, key, ts_data, fit, fingerprint):
+        with self._lock:
+            previous = self._latest.get(key)
+        
+        try:
+            # Only state-space models can take new months without refitting
+            if previous is not None and previous['model'] is not None and hasattr(previous['model'], 'update') and self._extends(previous, ts_data):
+                model = refresh_model(previous['model'], ts_data, fit)
+            else:
+                model = fit(ts_data)
+            if self.compact and hasattr(model, 'artifact'):
+                model = model.artifact()
+            entry = {'fingerprint': fingerprint, 'n_obs': len(ts_data), 'model': model, 'error': None}
+        except ValueError as e:
+            entry = {'fingerprint': fingerprint, 'n_obs': len(ts_data), 'model': None, 'error': e}
+        
+        with self._lock:
+            self._latest[key] = entry
+        return entry
+
+    def _extends(self, entry, ts_data):
+        # New months may only be appended; any revision to history needs a refit
+        n_obs = entry['n_obs']
+        return len(ts_data) > n_obs and series_fingerprint(ts_data.iloc[:n_obs]) == entry['fingerprint']
+
+    def get(self, key, ts_data, fit=fit_arima):
+        return self._lookup(('full', fit.__name__) + tuple(key), ts_data, fit)
+
+    def peek(self, key, ts_data, fit=fit_arima):
+        # Returns the fit only if it is already cached; never starts one
+        entry = self._fits.get((('full', fit.__name__) + tuple(key), series_fingerprint(ts_data)))
+        if entry is None:
+            return None
+        if entry['error'] is not None:
+            raise entry['error']
+        return entry['model']
+
+    def get_backtest(self, key, ts_data, fit=fit_arima):
+        train, test = backtest_split(ts_data)
+        return self._lookup(('backtest', fit.__name__) + tuple(key), train, fit), test
+
+    def __len__(self):
+        return len(self._fits)
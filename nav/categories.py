@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+from data_access import dataset_version, get_backend
+from rendering import render_chart
 
 def category_analysis(df):
     st.markdown('<h1 class="main-header">Categories</h1>', unsafe_allow_html=True)
@@ -26,10 +28,12 @@ def category_analysis(df):
         return
     
     filtered_df = df[df['BNF_CHAPTER_PLUS_CODE'].isin(selected_categories)]
-    category_totals = filtered_df.groupby('BNF_CHAPTER_PLUS_CODE')['TOTAL_COST'].sum().sort_values(ascending=False)
+    backend = get_backend(df)
+    category_totals = backend.category_totals(categories=selected_categories).sort_values(ascending=False)
     
     category_overview(filtered_df, category_totals)
-    category_trends(filtered_df, category_totals, selected_categories)
+    category_trends(backend.monthly_category_totals(categories=selected_categories), category_totals, selected_categories,
+                    dataset_version(df))
     
 
 def category_overview(filtered_df, category_totals):
@@ -70,35 +74,37 @@ def category_overview(filtered_df, category_totals):
         st.metric("Average", f"\u00a3{avg_cost:,.0f}")
         st.metric("Records", f"{total_records:,}")
 
-def category_trends(filtered_df, category_totals, selected_categories):
+def category_trends(time_category, category_totals, selected_categories, version):
     st.subheader("Trends Over Time")
     
-    time_category = filtered_df.groupby(['YEAR_MONTH', 'BNF_CHAPTER_PLUS_CODE'])['TOTAL_COST'].sum().reset_index()
-    
     st.markdown("**Over Time**")
     top_categories_for_trends = category_totals.head(min(8, len(selected_categories))).index
     time_category_filtered = time_category[time_category['BNF_CHAPTER_PLUS_CODE'].isin(top_categories_for_trends)]
     
     if len(time_category_filtered) > 0:
-        fig_time = px.line(
-            time_category_filtered,
-            x='YEAR_MONTH',
-            y='TOTAL_COST',
-            color='BNF_CHAPTER_PLUS_CODE',
-            title=f"Top {len(top_categories_for_trends)} Category Costs Over Time",
-            labels={'TOTAL_COST': 'Total Cost (£)', 'YEAR_MONTH': 'Date'},
-            color_discrete_sequence=['#AED6F1', '#F9E79F', '#ABEBC6', '#F5B7B1', '#D2B4DE', '#F0B27A', '#A9DFBF', '#D5DBDB']
-        )
+        def build_chart():
+            fig_time = px.line(
+                time_category_filtered,
+                x='YEAR_MONTH',
+                y='TOTAL_COST',
+                color='BNF_CHAPTER_PLUS_CODE',
+                title=f"Top {len(top_categories_for_trends)} Category Costs Over Time",
+                labels={'TOTAL_COST': 'Total Cost (£)', 'YEAR_MONTH': 'Date'},
+                color_discrete_sequence=['#AED6F1', '#F9E79F', '#ABEBC6', '#F5B7B1', '#D2B4DE', '#F0B27A', '#A9DFBF', '#D5DBDB']
+            )
         
-        fig_time.update_layout(
-            height=500,
-            legend_title="BNF Categories",
-            legend=dict(orientation="v", yanchor="top", y=1, xanchor="left", x=1.02),
-            margin=dict(r=200)
-        )
+            fig_time.update_layout(
+                height=500,
+                legend_title="BNF Categories",
+                legend=dict(orientation="v", yanchor="top", y=1, xanchor="left", x=1.02),
+                margin=dict(r=200)
+            )
+        
+            fig_time.update_traces(line=dict(width=3), marker=dict(size=6))
+            return fig_time
         
-        fig_time.update_traces(line=dict(width=3), marker=dict(size=6))
-        st.plotly_chart(fig_time, use_container_width=True)
+        key = ('category_trends', version, tuple(sorted(selected_categories)))
+        render_chart("Category Trends", build_chart, key=key, use_container_width=True)
     
     st.subheader("Seasonal & Annual")
     
@@ -6,6 +6,7 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 from sklearn.cluster import AgglomerativeClustering
 from utils import REGION_COORDINATES
+from data_access import dataset_version
 
 def clustering_analysis(df):
     st.markdown('<h1 class="main-header">Grouping</h1>', unsafe_allow_html=True)
@@ -13,31 +14,44 @@ def clustering_analysis(df):
     This page uses <b>hierarchical clustering</b> to group regions and BNF categories based on their cost patterns. Similar groups are placed together to help you spot patterns and similarities.
     """, unsafe_allow_html=True)
     
+    regional_grouping(df)
+    st.markdown("---")
+    st.subheader("BNF Category Grouping")
+    category_grouping(df)
+
+# Each slider only reruns its own section
+@st.fragment
+def regional_grouping(df):
     n_clusters = st.slider("Groups", 2, 6, 4)
     
     try:
         regional_clustering(df, n_clusters)
     except Exception as e:
         st.error(f"Error: {str(e)}")
-    st.markdown("---")
-    st.subheader("BNF Category Grouping")
+
+@st.fragment
+def category_grouping(df):
     n_cat_clusters = st.slider("Category Groups", 2, 6, 4, key="cat_clusters")
     try:
         bnf_category_clustering(df, n_cat_clusters)
     except Exception as e:
         st.error(f"Error in BNF category grouping: {str(e)}")
 
+@st.cache_data(show_spinner=False)
+def load_group_features(_df, version, group_col):
+    features = _df.groupby(group_col).agg({
+        'TOTAL_COST': ['sum', 'mean', 'std', 'count']
+    }).round(2)
+    features.columns = ['Total_Cost', 'Mean_Cost', 'Std_Cost', 'Record_Count']
+    features = features.reset_index()
+    
+    features['Cost_Per_Record'] = features['Total_Cost'] / features['Record_Count']
+    features['Cost_Variability'] = features['Std_Cost'] / features['Mean_Cost']
+    return features.fillna(0)
+
 def regional_clustering(df, n_clusters):
     try:
-        regional_features = df.groupby('REGIONAL_OFFICE_NAME').agg({
-            'TOTAL_COST': ['sum', 'mean', 'std', 'count']
-        }).round(2)
-        regional_features.columns = ['Total_Cost', 'Mean_Cost', 'Std_Cost', 'Record_Count']
-        regional_features = regional_features.reset_index()
-        
-        regional_features['Cost_Per_Record'] = regional_features['Total_Cost'] / regional_features['Record_Count']
-        regional_features['Cost_Variability'] = regional_features['Std_Cost'] / regional_features['Mean_Cost']
-        regional_features = regional_features.fillna(0)
+        regional_features = load_group_features(df, dataset_version(df), 'REGIONAL_OFFICE_NAME')
         
         feature_cols = ['Total_Cost', 'Mean_Cost', 'Cost_Variability', 'Cost_Per_Record']
         X = regional_features[feature_cols].fillna(0)
@@ -174,14 +188,7 @@ def bnf_category_clustering(df, n_clusters):
     from sklearn.preprocessing import StandardScaler
     from sklearn.decomposition import PCA
     from sklearn.cluster import AgglomerativeClustering
-    bnf_features = df.groupby('BNF_CHAPTER_PLUS_CODE').agg({
-        'TOTAL_COST': ['sum', 'mean', 'std', 'count']
-    }).round(2)
-    bnf_features.columns = ['Total_Cost', 'Mean_Cost', 'Std_Cost', 'Record_Count']
-    bnf_features = bnf_features.reset_index()
-    bnf_features['Cost_Per_Record'] = bnf_features['Total_Cost'] / bnf_features['Record_Count']
-    bnf_features['Cost_Variability'] = bnf_features['Std_Cost'] / bnf_features['Mean_Cost']
-    bnf_features = bnf_features.fillna(0)
+    bnf_features = load_group_features(df, dataset_version(df), 'BNF_CHAPTER_PLUS_CODE')
     feature_cols = ['Total_Cost', 'Mean_Cost', 'Cost_Variability', 'Cost_Per_Record']
     X = bnf_features[feature_cols].fillna(0)
     if len(X) > 0 and X.std().sum() > 0:
@@ -1,41 +1,80 @@
 import streamlit as st
 import plotly.express as px
-from utils import create_map
-from config import create_region_selector
+from utils import MAP_MODE, create_map, region_geometries
+from geometry import REGIONS_GEOJSON, geojson_signature
+from config import create_region_selector, get_model_registry
+from data_access import dataset_version, get_backend
+from rendering import render_chart
+from prefetch import foreground, get_prefetcher
 
 def dashboard(df):
     st.markdown('<h1 class="main-header">NHS Dashboard</h1>', unsafe_allow_html=True)
     
+    region_overview(df)
+    time_series_overview(df)
+
+def forecast_prefetch_job(df, region, registry):
+    # The Forecast page opens on this region, so its models are fitted while
+    # the analyst reads the dashboard. The page module is imported here, off
+    # the script thread, so the dashboard still loads without it.
+    def job():
+        from nav.forecasting import region_forecast_job
+        yield
+        yield from region_forecast_job(df, region, registry)()
+    return job
+
+# Picking a region redraws the map and comparisons but not the national trend
+@st.fragment
+@foreground
+def region_overview(df):
     selected_region = create_region_selector(df)
+    backend = get_backend(df)
+    region_totals = backend.region_totals()
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
         st.subheader("Region Map")
-        map_fig = create_map(df, selected_region)
-        st.plotly_chart(map_fig, use_container_width=True)
+        try:
+            geometries = region_geometries()
+            if geometries is None and MAP_MODE != "tiles":
+                st.warning(f"No region boundary file at {REGIONS_GEOJSON}, so regions are shown as points. "
+                           "See 'Region boundaries' in the README to add one.")
+        except (OSError, ValueError) as e:
+            st.warning(f"Could not read the region boundaries, showing region points instead: {str(e)}")
+            geometries = None
+        focus = geometries is not None and st.checkbox("Zoom to selected region")
+        try:
+            render_chart(
+                "Region Map",
+                lambda: create_map(df, selected_region, geometries, focus),
+                key=('region_map', dataset_version(df), selected_region, focus, MAP_MODE, geometries is not None and geojson_signature()),
+                use_container_width=True
+            )
+        except ValueError as e:
+            st.warning(f"Could not draw region boundaries: {str(e)}")
+            render_chart("Region Map", create_map(df, selected_region), use_container_width=True)
     
     with col2:
         st.subheader("Key Numbers")
         
-        region_data = df[df['REGIONAL_OFFICE_NAME'] == selected_region]
-        total_cost = region_data['TOTAL_COST'].sum()
-        monthly_avg = region_data.groupby('YEAR_MONTH')['TOTAL_COST'].sum().mean()
+        region_monthly = backend.monthly_totals(region=selected_region)
+        total_cost = region_monthly['TOTAL_COST'].sum()
+        monthly_avg = region_monthly['TOTAL_COST'].mean()
         
         st.metric("Total Cost", f"\u00a3{total_cost:,.0f}")
         st.metric("Monthly Avg", f"\u00a3{monthly_avg:,.0f}")
         
-        region_totals = df.groupby('REGIONAL_OFFICE_NAME')['TOTAL_COST'].sum()
         rank = region_totals.rank(ascending=False)[selected_region]
         st.metric("Rank", f"#{rank:.0f}")
         
-        market_share = (total_cost / df['TOTAL_COST'].sum()) * 100
+        market_share = (total_cost / region_totals.sum()) * 100
         st.metric("Share", f"{market_share:.1f}%")
     
     st.markdown("---")
     
     st.subheader("Compare Regions")
-    region_totals = df.groupby('REGIONAL_OFFICE_NAME')['TOTAL_COST'].sum().sort_values(ascending=True)
+    region_totals = region_totals.sort_values(ascending=True)
     
     colors = ['#FF6B6B' if region == selected_region else '#4ECDC4' for region in region_totals.index]
     
@@ -60,17 +99,17 @@ def dashboard(df):
     )
     st.plotly_chart(fig, use_container_width=True)
     
-    time_series_overview(df)
+    get_prefetcher().submit(('forecast', dataset_version(df), selected_region), forecast_prefetch_job(df, selected_region, get_model_registry()))
 
 def time_series_overview(df):
     st.subheader("Monthly Trends")
     
-    monthly_totals = df.groupby('YEAR_MONTH')['TOTAL_COST'].sum().reset_index()
+    monthly_totals = get_backend(df).monthly_totals()
 
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        total_cost_all = df['TOTAL_COST'].sum()
+        total_cost_all = monthly_totals['TOTAL_COST'].sum()
         st.metric("Total Cost", f"\u00a3{total_cost_all:,.0f}")
     
     with col2:
@@ -82,21 +121,23 @@ def time_series_overview(df):
                       monthly_totals['TOTAL_COST'].iloc[0] * 100)
         st.metric("Growth", f"{growth_rate:.1f}%")
     
-    fig = px.line(
-        monthly_totals,
-        x='YEAR_MONTH',
-        y='TOTAL_COST',
-        title="Total Monthly NHS Prescription Costs",
-        labels={'TOTAL_COST': 'Total Cost (£)', 'YEAR_MONTH': 'Date'}
-    )
-    
-    fig.update_traces(line=dict(width=3, color='#1f77b4'))
-    fig.update_layout(
-        height=400,
-        template='plotly_white',
-        xaxis=dict(showgrid=True),
-        yaxis=dict(showgrid=True)
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
+    def build_chart():
+        fig = px.line(
+            monthly_totals,
+            x='YEAR_MONTH',
+            y='TOTAL_COST',
+            title="Total Monthly NHS Prescription Costs",
+            labels={'TOTAL_COST': 'Total Cost (£)', 'YEAR_MONTH': 'Date'}
+        )
+    
+        fig.update_traces(line=dict(width=3, color='#1f77b4'))
+        fig.update_layout(
+            height=400,
+            template='plotly_white',
+            xaxis=dict(showgrid=True),
+            yaxis=dict(showgrid=True)
+        )
+        return fig
+    
+    render_chart("Monthly Trends", build_chart, key=('monthly_trends', dataset_version(df)), use_container_width=True)
     
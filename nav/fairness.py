@@ -1,6 +1,29 @@
 import streamlit as st
+import plotly.express as px
 import plotly.graph_objects as go
-from utils import gen_real_pred_errors, calc_fairness_metrics
+from utils import shared_pred_errors, pred_errors_ready, start_pred_errors, calc_fairness_cube
+from data_access import dataset_version
+from config import FORECAST_ENGINES
+
+DIMENSION_LABELS = {
+    'Region': 'REGIONAL_OFFICE_NAME',
+    'BNF Category': 'BNF_CATEGORY',
+    'Cost Tier': 'COST_TIER'
+}
+
+# The accuracy sweep runs one engine over every series, so per-series model
+# choices do not apply here
+SWEEP_ENGINES = {label: engine for label, engine in FORECAST_ENGINES.items() if engine != "selected"}
+
+# Seconds between provisional charts while the sweep runs
+PROGRESS_INTERVAL = 1.0
+
+# Keyed on the dataset version rather than hashing the frame; the sweep itself
+# is shared across sessions and kept on disk by shared_pred_errors
+@st.cache_data(show_spinner="Checking forecast accuracy for every region and category...")
+def load_fairness_results(_df, version, engine='arima'):
+    df_errors = shared_pred_errors(_df, engine=engine)
+    return df_errors, calc_fairness_cube(df_errors)
 
 def fairness_analysis(df):
     st.markdown('<h1 class="main-header">Fairness</h1>', unsafe_allow_html=True)
@@ -14,7 +37,15 @@ def fairness_analysis(df):
     <span style='color:green;'><b>Green</b></span> means good (low error or bias). <span style='color:red;'><b>Red</b></span> means worse.<br>
     </div>
     """, unsafe_allow_html=True)
-    df_errors = gen_real_pred_errors(df)
+    engine = SWEEP_ENGINES[st.radio(
+        "Forecast Model:",
+        list(SWEEP_ENGINES.keys()),
+        horizontal=True,
+        key="fairness_engine"
+    )]
+    if not pred_errors_ready(df, engine=engine):
+        stream_fairness_results(df, engine)
+    df_errors, cube = load_fairness_results(df, dataset_version(df), engine)
     if df_errors.empty:
         st.warning("Not enough data to compute real model fairness metrics. Please ensure there is sufficient historical data for each region and category.")
         return
@@ -23,8 +54,35 @@ def fairness_analysis(df):
     st.markdown("We check if the model is equally accurate and unbiased for all regions. Lower error and bias are better.")
     regional_analysis(df_errors)
     st.markdown("---")
+    st.markdown("### Combined Groups")
+    st.markdown("We check groups that combine region, BNF category and cost tier, e.g. high-cost cardiovascular spending in London.")
+    intersectional_analysis(cube)
+
+def stream_fairness_results(df, engine):
+    # The first sweep over new data can take minutes; draw the regional charts
+    # from the series finished so far instead of a bare spinner. The sweep runs
+    # on its own thread, so a rerun here only stops this session watching it.
+    progress = st.empty()
+    charts = st.empty()
+    sweep = start_pred_errors(df, engine=engine)
+    shown = 0
+    
+    with st.spinner("Checking forecast accuracy for every region and category..."):
+        while not sweep.wait(PROGRESS_INTERVAL):
+            summary, n_series = sweep.regional_summary()
+            if sweep.total:
+                progress.progress(sweep.completed / sweep.total, text=f"Checked {sweep.completed:,} of {sweep.total:,} region and category series...")
+            if n_series > shown:
+                shown = n_series
+                with charts.container():
+                    regional_analysis(summary, provisional=n_series)
+    progress.empty()
+    charts.empty()
+    if sweep.error is not None:
+        raise sweep.error
 
-def regional_analysis(df_errors):
+def regional_analysis(df_errors, provisional=None):
+    # `provisional` is the number of series behind a partial result
     col1, col2 = st.columns(2)
     
     with col1:
@@ -49,7 +107,7 @@ def regional_analysis(df_errors):
         ])
         
         fig_accuracy.update_layout(
-            title="Mean Absolute Error by Region",
+            title="Mean Absolute Error by Region" + (f" (provisional, {provisional} series)" if provisional else ""),
             xaxis_title="Mean Absolute Error (£)",
             yaxis_title="Region",
             height=500,
@@ -80,7 +138,7 @@ def regional_analysis(df_errors):
         fig_bias.add_vline(x=0, line=dict(color="black", width=2))
         
         fig_bias.update_layout(
-            title="Prediction Bias by Region",
+            title="Prediction Bias by Region" + (f" (provisional, {provisional} series)" if provisional else ""),
             xaxis_title="Prediction Bias (£)",
             yaxis_title="Region",
             height=500,
@@ -89,3 +147,68 @@ def regional_analysis(df_errors):
         
         st.plotly_chart(fig_bias, use_container_width=True)
 
+@st.fragment
+def intersectional_analysis(cube):
+    selected_labels = st.multiselect(
+        "Group by:",
+        list(DIMENSION_LABELS.keys()),
+        default=['Region', 'BNF Category'],
+        key="fairness_dimensions"
+    )
+
+    if not selected_labels:
+        st.warning("Select at least one grouping.")
+        return
+    
+    dims = tuple(dim for label, dim in DIMENSION_LABELS.items() if label in selected_labels)
+    result = cube[dims]
+    parity_df = result['parity_df']
+    tests = result['statistical_tests']
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("Groups", len(parity_df))
+    
+    with col2:
+        st.metric("Error Gap", f"{result['parity_gap'] * 100:.1f}%")
+    
+    with col3:
+        differs = tests['kw_p_mae'] < 0.05 or tests['kw_p_bias'] < 0.05
+        st.metric("Groups Differ?", "Yes" if differs else "No")
+    
+    st.caption("Error gap is the difference in relative error between the best and worst group. 'Groups Differ?' is Yes when the differences are unlikely to be chance.")
+    
+    if len(dims) == 2:
+        heatmap_data = parity_df.pivot(index=dims[0], columns=dims[1], values='Relative_Error_Rate') * 100
+        fig = px.imshow(
+            heatmap_data,
+            color_continuous_scale='RdYlGn_r',
+            labels={'color': 'Relative Error (%)'},
+            title="Relative Error by Group",
+            aspect='auto'
+        )
+        fig.update_layout(height=max(400, len(heatmap_data) * 35), template='plotly_white')
+        st.plotly_chart(fig, use_container_width=True)
+    elif len(dims) == 1:
+        ranked = parity_df.sort_values('Relative_Error_Rate')
+        fig = px.bar(
+            x=ranked['Relative_Error_Rate'].values * 100,
+            y=ranked[dims[0]].values,
+            orientation='h',
+            color=ranked['Relative_Error_Rate'].values,
+            color_continuous_scale='RdYlGn_r',
+            labels={'x': 'Relative Error (%)', 'y': selected_labels[0]},
+            title="Relative Error by Group"
+        )
+        fig.update_layout(height=max(400, len(ranked) * 30), template='plotly_white', coloraxis_showscale=False)
+        st.plotly_chart(fig, use_container_width=True)
+    
+    st.markdown("**Worst Groups**")
+    display_df = parity_df.nlargest(10, 'Relative_Error_Rate').copy()
+    display_df['Relative_Error_Rate'] = display_df['Relative_Error_Rate'].apply(lambda x: f"{x * 100:.1f}%")
+    display_df['MAE_Mean'] = display_df['MAE_Mean'].apply(lambda x: f"£{x:,.0f}")
+    display_df['Bias_Mean'] = display_df['Bias_Mean'].apply(lambda x: f"£{x:,.0f}")
+    display_df = display_df.drop(columns=['High_Cost_Rate'])
+    display_df.columns = [label for label in DIMENSION_LABELS if DIMENSION_LABELS[label] in dims] + ['Series', 'Relative Error', 'Avg Error', 'Avg Bias']
+    st.dataframe(display_df, use_container_width=True, hide_index=True)
@@ -1,8 +1,31 @@
+import time
 import streamlit as st
+import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from utils import train_arima
-from config import create_region_selector
+from models import BACKTEST_PERIODS
+from hierarchy import hierarchical_forecast, select_node
+from model_selection import CANDIDATES, load_selections, run_tournament, save_selections, selected_model
+from config import FORECAST_ENGINES, create_region_selector, get_global_forecaster, get_model_registry
+from rendering import render_chart
+from data_access import dataset_version
+from executors import get_executor
+from prefetch import foreground, get_prefetcher
+from changepoints import current_regime, last_breaks, shared_changepoints
+
+# Seconds between intermediate forecast charts while models are still fitting
+PROGRESS_INTERVAL = 1.0
+
+RECONCILIATION_OPTIONS = {
+    "Independent": None,
+    "Add up from categories": "bottom_up",
+    "Balanced": "ols",
+    "Balanced (weighted by past errors)": "mint_shrink"
+}
+
+@st.cache_data(show_spinner="Looking for structural breaks...")
+def get_last_breaks(_df, version):
+    return last_breaks(shared_changepoints(_df))
 
 def forecasting(df):
     st.markdown('<h1 class="main-header">Forecast</h1>', unsafe_allow_html=True)
@@ -10,30 +33,156 @@ def forecasting(df):
     selected_region = create_region_selector(df)
     region_data = df[df['REGIONAL_OFFICE_NAME'] == selected_region]
     available_categories = sorted(region_data['BNF_CHAPTER_PLUS_CODE'].unique())
-    default_categories = available_categories[:8] if len(available_categories) > 8 else available_categories
     selected_categories = st.multiselect(
         "Choose Categories:",
         available_categories,
-        default=default_categories
+        default=default_categories(available_categories)
     )
     
-    col1, _ = st.columns(2)
+    forecast_panel(df, region_data, selected_region, available_categories, selected_categories)
+
+def default_categories(available_categories):
+    return available_categories[:8] if len(available_categories) > 8 else available_categories
+
+def region_forecast_job(df, region, registry):
+    # Fits the models a region's default Forecast view uses, one per step
+    def job():
+        region_data = df[df['REGIONAL_OFFICE_NAME'] == region]
+        yield
+        for bnf_code in default_categories(sorted(region_data['BNF_CHAPTER_PLUS_CODE'].unique())):
+            bnf_data = region_data[region_data['BNF_CHAPTER_PLUS_CODE'] == bnf_code]
+            ts_data = bnf_data.groupby('YEAR_MONTH')['TOTAL_COST'].sum().reset_index()
+            if len(ts_data) >= 3:
+                try:
+                    registry.get((region, bnf_code), ts_data)
+                except ValueError:
+                    pass
+            yield
+        
+        ts_data = region_data.groupby('YEAR_MONTH')['TOTAL_COST'].sum().reset_index()
+        try:
+            if len(ts_data) >= 3:
+                registry.get((region, 'ALL'), ts_data)
+                yield
+            if len(ts_data) >= 12:
+                registry.get_backtest((region, 'ALL'), ts_data)
+        except ValueError:
+            pass
+    return job
+
+def prefetch_forecasts(df, regions):
+    registry = get_model_registry()
+    version = dataset_version(df)
+    for region in regions:
+        get_prefetcher().submit(('forecast', version, region), region_forecast_job(df, region, registry))
+
+def next_regions(df, selected_region):
+    # Analysts step through the selector in order, so the following regions come first
+    regions = sorted(df['REGIONAL_OFFICE_NAME'].unique())
+    i = regions.index(selected_region)
+    return regions[i + 1:] + regions[:i]
+
+# Only this part reruns when the horizon, interval or model settings change
+@st.fragment
+@foreground
+def forecast_panel(df, region_data, selected_region, available_categories, selected_categories):
+    col1, col2 = st.columns(2)
     with col1:
         forecast_periods = st.slider("Months to Forecast:", 1, 12, 3)
+    with col2:
+        interval_level = st.select_slider("Confidence Level:", options=[80, 90, 95], value=95)
+    
+    engine = FORECAST_ENGINES[st.radio(
+        "Forecast Model:",
+        list(FORECAST_ENGINES.keys()),
+        horizontal=True,
+        help="'Per category' fits a separate model to each category. 'All series together' learns one model from every region and category at once. 'Best model per category' uses whichever model predicted each category's recent past best."
+    )]
+    
+    selections = None
+    if engine == "selected":
+        selections = load_selections()
+        region_keys = [(selected_region, bnf_code) for bnf_code in available_categories]
+        if not any('|'.join(key) in selections for key in region_keys):
+            st.info("No best models saved for this region yet, so standard forecasts are shown.")
+        if st.button("Find best model for each category in this region"):
+            with st.spinner("Comparing models on recent history..."):
+                save_selections(run_tournament(region_data))
+            st.rerun()
+    
+    reconciliation = None
+    if engine == "arima":
+        reconciliation = RECONCILIATION_OPTIONS[st.radio(
+            "Category Forecasts:",
+            list(RECONCILIATION_OPTIONS.keys()),
+            horizontal=True,
+            help="'Independent' forecasts each category on its own. The other options adjust the forecasts so categories add up exactly to the region total. When adding up from categories, the total's range combines the category ranges as if they moved independently."
+        )]
+    
+    breaks = None
+    if engine in ("arima", "selected") and not reconciliation:
+        if st.checkbox("Fit only after the last structural break",
+                       help="Categories whose costs shifted to a new level are fitted on the months since the shift, so the old level does not pull the forecast. The chart still shows the full history."):
+            breaks = get_last_breaks(df, dataset_version(df))
     
     if not selected_categories:
         st.warning("Select at least one category.")
         return
     
-    line_chart = create_multi_category_forecast(region_data, selected_categories, forecast_periods)
-    st.plotly_chart(line_chart, use_container_width=True)
+    forecaster = None
+    if engine == "global":
+        try:
+            forecaster = get_global_forecaster(df, dataset_version(df))
+        except ValueError as e:
+            st.warning(f"Could not train the combined model, using per-category forecasts: {str(e)}")
+    
+    reconciled = None
+    if reconciliation:
+        try:
+            reconciled = hierarchical_forecast(
+                region_data,
+                forecast_periods,
+                get_model_registry().get,
+                method=reconciliation,
+                alpha=1 - interval_level / 100,
+                levels=('BNF_CHAPTER_PLUS_CODE',),
+                key_prefix=(selected_region,),
+                categories=selected_categories
+            )
+        except ValueError as e:
+            st.warning(f"Could not make category forecasts add up, showing independent forecasts: {str(e)}")
     
-    forecast_insights(region_data, selected_categories, forecast_periods)
+    chart = st.empty()
+    progress = st.empty()
+    last_draw = {'time': time.perf_counter()}
 
-def create_multi_category_forecast(region_data, selected_categories, forecast_months):
-    all_bnf = region_data.groupby('BNF_CHAPTER_PLUS_CODE')['TOTAL_COST'].sum()
+    def show_progress(categories_data, completed, total):
+        # Cached models finish instantly, so only slow fits get intermediate charts
+        if completed < total and time.perf_counter() - last_draw['time'] > PROGRESS_INTERVAL:
+            progress.progress(completed / total, text=f"Forecast {completed} of {total} categories...")
+            chart.plotly_chart(build_forecast_figure(region_data, categories_data, f" ({len(categories_data)} of {total} categories)"),
+                               use_container_width=True)
+            last_draw['time'] = time.perf_counter()
     
-    fig = go.Figure()
+    line_chart = create_multi_category_forecast(region_data, selected_categories, forecast_periods, reconciled, forecaster, selections,
+                                                breaks, on_progress=show_progress)
+    progress.empty()
+    with chart:
+        render_chart("Forecast", line_chart, use_container_width=True)
+    
+    backtest_forecaster = None
+    if forecaster is not None:
+        try:
+            backtest_forecaster = get_global_forecaster(df, dataset_version(df), holdout=BACKTEST_PERIODS)
+        except ValueError:
+            pass
+
+    forecast_insights(region_data, selected_categories, forecast_periods, interval_level, reconciled, forecaster, backtest_forecaster)
+    prefetch_forecasts(df, next_regions(df, selected_region))
+
+def iter_category_forecasts(region_data, selected_categories, forecast_months, reconciled=None, forecaster=None,
+                            selections=None, breaks=None):
+    all_bnf = region_data.groupby('BNF_CHAPTER_PLUS_CODE')['TOTAL_COST'].sum()
     
     historical_colors = [
         '#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7', '#DDA0DD',
@@ -49,49 +198,87 @@ def create_multi_category_forecast(region_data, selected_categories, forecast_mo
         '#F5C7C1', '#BEE6F1', '#E5B6CD', '#B2E9DE', '#F9F79F', '#E2C4EE'
     ]
     
-    forecast_start_date = None
-    all_dates = []
-    all_categories_data = {}
-    failed_categories = []
+    registry = get_model_registry()
+    region = region_data['REGIONAL_OFFICE_NAME'].iloc[0] if len(region_data) > 0 else ""
     filtered_bnf = [bnf for bnf in all_bnf.index if bnf in selected_categories]
+    
+    tasks = []
     for i, bnf_code in enumerate(filtered_bnf):
         bnf_data = region_data[region_data['BNF_CHAPTER_PLUS_CODE'] == bnf_code]
         ts_data = bnf_data.groupby('YEAR_MONTH')['TOTAL_COST'].sum().reset_index()
-        
         if len(ts_data) >= 3:
-            category_parts = bnf_code.split(":")
-            if len(category_parts) >= 2:
-                category_short = f"{category_parts[0].strip()}: {category_parts[1].strip()}"
-            else:
-                category_short = bnf_code.strip()
+            tasks.append((i, bnf_code, ts_data))
+        
+    def forecast_category(task):
+        i, bnf_code, ts_data = task
+        if breaks is not None:
+            ts_data = current_regime(ts_data, breaks.get((region, bnf_code)))
+        try:
+            if forecaster is not None:
+                return forecaster.forecast((region, bnf_code), forecast_months)
+            if reconciled is not None:
+                return select_node(reconciled, (region, bnf_code))
+            if selections is not None:
+                model_name = selected_model(selections, (region, bnf_code), ts_data) or 'arima'
+                return registry.get((region, bnf_code), ts_data, fit=CANDIDATES[model_name]).forecast(forecast_months)
+            return registry.get((region, bnf_code), ts_data).forecast(forecast_months)
+        except ValueError:
+            return None
             
-            try:
-                forecast_df = train_arima(ts_data, forecast_months)
+    # Yields (category, chart data or None if its model failed, categories done, total)
+    # in category order, as soon as every category before it is ready
+    finished = {}
+    next_i = 0
+    with get_executor(in_process=True, cpu_bound=True) as pool:
+        for done, forecast_df in pool.map_unordered(forecast_category, tasks):
+            finished[done] = forecast_df
+            while next_i in finished:
+                i, bnf_code, ts_data = tasks[next_i]
+                forecast_df = finished.pop(next_i)
+                next_i += 1
                 
-                if forecast_start_date is None:
-                    forecast_start_date = forecast_df['YEAR_MONTH'].iloc[0]
+                category_parts = bnf_code.split(":")
+                if len(category_parts) >= 2:
+                    category_short = f"{category_parts[0].strip()}: {category_parts[1].strip()}"
+                else:
+                    category_short = bnf_code.strip()
                 
-                combined_dates = list(ts_data['YEAR_MONTH']) + list(forecast_df['YEAR_MONTH'])
-                combined_values = list(ts_data['TOTAL_COST']) + list(forecast_df['FORECAST'])
+                if forecast_df is None:
+                    yield category_short, None, next_i, len(tasks)
+                    continue
                 
-                all_dates.extend(combined_dates)
-                all_categories_data[category_short] = {
-                    'dates': combined_dates,
-                    'values': combined_values,
+                yield category_short, {
+                    'dates': list(ts_data['YEAR_MONTH']) + list(forecast_df['YEAR_MONTH']),
+                    'values': list(ts_data['TOTAL_COST']) + list(forecast_df['FORECAST']),
                     'historical_end': len(ts_data) - 1,
+                    'forecast_start': forecast_df['YEAR_MONTH'].iloc[0],
                     'historical_color': historical_colors[i % len(historical_colors)],
                     'forecast_color': forecast_colors[i % len(forecast_colors)]
-                }
-            except ValueError as e:
-                failed_categories.append(category_short)
-                continue
+                }, next_i, len(tasks)
+                
+def create_multi_category_forecast(region_data, selected_categories, forecast_months, reconciled=None, forecaster=None,
+                                   selections=None, breaks=None, on_progress=None):
+    all_categories_data = {}
+    failed_categories = []
+    for category, data, completed, total in iter_category_forecasts(region_data, selected_categories, forecast_months,
+                                                                    reconciled, forecaster, selections, breaks):
+        if data is None:
+            failed_categories.append(category)
+        else:
+            all_categories_data[category] = data
+        if on_progress is not None:
+            on_progress(all_categories_data, completed, total)
     
     if failed_categories:
         st.warning(f"ARIMA modeling failed for {len(failed_categories)} categories: {', '.join(failed_categories[:5])}{'...' if len(failed_categories) > 5 else ''}")
     
+    return build_forecast_figure(region_data, all_categories_data)
+
+def build_forecast_figure(region_data, all_categories_data, subtitle=""):
+    fig = go.Figure()
+    forecast_start_date = next((data['forecast_start'] for data in all_categories_data.values()), None)
+    
     if all_categories_data:
-        unique_dates = sorted(set(all_dates))
-        
         for category, data in all_categories_data.items():
             historical_dates = data['dates'][:data['historical_end'] + 1]
             historical_values = data['values'][:data['historical_end'] + 1]
@@ -152,7 +339,7 @@ def create_multi_category_forecast(region_data, selected_categories, forecast_mo
     
     fig.update_layout(
         title=dict(
-            text=f'Prescription Forecast - {region_data["REGIONAL_OFFICE_NAME"].iloc[0] if len(region_data) > 0 else ""}',
+            text=f'Prescription Forecast - {region_data["REGIONAL_OFFICE_NAME"].iloc[0] if len(region_data) > 0 else ""}{subtitle}',
             font=dict(size=20, color='#2C3E50')
         ),
         xaxis_title='Date',
@@ -196,46 +383,65 @@ def create_multi_category_forecast(region_data, selected_categories, forecast_mo
     
     return fig
 
-def forecast_insights(region_data, selected_categories, forecast_periods):
-
+def forecast_insights(region_data, selected_categories, forecast_periods, interval_level=95, reconciled=None,
+                      forecaster=None, backtest_forecaster=None):
+    registry = get_model_registry()
+    region = region_data['REGIONAL_OFFICE_NAME'].iloc[0]
     ts_data = region_data.groupby('YEAR_MONTH')['TOTAL_COST'].sum().reset_index()
     
     if len(ts_data) >= 3:
         try:
-            forecast_df = train_arima(ts_data, forecast_periods)
+            region_keys = [(region, bnf_code) for bnf_code in region_data['BNF_CHAPTER_PLUS_CODE'].unique()]
+            if forecaster is not None:
+                forecast_df = forecaster.forecast_sum(region_keys, forecast_periods, alpha=1 - interval_level / 100)
+            elif reconciled is not None:
+                forecast_df = select_node(reconciled, (region, 'ALL'))
+            else:
+                forecast_df = registry.get((region, 'ALL'), ts_data).forecast(forecast_periods, alpha=1 - interval_level / 100)
             
             if len(forecast_df) > 0:
-                forecast_accuracy_metrics(ts_data, forecast_periods)
+                st.subheader("Region Total Forecast")
+                st.caption(f"Expected total cost with a {interval_level}% range of likely values.")
+                display_df = pd.DataFrame({
+                    'Month': forecast_df['YEAR_MONTH'].dt.strftime('%Y-%m'),
+                    'Expected': forecast_df['FORECAST'].apply(lambda x: f"£{x:,.0f}"),
+                    'Low': forecast_df['CONFIDENCE_LOWER'].apply(lambda x: f"£{x:,.0f}"),
+                    'High': forecast_df['CONFIDENCE_UPPER'].apply(lambda x: f"£{x:,.0f}")
+                })
+                st.dataframe(display_df, use_container_width=True, hide_index=True)
+                
+                forecast_accuracy_metrics(ts_data, forecast_periods, region, backtest_forecaster, region_keys)
         except ValueError as e:
             st.error(f"ARIMA modeling failed: {str(e)}")
 
-def forecast_accuracy_metrics(ts_data, forecast_periods):
+def forecast_accuracy_metrics(ts_data, forecast_periods, region, backtest_forecaster=None, region_keys=None):
     st.subheader("Model Performance Metrics")
     
     if len(ts_data) >= 12:
-        train_size = len(ts_data) - forecast_periods
-        train_data = ts_data.iloc[:train_size]
-        test_data = ts_data.iloc[train_size:]
+        try:
+            if backtest_forecaster is not None:
+                test_data = ts_data[ts_data['YEAR_MONTH'] > backtest_forecaster.months[-1]].iloc[:forecast_periods]
+                forecast_df = backtest_forecaster.forecast_sum(region_keys, len(test_data))
+            else:
+                backtest_model, test_data = get_model_registry().get_backtest((region, 'ALL'), ts_data)
+                test_data = test_data.iloc[:forecast_periods]
+                forecast_df = backtest_model.forecast(len(test_data))
         
-        if len(train_data) >= 3 and len(test_data) > 0:
-            try:
-                forecast_df = train_arima(train_data, len(test_data))
+            if len(forecast_df) > 0 and len(test_data) == len(forecast_df):
+                mae = abs(test_data['TOTAL_COST'].values - forecast_df['FORECAST'].values).mean()
+                mape = (abs(test_data['TOTAL_COST'].values - forecast_df['FORECAST'].values) / 
+                       test_data['TOTAL_COST'].values * 100).mean()
                 
-                if len(forecast_df) > 0 and len(test_data) == len(forecast_df):
-                    mae = abs(test_data['TOTAL_COST'].values - forecast_df['FORECAST'].values).mean()
-                    mape = (abs(test_data['TOTAL_COST'].values - forecast_df['FORECAST'].values) / 
-                           test_data['TOTAL_COST'].values * 100).mean()
+                col1, col2, col3 = st.columns(3)
                     
-                    col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Mean Absolute Error", f"£{mae:,.0f}")
                     
-                    with col1:
-                        st.metric("Mean Absolute Error", f"£{mae:,.0f}")
+                with col2:
+                    st.metric("Mean Absolute Percentage Error", f"{mape:.1f}%")
                     
-                    with col2:
-                        st.metric("Mean Absolute Percentage Error", f"{mape:.1f}%")
-                    
-                    with col3:
-                        accuracy = max(0, 100 - mape)
-                        st.metric("Model Accuracy", f"{accuracy:.1f}%")
-            except ValueError as e:
-                st.error(f"Model performance evaluation failed: {str(e)}")
\ No newline at end of file
+                with col3:
+                    accuracy = max(0, 100 - mape)
+                    st.metric("Model Accuracy", f"{accuracy:.1f}%")
+        except ValueError as e:
+            st.error(f"Model performance evaluation failed: {str(e)}")
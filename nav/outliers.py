@@ -2,6 +2,9 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from utils import detect_outliers
+from data_access import dataset_version, get_backend
+from changepoints import shared_changepoints
+from rendering import render_chart
 
 def outlier_analysis(df):
     st.markdown('<h1 class="main-header">Outliers</h1>', unsafe_allow_html=True)
@@ -9,7 +12,14 @@ def outlier_analysis(df):
     This page helps you find unusual (outlier) prescription costs in NHS data. We use the Isolation Forest method to automatically spot outliers. Outliers can show errors or important changes in patterns.
     """)
     configure_detection_parameters(df)
+    structural_breaks(df)
 
+@st.cache_data(show_spinner=False)
+def load_outliers(_df, version, date_range, detection_method, threshold, contamination):
+    return detect_outliers(_df, detection_method, threshold, contamination, 'regional')
+
+# Changing the date range reruns the outlier sections, not the whole app
+@st.fragment
 def configure_detection_parameters(df):
     st.markdown("**Outliers are detected using the Isolation Forest method.**")
     min_date = df['YEAR_MONTH'].min().date()
@@ -22,10 +32,12 @@ def configure_detection_parameters(df):
     )
     if len(outlier_date_range) == 2:
         start_date, end_date = outlier_date_range
-        df_filtered = df[(df['YEAR_MONTH'].dt.date >= start_date) & (df['YEAR_MONTH'].dt.date <= end_date)]
+        df_filtered = get_backend(df).filter_months(start_date, end_date)
+        date_range = (start_date, end_date)
         st.info(f"Data from {start_date} to {end_date} ({len(df_filtered):,} records)")
     else:
         df_filtered = df
+        date_range = None
         st.info(f"All data ({len(df_filtered):,} records)")
     if len(df_filtered) == 0:
         st.error("No data available for the selected date range. Please adjust your filters.")
@@ -34,12 +46,13 @@ def configure_detection_parameters(df):
     detection_method = "Isolation Forest"
     threshold = 1.5  # default, not shown
     contamination = 0.1  # default, not shown
-    regional_outlier_analysis(df_filtered, detection_method, threshold, contamination)
+    regional_outlier_analysis(df_filtered, detection_method, threshold, contamination, (dataset_version(df), date_range))
 
 
-def regional_outlier_analysis(df, detection_method, threshold, contamination):
+def regional_outlier_analysis(df, detection_method, threshold, contamination, cache_key):
     try:
-        regional_outliers = detect_outliers(df, detection_method, threshold, contamination, 'regional')
+        version, date_range = cache_key
+        regional_outliers = load_outliers(df, version, date_range, detection_method, threshold, contamination)
         # Only show the Outlier % by Region plot and stats, not the boxplot
         st.markdown("**Note: Outliers are detected using the Isolation Forest method.**")
         if len(regional_outliers) > 0:
@@ -117,3 +130,61 @@ def outlier_analytics(df, regional_outliers):
     else:
         pass
 
+@st.cache_data(show_spinner="Looking for structural breaks in every series...")
+def load_changepoints(_df, version):
+    return shared_changepoints(_df)
+
+@st.fragment
+def structural_breaks(df):
+    st.markdown("---")
+    st.subheader("Structural Breaks")
+    st.caption("Months where a series jumps to a new level, changes its trend, or becomes more or less volatile. A steady trend is not a break. Outliers are single unusual months; a break changes everything after it.")
+    
+    version = dataset_version(df)
+    changepoints = load_changepoints(df, version)
+    if len(changepoints) == 0:
+        st.info("No structural breaks found in any series.")
+        return
+    
+    n_series = df.groupby(['REGIONAL_OFFICE_NAME', 'BNF_CHAPTER_PLUS_CODE']).ngroups
+    broken = changepoints.groupby(['REGIONAL_OFFICE_NAME', 'BNF_CHAPTER_PLUS_CODE']).ngroups
+    per_month = changepoints.groupby('BREAK_MONTH').size()
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Series with Breaks", f"{broken} of {n_series}")
+    with col2:
+        st.metric("Breaks Found", len(changepoints))
+    with col3:
+        st.metric("Most Common Month", per_month.idxmax().strftime('%Y-%m'))
+
+    def build_chart():
+        fig = px.bar(
+            x=per_month.index,
+            y=per_month.values,
+            title="Breaks per Month Across All Series",
+            labels={'x': 'Month', 'y': 'Series with a Break'}
+        )
+        fig.update_layout(height=350, template='plotly_white')
+        return fig
+    render_chart("Breaks per Month", build_chart, key=('breaks_per_month', version), use_container_width=True)
+    
+    options = sorted({(row.REGIONAL_OFFICE_NAME, row.BNF_CHAPTER_PLUS_CODE) for row in changepoints.itertuples()})
+    selected = st.selectbox("Series:", options, format_func=lambda key: f"{key[0]} / {key[1]}")
+    series_breaks = changepoints[(changepoints['REGIONAL_OFFICE_NAME'] == selected[0]) & (changepoints['BNF_CHAPTER_PLUS_CODE'] == selected[1])]
+    series_data = get_backend(df).monthly_totals(region=selected[0], categories=[selected[1]])
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=series_data['YEAR_MONTH'], y=series_data['TOTAL_COST'], mode='lines+markers', name='Cost', line=dict(color='#1f77b4')))
+    for month in series_breaks['BREAK_MONTH']:
+        fig.add_vline(x=month, line_dash="dash", line_color="#dc3545")
+    fig.update_layout(title="Cost with Detected Breaks", xaxis_title="Month", yaxis_title="Cost (£)", height=400, template='plotly_white')
+    st.plotly_chart(fig, use_container_width=True)
+    
+    display = series_breaks.copy()
+    display['BREAK_MONTH'] = display['BREAK_MONTH'].dt.strftime('%Y-%m')
+    for column in ['MEAN_BEFORE', 'MEAN_AFTER', 'STD_BEFORE', 'STD_AFTER']:
+        display[column] = display[column].apply(lambda x: f"£{x:,.0f}")
+    display = display.drop(columns=['REGIONAL_OFFICE_NAME', 'BNF_CHAPTER_PLUS_CODE'])
+    display.columns = ['Break Month', 'Average Before', 'Average After', 'Spread Before', 'Spread After']
+    st.dataframe(display, use_container_width=True, hide_index=True)
@@ -0,0 +1,143 @@
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+from scenarios import MAX_PERIODS, ScenarioSimulator, Shock
+from data_access import dataset_version
+from config import get_global_forecaster
+from rendering import render_chart
+
+ALL = "All"
+DEFAULT_SHOCKS = pd.DataFrame([{
+    'Region': 'MIDLANDS',
+    'Category': '02: Cardiovascular System',
+    'Change %': 10.0,
+    'From Month': 1,
+    'Uncertainty %': 0.0
+}])
+
+# Paths are drawn once per dataset for the longest period, from the same model
+# the Forecast page uses; the period slider only slices them
+@st.cache_resource(max_entries=4, show_spinner="Drawing forecast paths for every series...")
+def get_simulator(_df, version):
+    return ScenarioSimulator(get_global_forecaster(_df, version), MAX_PERIODS)
+
+def scenario_analysis(df):
+    st.markdown('<h1 class="main-header">Budget Scenarios</h1>', unsafe_allow_html=True)
+    st.markdown("Simulate future costs thousands of times and see how price or demand changes move each region's budget.")
+    
+    regions = sorted(df['REGIONAL_OFFICE_NAME'].unique())
+    categories = sorted(df['BNF_CHAPTER_PLUS_CODE'].unique())
+    
+    forecast_periods = st.slider("Budget Period (months):", 1, MAX_PERIODS, MAX_PERIODS)
+    st.subheader("Changes")
+    st.caption("Each row raises or lowers costs by a percentage from a given month. 'Uncertainty %' makes the change itself vary between simulations, independently for each row.")
+    defaults = DEFAULT_SHOCKS[DEFAULT_SHOCKS['Region'].isin(regions + [ALL]) & DEFAULT_SHOCKS['Category'].isin(categories + [ALL])]
+    shock_rows = st.data_editor(
+        defaults,
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True,
+        key="scenario_shocks",
+        column_config={
+            'Region': st.column_config.SelectboxColumn(options=[ALL] + regions, required=True, default=ALL),
+            'Category': st.column_config.SelectboxColumn(options=[ALL] + categories, required=True, default=ALL),
+            'Change %': st.column_config.NumberColumn(min_value=-100.0, max_value=500.0, step=1.0, required=True, default=0.0),
+            'From Month': st.column_config.NumberColumn(min_value=1, max_value=12, step=1, default=1),
+            'Uncertainty %': st.column_config.NumberColumn(min_value=0.0, max_value=100.0, step=1.0, default=0.0)
+        }
+    )
+    
+    shocks = []
+    for row in shock_rows.dropna(subset=['Region', 'Category', 'Change %']).to_dict('records'):
+        shocks.append(Shock(
+            row['Change %'] / 100,
+            regions=None if row['Region'] == ALL else [row['Region']],
+            categories=None if row['Category'] == ALL else [row['Category']],
+            start=row['From Month'] if pd.notna(row['From Month']) else 1,
+            uncertainty=(row['Uncertainty %'] if pd.notna(row['Uncertainty %']) else 0) / 100
+        ))
+    
+    try:
+        simulator = get_simulator(df, dataset_version(df))
+    except ValueError as e:
+        st.error(f"Could not build the forecast model: {str(e)}")
+        return
+    result = simulator.run(shocks, forecast_periods)
+    
+    national_budget(result, forecast_periods)
+    region_budgets(result)
+    
+    with st.expander("Every Region and Category"):
+        series = result.series_budgets()
+        series = series[series['Change'] != 0] if shocks and st.checkbox("Only show changed series", value=True) else series
+        st.dataframe(format_budgets(series), use_container_width=True, hide_index=True)
+
+def national_budget(result, forecast_periods):
+    national = result.national_budget()
+    st.subheader(f"National Budget, Next {forecast_periods} Months")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Likely (P50)", f"£{national['P50']:,.0f}", f"£{national['Change']:+,.0f}", delta_color="inverse")
+    with col2:
+        st.metric("Low (P5)", f"£{national['P5']:,.0f}")
+    with col3:
+        st.metric("High (P95)", f"£{national['P95']:,.0f}")
+    with col4:
+        st.metric("Without Changes (P50)", f"£{national['Baseline_P50']:,.0f}")
+    
+    bands = result.national_bands()
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=bands['YEAR_MONTH'], y=bands['P95'], mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+    fig.add_trace(go.Scatter(
+        x=bands['YEAR_MONTH'], y=bands['P5'], mode='lines', line=dict(width=0), fill='tonexty',
+        fillcolor='rgba(31, 119, 180, 0.2)', name='5th to 95th percentile'
+    ))
+    fig.add_trace(go.Scatter(x=bands['YEAR_MONTH'], y=bands['P50'], mode='lines+markers', line=dict(color='#1f77b4', width=3), name='Median'))
+    fig.update_layout(
+        title="Monthly National Cost Across Simulations",
+        xaxis_title="Month",
+        yaxis_title="Cost (£)",
+        height=400,
+        hovermode='x unified',
+        template='plotly_white'
+    )
+    render_chart("National Scenario Bands", fig, use_container_width=True)
+
+def region_budgets(result):
+    st.subheader("Region Budgets")
+    budgets = result.region_budgets().sort_values('P50', ascending=True)
+    
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=budgets['P50'],
+        y=budgets['REGIONAL_OFFICE_NAME'],
+        orientation='h',
+        marker_color=['#FF6B6B' if change > 0 else '#4ECDC4' if change < 0 else '#95A5A6' for change in budgets['Change']],
+        error_x=dict(type='data', symmetric=False, array=budgets['P95'] - budgets['P50'], arrayminus=budgets['P50'] - budgets['P5']),
+        hovertemplate='<b>%{y}</b><br>Median: £%{x:,.0f}<extra></extra>'
+    ))
+    fig.update_layout(
+        title="Median Budget by Region with 5th to 95th Percentile Range",
+        xaxis_title="Cost (£)",
+        height=450,
+        margin={'l': 180},
+        template='plotly_white'
+    )
+    render_chart("Region Scenario Budgets", fig, use_container_width=True)
+    
+    st.dataframe(format_budgets(budgets.sort_values('P50', ascending=False)), use_container_width=True, hide_index=True)
+
+def format_budgets(table):
+    table = table.rename(columns={
+        'REGIONAL_OFFICE_NAME': 'Region',
+        'BNF_CHAPTER_PLUS_CODE': 'Category',
+        'P5': 'Low (P5)',
+        'P50': 'Likely (P50)',
+        'P95': 'High (P95)',
+        'Baseline_P50': 'Without Changes',
+        'Change': 'Change'
+    })
+    for column in ['Low (P5)', 'Likely (P50)', 'High (P95)', 'Without Changes', 'Change']:
+        table[column] = table[column].apply(lambda x: f"£{x:,.0f}")
+    return table
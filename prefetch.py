@@ -0,0 +1,106 @@
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# EPD_PREFETCH=0 turns off speculative work between page runs
+PREFETCH_ENABLED = os.environ.get("EPD_PREFETCH", "1") == "1"
+# Quiet time after a foreground run before speculative work resumes
+IDLE_SECONDS = float(os.environ.get("EPD_PREFETCH_IDLE", "0.5"))
+
+class Prefetcher:
+    # One background thread runs speculative jobs while no page is being
+    # rendered. A job is a generator function, and each yield is a point where
+    # it can be stopped: when a foreground run starts, queued jobs are dropped
+    # and the running one is abandoned at its next yield. Jobs run without a
+    # Streamlit script context, so anything from st.cache_* is resolved by the
+    # submitter and passed in.
+    def __init__(self, idle_seconds=IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._queued = set()
+        self._foreground = 0
+        self._last_foreground = 0.0
+        self._generation = 0
+        self._thread = None
+        self.completed = 0
+        self.cancelled = 0
+
+    @contextmanager
+    def foreground(self):
+        with self._cond:
+            self._foreground += 1
+            self._generation += 1
+            self.cancelled += len(self._queue)
+            self._queue.clear()
+            self._queued.clear()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._foreground -= 1
+                self._last_foreground = time.monotonic()
+                self._cond.notify_all()
+
+    def submit(self, key, job):
+        if not PREFETCH_ENABLED:
+            return
+        with self._cond:
+            if key in self._queued:
+                return
+            self._queued.add(key)
+            self._queue.append((key, job))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="epd-prefetch", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _idle(self):
+        return self._foreground == 0 and time.monotonic() - self._last_foreground >= self.idle_seconds
+
+    def _wait_for_idle(self, generation=None):
+        # Returns False if a foreground run superseded the caller's job
+        with self._cond:
+            while not self._idle():
+                if generation is not None and generation != self._generation:
+                    return False
+                self._cond.wait(self.idle_seconds)
+            return generation is None or generation == self._generation
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not (self._queue and self._idle()):
+                    self._cond.wait(self.idle_seconds)
+                key, job = self._queue.popleft()
+                self._queued.discard(key)
+                generation = self._generation
+            
+            try:
+                for _ in job():
+                    if not self._wait_for_idle(generation):
+                        with self._cond:
+                            self.cancelled += 1
+                        break
+                else:
+                    with self._cond:
+                        self.completed += 1
+            except Exception:
+                # Speculative work never surfaces errors; the page will hit them itself
+                continue
+
+_prefetcher = Prefetcher()
+
+def get_prefetcher():
+    return _prefetcher
+
+def foreground(func):
+    # Marks a page or fragment run so speculative work yields to it
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _prefetcher.foreground():
+            return func(*args, **kwargs)
+    return wrapper
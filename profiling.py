@@ -0,0 +1,166 @@
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+
+# EPD_PROFILE=sample collects stack samples with low overhead and writes
+# flamegraph input; EPD_PROFILE=cprofile traces every call. Unset, empty, 0,
+# false or off leaves profiling disabled.
+PROFILE_MODES = ('sample', 'cprofile')
+PROFILE_MODE = os.environ.get("EPD_PROFILE", "").strip().lower()
+if PROFILE_MODE in ('', '0', 'false', 'off', 'no'):
+    PROFILE_MODE = None
+elif PROFILE_MODE not in PROFILE_MODES:
+    raise ValueError(f"Unknown EPD_PROFILE mode '{PROFILE_MODE}'. Use one of: {', '.join(PROFILE_MODES)}, or 0 to disable.")
+PROFILE_DIR = os.environ.get("EPD_PROFILE_DIR", os.path.join(os.environ.get("EPD_CACHE_DIR", ".epd_cache"), "profiles"))
+SAMPLE_INTERVAL = float(os.environ.get("EPD_PROFILE_INTERVAL", "0.005"))
+TOP_N = 25
+
+_lock = threading.Lock()
+_folded = {}
+_stats = {}
+_runs = Counter()
+_seconds = Counter()
+_active = threading.local()
+_labels = {}
+
+def _frame_label(code):
+    label = _labels.get(code)
+    if label is None:
+        path = code.co_filename
+        try:
+            relative = os.path.relpath(path)
+            path = relative if not relative.startswith('..') else os.path.join(*path.split(os.sep)[-2:])
+        except ValueError:
+            pass
+        label = _labels[code] = f"{code.co_name} ({path}:{code.co_firstlineno})"
+    return label
+
+class StackSampler(threading.Thread):
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.stacks
+
+def _top_functions(folded, top_n=TOP_N):
+    own = Counter()
+    inclusive = Counter()
+    for stack, count in folded.items():
+        frames = stack.split(';')
+        own[frames[-1]] += count
+        for frame in set(frames):
+            inclusive[frame] += count
+    total = sum(folded.values()) or 1
+    
+    lines = [f"{sum(folded.values()):,} samples every {SAMPLE_INTERVAL * 1000:g} ms", ""]
+    lines.append(f"{'Self %':>8}{'Total %':>9}  Function")
+    for frame, count in own.most_common(top_n):
+        lines.append(f"{count / total * 100:>8.1f}{inclusive[frame] / total * 100:>9.1f}  {frame}")
+    return "\n".join(lines) + "\n"
+
+def _write_samples(name):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    folded = _folded[name]
+    # One "frame;frame;frame count" line per stack, as read by flamegraph.pl and speedscope
+    with open(os.path.join(PROFILE_DIR, f"{name}.folded"), 'w') as f:
+        for stack, count in sorted(folded.items()):
+            f.write(f"{stack} {count}\n")
+    with open(os.path.join(PROFILE_DIR, f"{name}.top.txt"), 'w') as f:
+        f.write(f"{name}: {_runs[name]} run(s), {_seconds[name]:,.2f} s\n")
+        f.write(_top_functions(folded))
+
+def _write_cprofile(name):
+    import io
+    import pstats
+    
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stats = _stats[name]
+    stats.dump_stats(os.path.join(PROFILE_DIR, f"{name}.prof"))
+    report = io.StringIO()
+    pstats.Stats(stats, stream=report).sort_stats('cumulative').print_stats(TOP_N)
+    with open(os.path.join(PROFILE_DIR, f"{name}.top.txt"), 'w') as f:
+        f.write(f"{name}: {_runs[name]} run(s), {_seconds[name]:,.2f} s\n")
+        f.write(report.getvalue())
+
+class _Profile:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.nested = getattr(_active, 'depth', 0) > 0
+        _active.depth = getattr(_active, 'depth', 0) + 1
+        self.start = time.perf_counter()
+        
+        if PROFILE_MODE == 'cprofile':
+            # cProfile allows one profiler per thread, so an inner job is
+            # accounted to the page that called it
+            if not self.nested:
+                import cProfile
+                self.profiler = cProfile.Profile()
+                self.profiler.enable()
+        else:
+            self.sampler = StackSampler(threading.get_ident())
+            self.sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        _active.depth -= 1
+        
+        if PROFILE_MODE == 'cprofile':
+            if self.nested:
+                return False
+            import pstats
+            self.profiler.disable()
+            with _lock:
+                _runs[self.name] += 1
+                _seconds[self.name] += time.perf_counter() - self.start
+                if self.name in _stats:
+                    _stats[self.name].add(self.profiler)
+                else:
+                    _stats[self.name] = pstats.Stats(self.profiler)
+                _write_cprofile(self.name)
+        else:
+            stacks = self.sampler.stop()
+            with _lock:
+                _runs[self.name] += 1
+                _seconds[self.name] += time.perf_counter() - self.start
+                _folded.setdefault(self.name, Counter()).update(stacks)
+                _write_samples(self.name)
+        return False
+
+def profile(name):
+    # Stacks accumulate per name for the life of the process and the files are
+    # rewritten after every run, so they always cover everything seen so far
+    if not PROFILE_MODE:
+        return nullcontext()
+    return _Profile(name)
+
+def profiled(func):
+    if not PROFILE_MODE:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with profile(f"job_{func.__name__}"):
+            return func(*args, **kwargs)
+    return wrapper
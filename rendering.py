@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Traces longer than this are reduced with LTTB before they are sent
+MAX_POINTS = 1500
+# Past this many points in one figure, unstacked traces are drawn with WebGL
+WEBGL_POINTS = 5000
+FIGURE_CACHE_SIZE = 64
+SHOW_RENDER_REPORT = os.environ.get("EPD_RENDER_REPORT", "0") == "1"
+
+_figure_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def lttb_indices(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: keep the first and last points and, from
+    # each bucket in between, the point spanning the largest triangle with the
+    # previous pick and the mean of the next bucket.
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+def _numeric_x(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(float)
+    try:
+        return x.astype(float)
+    except (TypeError, ValueError):
+        try:
+            return pd.to_datetime(x).asi8.astype(float)
+        except (TypeError, ValueError):
+            return np.arange(len(x), dtype=float)
+
+def _downsample(traces, max_points):
+    x = np.asarray(traces[0].x)
+    ys = [np.asarray(trace.y, dtype=float) for trace in traces]
+    if len(x) <= max_points or not all(np.isfinite(y).all() for y in ys):
+        return
+    
+    # Stacked traces share one set of indices, picked on the stack total, so
+    # the layers stay aligned
+    indices = lttb_indices(_numeric_x(x), np.sum(ys, axis=0), max_points)
+    for trace, y in zip(traces, ys):
+        trace.x = x[indices]
+        trace.y = y[indices]
+        for attr in ('customdata', 'text', 'hovertext'):
+            values = getattr(trace, attr)
+            if values is not None and not isinstance(values, str) and len(values) == len(x):
+                setattr(trace, attr, np.asarray(values)[indices])
+
+def optimize_figure(fig, max_points=MAX_POINTS, webgl_points=WEBGL_POINTS):
+    import plotly.graph_objects as go
+    
+    groups = {}
+    for trace in fig.data:
+        # plotly express already picks scattergl for long traces
+        if trace.type not in ('scatter', 'scattergl') or trace.x is None or trace.y is None:
+            continue
+        groups.setdefault(getattr(trace, 'stackgroup', None) or id(trace), []).append(trace)
+    
+    for traces in groups.values():
+        x = np.asarray(traces[0].x)
+        if all(len(trace.x) == len(x) and np.array_equal(np.asarray(trace.x), x) for trace in traces):
+            _downsample(traces, max_points)
+    
+    total_points = sum(len(trace.y) for trace in fig.data if getattr(trace, 'y', None) is not None)
+    if total_points <= webgl_points:
+        return fig
+    
+    # Scattergl has no stackgroup, so stacked areas stay SVG
+    data = [
+        go.Scattergl({k: v for k, v in trace.to_plotly_json().items() if k != 'type'}, skip_invalid=True)
+        if trace.type == 'scatter' and not trace.stackgroup else trace
+        for trace in fig.data
+    ]
+    return go.Figure(data=data, layout=fig.layout)
+
+def _figure_stats(fig, spec):
+    return {
+        'bytes': len(spec),
+        'points': sum(len(trace.y) for trace in fig.data if getattr(trace, 'y', None) is not None),
+        'webgl': any(trace.type == 'scattergl' for trace in fig.data)
+    }
+
+def render_chart(name, figure_or_build, key=None, **kwargs):
+    import plotly.io as pio
+    import streamlit as st
+    
+    start = time.perf_counter()
+    cached = None
+    if key is not None:
+        with _cache_lock:
+            cached = _figure_cache.get(key)
+            if cached is not None:
+                _figure_cache.move_to_end(key)
+    
+    if cached is None:
+        fig = figure_or_build() if callable(figure_or_build) else figure_or_build
+        fig = optimize_figure(fig)
+        spec = pio.to_json(fig, validate=False)
+        cached = (spec, _figure_stats(fig, spec))
+        if key is not None:
+            with _cache_lock:
+                _figure_cache[key] = cached
+                while len(_figure_cache) > FIGURE_CACHE_SIZE:
+                    _figure_cache.popitem(last=False)
+        hit = False
+    else:
+        hit = True
+    
+    spec, stats = cached
+    st.plotly_chart(pio.from_json(spec, skip_invalid=True), **kwargs)
+    
+    st.session_state.setdefault('render_stats', {})[name] = dict(
+        stats, seconds=time.perf_counter() - start, cache_hit=hit
+    )
+
+def render_report():
+    import streamlit as st
+    
+    render_stats = st.session_state.get('render_stats', {})
+    with st.sidebar.expander("Chart Payloads", expanded=True):
+        if not render_stats:
+            st.caption("No charts rendered yet.")
+        for name, stats in render_stats.items():
+            st.write(
+                f"**{name}**: {stats['bytes'] / 1024:,.0f} KB, {stats['points']:,} points"
+                f"{', WebGL' if stats['webgl'] else ''}, {stats['seconds'] * 1000:,.0f} ms"
+                f"{' (cached)' if stats['cache_hit'] else ''}"
+            )
+        st.caption("Sizes are the figure JSON sent to the browser; times cover building and serialising it on the server.")
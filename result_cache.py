@@ -0,0 +1,75 @@
+import threading
+from collections import OrderedDict
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+class SingleFlightCache:
+    # Process-wide and shared by every session: the first caller for a key
+    # computes it, concurrent callers for the same key wait for that result,
+    # and later callers read it from memory.
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._values = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._values:
+                self._values.move_to_end(key)
+                self.hits += 1
+                return self._values[key]
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.waits += 1
+
+        if not leader:
+            return flight.wait()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            # Failures are handed to the waiters but not cached, so the next caller retries
+            with self._lock:
+                del self._in_flight[key]
+            flight.error = e
+            flight.done.set()
+            raise
+
+        with self._lock:
+            self._values[key] = value
+            while len(self._values) > self.max_entries:
+                self._values.popitem(last=False)
+            del self._in_flight[key]
+        flight.value = value
+        flight.done.set()
+        return value
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._values.get(key, default)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._values
+
+    def __len__(self):
+        with self._lock:
+            return len(self._values)
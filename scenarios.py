@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+from statistics import NormalDist
+
+N_DRAWS = 2000
+MAX_PERIODS = 12
+PERCENTILES = (5, 50, 95)
+# Upper bound on the shared month-to-month shock across series
+MAX_CORRELATION = 0.95
+
+class Shock:
+    # A relative change to every series matching the regions and categories
+    # (None matches all) from forecast month `start` (1-based) onwards.
+    # `uncertainty` is the standard deviation of the change across draws.
+    def __init__(self, change, regions=None, categories=None, start=1, uncertainty=0.0):
+        self.change = change
+        self.regions = None if regions is None else set(regions)
+        self.categories = None if categories is None else set(categories)
+        self.start = max(int(start), 1)
+        self.uncertainty = uncertainty
+
+    def mask(self, keys):
+        return np.array([
+            (self.regions is None or region in self.regions) and (self.categories is None or bnf_code in self.categories)
+            for region, bnf_code in keys
+        ])
+
+def common_correlation(history):
+    # Average pairwise correlation of month-to-month changes, used as the
+    # weight of one factor every series shares
+    changes = np.diff(history, axis=1)
+    changes = changes[np.isfinite(changes).all(axis=1)]
+    if len(changes) < 2:
+        return 0.0
+    std = changes.std(axis=1, keepdims=True)
+    changes = changes[std[:, 0] > 0]
+    if len(changes) < 2:
+        return 0.0
+    z = (changes - changes.mean(axis=1, keepdims=True)) / changes.std(axis=1, keepdims=True)
+    corr = z @ z.T / z.shape[1]
+    n = len(z)
+    mean_off_diagonal = (corr.sum() - np.trace(corr)) / (n * (n - 1))
+    return float(np.clip(mean_off_diagonal, 0.0, MAX_CORRELATION))
+
+class ScenarioSimulator:
+    # Draws sample paths for every series from a fitted GlobalForecaster. Its
+    # intervals widen with the square root of the horizon, so each path is the
+    # forecast plus a random walk whose steps have the one-month spread; a
+    # common factor carries the correlation between series. The draws are made
+    # once for the longest period, so every scenario and shorter period is
+    # compared with the baseline on the same paths.
+    def __init__(self, forecaster, forecast_periods=MAX_PERIODS, n_draws=N_DRAWS, alpha=0.05, seed=42):
+        result = forecaster.predict(forecast_periods, alpha)
+        self.keys = forecaster.keys
+        self.dates = result['dates']
+        self.regions = sorted({region for region, _ in self.keys})
+        self.membership = np.zeros((len(self.keys), len(self.regions)), dtype=np.float32)
+        region_index = {region: j for j, region in enumerate(self.regions)}
+        for i, (region, _) in enumerate(self.keys):
+            self.membership[i, region_index[region]] = 1.0
+        
+        mean = np.nan_to_num(result['mean']).astype(np.float32)
+        z = NormalDist().inv_cdf(1 - alpha / 2)
+        sigma = np.nan_to_num((result['upper'][:, 0] - result['mean'][:, 0]) / z).astype(np.float32)
+        self.correlation = common_correlation(forecaster.history)
+        
+        rng = np.random.default_rng(seed)
+        steps = np.sqrt(1 - self.correlation) * rng.standard_normal((n_draws, len(self.keys), forecast_periods), dtype=np.float32)
+        steps += np.sqrt(self.correlation) * rng.standard_normal((n_draws, 1, forecast_periods), dtype=np.float32)
+        self.paths = np.maximum(mean[None] + sigma[None, :, None] * np.cumsum(steps, axis=2), 0)
+        self.seed = seed
+
+    def shock_draws(self, n_shocks):
+        # One independent draw per shock and path. Row k only depends on k, so
+        # adding a shock leaves the draws of the ones before it unchanged.
+        rng = np.random.default_rng(self.seed + 1)
+        return rng.standard_normal((n_shocks, self.paths.shape[0])).astype(np.float32)
+
+    def multiplier(self, shocks, periods):
+        n_draws, n_series, _ = self.paths.shape
+        factor = np.ones((n_draws, n_series, periods), dtype=np.float32)
+        months = np.arange(1, periods + 1)
+        for shock, draws in zip(shocks, self.shock_draws(len(shocks))):
+            hit = shock.mask(self.keys)[:, None] & (months >= shock.start)[None, :]
+            change = shock.change + shock.uncertainty * draws
+            factor += change[:, None, None] * hit[None].astype(np.float32)
+        return np.maximum(factor, 0)
+
+    def run(self, shocks=(), periods=None, percentiles=PERCENTILES):
+        # The first `periods` months of every path; all of them by default
+        baseline = self.paths[:, :, :periods or self.paths.shape[2]]
+        shocked = baseline * self.multiplier(shocks, baseline.shape[2]) if shocks else baseline
+        return ScenarioResult(self, baseline, shocked, percentiles)
+
+class ScenarioResult:
+    def __init__(self, simulator, baseline, paths, percentiles):
+        self.simulator = simulator
+        self.percentiles = percentiles
+        self.dates = simulator.dates[:paths.shape[2]]
+        self.series_totals = paths.sum(axis=2)
+        self.region_totals = self.series_totals @ simulator.membership
+        self.national_totals = self.series_totals.sum(axis=1)
+        self.national_monthly = paths.sum(axis=1)
+        self.baseline = baseline.sum(axis=2)
+        self.baseline_region = self.baseline @ simulator.membership
+        self.baseline_national = self.baseline.sum(axis=1)
+
+    def _table(self, draws, baseline, index, name):
+        bands = np.percentile(draws, self.percentiles, axis=0)
+        table = pd.DataFrame({f"P{p}": band for p, band in zip(self.percentiles, bands)}, index=index)
+        table['Baseline_P50'] = np.percentile(baseline, 50, axis=0)
+        table['Change'] = table['P50'] - table['Baseline_P50']
+        table.index.name = name
+        return table.reset_index()
+
+    def region_budgets(self):
+        return self._table(self.region_totals, self.baseline_region, self.simulator.regions, 'REGIONAL_OFFICE_NAME')
+
+    def national_budget(self):
+        return self._table(self.national_totals[:, None], self.baseline_national[:, None], ['NATIONAL'], 'LEVEL').iloc[0]
+
+    def series_budgets(self):
+        index = pd.MultiIndex.from_tuples(self.simulator.keys, names=['REGIONAL_OFFICE_NAME', 'BNF_CHAPTER_PLUS_CODE'])
+        bands = np.percentile(self.series_totals, self.percentiles, axis=0)
+        table = pd.DataFrame({f"P{p}": band for p, band in zip(self.percentiles, bands)}, index=index)
+        table['Baseline_P50'] = np.percentile(self.baseline, 50, axis=0)
+        table['Change'] = table['P50'] - table['Baseline_P50']
+        return table.reset_index()
+
+    def national_bands(self):
+        bands = np.percentile(self.national_monthly, self.percentiles, axis=0)
+        frame = pd.DataFrame({f"P{p}": band for p, band in zip(self.percentiles, bands)})
+        frame.insert(0, 'YEAR_MONTH', self.dates)
+        return frame
@@ -0,0 +1,68 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+from utils import CACHE_DIR, build_series_matrix, temp_path
+
+# Opened matrices, keyed by path, so a worker maps each file once
+_attached = {}
+
+class SeriesMatrix:
+    def __init__(self, path):
+        with open(path + '.json') as f:
+            index = json.load(f)
+        self.path = path
+        self.value = index['value']
+        self.keys = [tuple(key) for key in index['keys']]
+        self.key_index = {key: i for i, key in enumerate(self.keys)}
+        self.months = pd.DatetimeIndex(index['months'])
+        # Read-only map: every process shares the page cache, nothing is copied
+        self.matrix = np.load(path + '.npy', mmap_mode='r')
+
+    def __len__(self):
+        return len(self.keys)
+
+    def row(self, key):
+        return self.matrix[self.key_index[tuple(key)]]
+
+    def series(self, i):
+        # Same frame a groupby over the long data gives: only months with rows
+        values = self.matrix[i]
+        present = np.isfinite(values)
+        return pd.DataFrame({'YEAR_MONTH': self.months[present], 'TOTAL_COST': values[present]})
+
+def matrix_path(df, value='TOTAL_COST', cache_dir=CACHE_DIR):
+    from data_access import dataset_version
+    return os.path.join(cache_dir, f"series_{value.lower()}_{dataset_version(df)}")
+
+def write_series_matrix(df, value='TOTAL_COST', cache_dir=CACHE_DIR):
+    path = matrix_path(df, value, cache_dir)
+    if os.path.exists(path + '.npy') and os.path.exists(path + '.json'):
+        return path
+
+    matrix, keys, months = build_series_matrix(df, value)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Write under temporary names and rename, so a reader never maps a partial file
+    tmp = temp_path(path)
+    np.save(tmp + '.npy', np.ascontiguousarray(matrix, dtype=np.float64))
+    with open(tmp + '.json', 'w') as f:
+        json.dump({
+            'value': value,
+            'keys': [list(key) for key in keys],
+            'months': [month.strftime('%Y-%m-%d') for month in months]
+        }, f)
+    os.replace(tmp + '.json', path + '.json')
+    os.replace(tmp + '.npy', path + '.npy')
+    return path
+
+def attach(path):
+    store = _attached.get(path)
+    if store is None:
+        store = _attached[path] = SeriesMatrix(path)
+    return store
+
+def open_series_matrix(df, value='TOTAL_COST', cache_dir=CACHE_DIR):
+    return attach(write_series_matrix(df, value, cache_dir))
+
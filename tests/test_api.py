@@ -0,0 +1,52 @@
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from starlette.requests import Request
+
+import api
+
+def request(query=''):
+    return Request({'type': 'http', 'method': 'GET', 'path': '/api/test', 'query_string': query.encode(), 'headers': []})
+
+def test_dates_use_one_format():
+    df = pd.DataFrame({'YEAR_MONTH': pd.date_range('2024-01-01', periods=2, freq='MS'), 'TOTAL_COST': [1.0, np.nan]})
+    assert api.to_records(df) == [{'YEAR_MONTH': '2024-01-01', 'TOTAL_COST': 1.0}, {'YEAR_MONTH': '2024-02-01', 'TOTAL_COST': None}]
+
+@pytest.mark.parametrize('query, expected', [('', 5), ('periods=9', 9), ('periods=0', 1), ('periods=500', 24)])
+def test_int_param_clamps(query, expected):
+    assert api.int_param(request(query), 'periods', 5, 1, api.MAX_FORECAST_PERIODS) == expected
+
+@pytest.mark.parametrize('query', ['periods=abc', 'periods=1.5'])
+def test_int_param_rejects_non_integers(query):
+    with pytest.raises(ValueError):
+        api.int_param(request(query), 'periods', 5, 1, api.MAX_FORECAST_PERIODS)
+
+@pytest.mark.parametrize('query', ['alpha=x', 'alpha=0', 'alpha=1.5'])
+def test_alpha_param_rejects_bad_values(query):
+    with pytest.raises(ValueError):
+        api.alpha_param(request(query))
+
+class _State:
+    version = 'v1'
+
+    def __init__(self):
+        from result_cache import SingleFlightCache
+        self.responses = SingleFlightCache(max_entries=8)
+
+    def refresh(self):
+        pass
+
+@pytest.mark.parametrize('error, status', [(KeyError("Unknown series: X / Y"), 404), (ValueError("bad"), 400),
+                                           (api.PendingError("fitting"), 202)])
+def test_error_status_codes(monkeypatch, error, status):
+    monkeypatch.setattr(api, 'state', _State())
+
+    def compute(request):
+        raise error
+
+    response = asyncio.run(api.cached_endpoint(compute)(request()))
+    assert response.status_code == status
+    assert json.loads(response.body)
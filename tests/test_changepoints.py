@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from changepoints import binary_segmentation, current_regime
+
+N_MONTHS = 60
+
+def noisy(n_series, seed=0):
+    return np.random.default_rng(seed).normal(0, 1, (n_series, N_MONTHS))
+
+def test_level_shift_is_found_where_it_happens():
+    x = noisy(1)
+    x[0, 30:] += 8
+    breaks = binary_segmentation(x)
+
+    assert breaks[0].sum() == 1
+    assert abs(np.flatnonzero(breaks[0])[0] - 30) <= 1
+
+def test_steady_trend_is_not_a_break():
+    x = 100 + 3 * np.arange(N_MONTHS) + noisy(200)
+    assert binary_segmentation(x).any(axis=1).mean() < 0.1
+
+def test_late_start_is_not_a_break():
+    x = 100 + 0.5 * np.arange(N_MONTHS) + noisy(200)
+    starts = np.random.default_rng(1).integers(5, 30, len(x))
+    for row, start in zip(x, starts):
+        row[:start] = np.nan
+    breaks = binary_segmentation(x)
+
+    assert breaks.any(axis=1).mean() < 0.1
+    # A break never sits in the months before a series starts
+    assert not any(breaks[i, :start].any() for i, start in enumerate(starts))
+
+def test_level_shift_after_late_start_is_found():
+    x = noisy(1)
+    x[0, :20] = np.nan
+    x[0, 40:] += 8
+    breaks = binary_segmentation(x)
+
+    assert np.flatnonzero(breaks[0]).tolist() == [40]
+
+def test_short_series_has_no_breaks():
+    assert not binary_segmentation(noisy(3)[:, :20]).any()
+
+def test_current_regime_keeps_whole_series_when_too_short():
+    ts_data = pd.DataFrame({'YEAR_MONTH': pd.date_range('2020-01-01', periods=24, freq='MS'), 'TOTAL_COST': np.arange(24.0)})
+
+    assert len(current_regime(ts_data, pd.Timestamp('2021-01-01'))) == 12
+    assert len(current_regime(ts_data, pd.Timestamp('2021-06-01'))) == 24
+    assert len(current_regime(ts_data, None)) == 24
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_access import DatasetSnapshot, MonthIndex, PandasBackend
+
+MONTHS = pd.date_range('2023-01-01', periods=8, freq='MS')
+
+def make_df(seed=0):
+    rng = np.random.default_rng(seed)
+    rows = [
+        {'YEAR_MONTH': month, 'REGIONAL_OFFICE_NAME': region, 'BNF_CHAPTER_PLUS_CODE': category,
+         'TOTAL_COST': float(rng.integers(100, 1000)), 'ITEMS': float(rng.integers(1, 50))}
+        for month in MONTHS for region in ('NORTH', 'SOUTH') for category in ('01: A', '02: B', '03: C')
+    ]
+    return pd.DataFrame(rows)
+
+@pytest.fixture
+def backends(tmp_path):
+    duckdb_module = pytest.importorskip('duckdb')
+    from data_access import DuckDBBackend
+
+    df = make_df()
+    # Raw extracts keep the month as an integer and the quantity as TOTAL_QUANTITY
+    raw = df.assign(YEAR_MONTH=df['YEAR_MONTH'].dt.strftime('%Y%m').astype(int), TOTAL_QUANTITY=df['ITEMS'] * 3)
+    path = str(tmp_path / 'epd.parquet')
+    duckdb_module.from_df(raw).write_parquet(path)
+    return PandasBackend(df.assign(QUANTITY=df['ITEMS'] * 3)), DuckDBBackend(path)
+
+def test_backends_agree(backends):
+    pandas_backend, duckdb_backend = backends
+    start, end = MONTHS[2], MONTHS[5]
+
+    assert duckdb_backend.regions() == pandas_backend.regions()
+    assert duckdb_backend.categories('NORTH') == pandas_backend.categories('NORTH')
+    assert duckdb_backend.measures() == ['TOTAL_COST', 'ITEMS', 'QUANTITY']
+    pd.testing.assert_series_equal(duckdb_backend.region_totals(start, end), pandas_backend.region_totals(start, end), check_names=False)
+    pd.testing.assert_series_equal(duckdb_backend.category_totals('SOUTH', ['01: A', '03: C']),
+                                   pandas_backend.category_totals('SOUTH', ['01: A', '03: C']), check_names=False)
+    for method in ('monthly_totals', 'monthly_category_totals', 'monthly_measure_totals'):
+        pd.testing.assert_frame_equal(getattr(duckdb_backend, method)('NORTH', None, start, end),
+                                      getattr(pandas_backend, method)('NORTH', None, start, end), check_dtype=False)
+    pd.testing.assert_frame_equal(duckdb_backend.summary(start, end)[pandas_backend.summary().columns],
+                                  pandas_backend.summary(start, end), check_dtype=False)
+
+def test_empty_category_list_matches_nothing(backends):
+    pandas_backend, duckdb_backend = backends
+    assert len(duckdb_backend.monthly_totals(categories=[])) == len(pandas_backend.monthly_totals(categories=[])) == 0
+
+@pytest.mark.parametrize('start, end', [(None, None), (MONTHS[2], MONTHS[5]), ('2023-02-15', '2023-04-15'),
+                                        (None, MONTHS[0]), (MONTHS[-1], None), ('2024-01-01', None), (MONTHS[5], MONTHS[2])])
+def test_month_index_matches_a_boolean_filter(start, end):
+    df = make_df().sample(frac=1, random_state=1)
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df['YEAR_MONTH'] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df['YEAR_MONTH'] <= pd.Timestamp(end)
+    sliced = MonthIndex(df).slice(start, end)
+
+    assert sliced['YEAR_MONTH'].is_monotonic_increasing
+    pd.testing.assert_frame_equal(sliced.sort_index(), df[mask].sort_index())
+
+def test_snapshot_ignores_row_and_column_order():
+    df = make_df()
+    shuffled = df.sample(frac=1, random_state=2)[df.columns[::-1]].reset_index(drop=True)
+    assert DatasetSnapshot(df).version == DatasetSnapshot(shuffled).version
+
+def test_snapshot_reports_the_changed_month():
+    df = make_df()
+    edited = df.copy()
+    edited.loc[edited['YEAR_MONTH'] == MONTHS[3], 'TOTAL_COST'] += 1
+    appended = pd.concat([df, df[df['YEAR_MONTH'] == MONTHS[-1]].assign(YEAR_MONTH=MONTHS[-1] + pd.DateOffset(months=1))])
+    before = DatasetSnapshot(df)
+
+    assert DatasetSnapshot(edited).version != before.version
+    assert DatasetSnapshot(edited).changed_months(before) == [MONTHS[3].strftime('%Y-%m')]
+    assert DatasetSnapshot(appended).changed_months(before) == ['2023-09']
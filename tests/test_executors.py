@@ -0,0 +1,39 @@
+import pytest
+
+import executors
+from executors import get_executor
+
+def square(x):
+    return x * x
+
+@pytest.fixture
+def unset_kind(monkeypatch):
+    monkeypatch.setattr(executors, 'EXECUTOR_KIND', '')
+
+def test_light_work_runs_serially_by_default(unset_kind):
+    with get_executor(max_workers=4) as pool:
+        assert pool.name == 'serial'
+
+def test_cpu_bound_work_uses_processes_by_default(unset_kind):
+    with get_executor(max_workers=2, cpu_bound=True) as pool:
+        assert pool.name == 'processes'
+        assert pool.map(square, range(5)) == [0, 1, 4, 9, 16]
+
+def test_in_process_work_uses_threads(unset_kind):
+    with get_executor(max_workers=2, in_process=True, cpu_bound=True) as pool:
+        assert pool.name == 'threads'
+
+def test_configured_kind_applies_to_every_sweep(monkeypatch):
+    monkeypatch.setattr(executors, 'EXECUTOR_KIND', 'threads')
+    with get_executor(max_workers=2) as pool:
+        assert pool.name == 'threads'
+        assert sorted(pool.map_unordered(square, [3, 4])) == [(0, 9), (1, 16)]
+
+@pytest.mark.parametrize('kind', ['serial', 'threads', 'processes'])
+def test_backends_agree(kind):
+    with get_executor(kind, max_workers=2) as pool:
+        assert pool.map(square, range(10)) == [x * x for x in range(10)]
+
+def test_unknown_kind_is_rejected():
+    with pytest.raises(ValueError):
+        get_executor('gpu')
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import f_oneway, kruskal
+
+from utils import FAIRNESS_DIMENSIONS, add_cost_tier, calc_fairness_cube, calc_fairness_metrics
+
+def make_errors(n=240, seed=0):
+    rng = np.random.default_rng(seed)
+    mean_actual = rng.lognormal(8, 1, n)
+    return pd.DataFrame({
+        'REGIONAL_OFFICE_NAME': rng.choice(['NORTH', 'SOUTH', 'EAST', 'WEST'], n),
+        'BNF_CATEGORY': rng.choice(['01', '02', '03'], n),
+        'Mean_Actual': mean_actual,
+        # Rounded so the rank tests see ties
+        'MAE': np.round(mean_actual * rng.uniform(0.05, 0.15, n), -1),
+        'Bias': np.round(rng.normal(0, 50, n))
+    })
+
+def groups(df, dims, column):
+    return [group[column].values for _, group in df.groupby(list(dims), observed=True)]
+
+@pytest.mark.parametrize('dims', [('REGIONAL_OFFICE_NAME',), ('BNF_CATEGORY', 'COST_TIER'), tuple(FAIRNESS_DIMENSIONS)])
+def test_cube_tests_match_scipy(dims):
+    df = add_cost_tier(make_errors())
+    tests = calc_fairness_cube(df)[dims]['statistical_tests']
+
+    for column, f_key, kw_key in (('MAE', 'mae', 'mae'), ('Bias', 'bias', 'bias')):
+        f_stat, f_p = f_oneway(*groups(df, dims, column))
+        h_stat, h_p = kruskal(*groups(df, dims, column))
+        assert tests[f'f_stat_{f_key}'] == pytest.approx(f_stat)
+        assert tests[f'p_val_{f_key}'] == pytest.approx(f_p)
+        assert tests[f'kw_stat_{kw_key}'] == pytest.approx(h_stat)
+        assert tests[f'kw_p_{kw_key}'] == pytest.approx(h_p)
+
+def test_cube_cells_match_direct_groupby():
+    df = add_cost_tier(make_errors())
+    cells = calc_fairness_cube(df)[('REGIONAL_OFFICE_NAME', 'BNF_CATEGORY')]['parity_df'].set_index(['REGIONAL_OFFICE_NAME', 'BNF_CATEGORY'])
+    direct = df.groupby(['REGIONAL_OFFICE_NAME', 'BNF_CATEGORY'])
+
+    pd.testing.assert_series_equal(cells['Count'], direct.size(), check_names=False, check_dtype=False)
+    np.testing.assert_allclose(cells['MAE_Mean'], direct['MAE'].mean())
+    np.testing.assert_allclose(cells['Relative_Error_Rate'], direct['MAE'].sum() / direct['Mean_Actual'].sum())
+
+def test_cost_tiers_are_quartiles():
+    tiers = add_cost_tier(make_errors(n=100))['COST_TIER']
+    assert tiers.value_counts().tolist() == [25, 25, 25, 25]
+
+def test_regional_metrics_come_from_the_cube():
+    df = make_errors()
+    metrics = calc_fairness_metrics(df)
+    regional = calc_fairness_cube(df, dimensions=['REGIONAL_OFFICE_NAME'])[('REGIONAL_OFFICE_NAME',)]
+
+    assert list(metrics['parity_df']['Region']) == sorted(df['REGIONAL_OFFICE_NAME'].unique())
+    assert metrics['parity_gap'] == regional['parity_gap']
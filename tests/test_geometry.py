@@ -0,0 +1,79 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from geometry import (DETAIL_TOLERANCES, RegionGeometries, detail_for_zoom, douglas_peucker, simplify_ring,
+                      write_simplified, zoom_for_bounds)
+
+def circle(cx, cy, r, n=400):
+    ring = [[cx + r * math.cos(2 * math.pi * i / n), cy + r * math.sin(2 * math.pi * i / n)] for i in range(n)]
+    return ring + [ring[0]]
+
+def feature(name, ring, key='NHSER24NM'):
+    return {'type': 'Feature', 'properties': {key: name}, 'geometry': {'type': 'Polygon', 'coordinates': [ring]}}
+
+def chord_distances(line, simplified):
+    # Distance of every dropped point from the line through the kept points
+    # either side of it, the measure Douglas-Peucker bounds
+    kept = [int(np.flatnonzero((line == point).all(axis=1))[0]) for point in simplified]
+    distances = []
+    for first, last in zip(kept[:-1], kept[1:]):
+        start, chord = line[first], line[last] - line[first]
+        offsets = line[first + 1:last] - start
+        distances.extend(np.abs(chord[0] * offsets[:, 1] - chord[1] * offsets[:, 0]) / np.hypot(*chord))
+    return np.array(distances)
+
+def test_douglas_peucker_keeps_ends_and_drops_collinear_points():
+    line = np.column_stack([np.arange(10.0), np.zeros(10)])
+    np.testing.assert_array_equal(douglas_peucker(line, 0.01), line[[0, -1]])
+
+@pytest.mark.parametrize('tolerance', [0.001, 0.01, 0.1])
+def test_douglas_peucker_stays_within_tolerance(tolerance):
+    rng = np.random.default_rng(0)
+    line = np.column_stack([np.linspace(0, 1, 2000), np.cumsum(rng.normal(0, 0.01, 2000))])
+    simplified = douglas_peucker(line, tolerance)
+
+    assert len(simplified) < len(line)
+    assert chord_distances(line, simplified).max() <= tolerance
+
+def test_simplified_ring_stays_closed_and_collapses_when_tiny():
+    ring = simplify_ring(circle(0, 52, 1), 0.01)
+    np.testing.assert_array_equal(ring[0], ring[-1])
+    assert 4 <= len(ring) < 401
+    assert simplify_ring(circle(0, 52, 0.001), 0.02) is None
+
+def test_region_geometries_levels_and_bounds():
+    geojson = {'type': 'FeatureCollection', 'features': [feature('North West', circle(-2.5, 54, 1)), feature('London', circle(-0.1, 51.5, 0.2))]}
+    geometries = RegionGeometries(geojson)
+
+    assert geometries.regions == ['LONDON', 'NORTH WEST']
+    assert set(geometries.levels) == set(DETAIL_TOLERANCES)
+    sizes = [len(geometries.levels[level]['NORTH WEST']['coordinates'][0][0]) for level in DETAIL_TOLERANCES]
+    assert sizes == sorted(sizes)
+    np.testing.assert_allclose(geometries.bounds['LONDON'], (-0.3, 51.3, 0.1, 51.7), atol=1e-3)
+
+    # Only regions in view get the detailed level
+    collection = geometries.feature_collection(10, view=geometries.bounds['LONDON'])
+    by_id = {f['id']: f['geometry'] for f in collection['features']}
+    assert by_id['LONDON'] == geometries.levels['high']['LONDON']
+    assert by_id['NORTH WEST'] == geometries.levels['low']['NORTH WEST']
+
+def test_no_named_polygons_is_an_error():
+    with pytest.raises(ValueError):
+        RegionGeometries({'type': 'FeatureCollection', 'features': [feature('', circle(0, 52, 1))]})
+
+def test_detail_follows_zoom():
+    assert [detail_for_zoom(z) for z in (5.5, 7.5, 10)] == ['low', 'medium', 'high']
+    england = zoom_for_bounds((-6.4, 49.9, 1.8, 55.8))
+    london = zoom_for_bounds((-0.51, 51.28, 0.33, 51.69))
+    assert detail_for_zoom(england) == 'low' and detail_for_zoom(london) == 'high'
+
+def test_write_simplified_round_trips(tmp_path):
+    source, target = tmp_path / 'full.geojson', tmp_path / 'regions.geojson'
+    source.write_text(json.dumps({'type': 'FeatureCollection', 'features': [feature('North West', circle(-2.5, 54, 1, 5000))]}))
+
+    assert write_simplified(str(source), str(target)) == 1
+    assert target.stat().st_size < source.stat().st_size / 4
+    assert RegionGeometries(json.loads(target.read_text())).regions == ['NORTH WEST']
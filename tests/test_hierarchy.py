@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hierarchy import REMAINDER, build_hierarchy, hierarchical_forecast, reconcile
+from models import ModelRegistry
+
+MONTHS = pd.date_range('2022-01-01', periods=6, freq='MS')
+
+def make_df(categories=('A', 'B', 'C'), regions=('NORTH', 'SOUTH')):
+    rows = []
+    for r, region in enumerate(regions):
+        for c, category in enumerate(categories):
+            for m, month in enumerate(MONTHS):
+                rows.append({
+                    'REGIONAL_OFFICE_NAME': region,
+                    'BNF_CHAPTER_PLUS_CODE': category,
+                    'YEAR_MONTH': month,
+                    'TOTAL_COST': 100.0 * (r + 1) + 10.0 * c + m
+                })
+    return pd.DataFrame(rows)
+
+def incoherent_base(S, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(50, 150, (S.shape[0], 3))
+
+def test_summing_matrix():
+    hierarchy = build_hierarchy(make_df())
+    S, nodes = hierarchy['S'], hierarchy['nodes']
+
+    # Total, two regions, then six bottom series
+    assert S.shape == (9, 6)
+    assert nodes[0] == ('ALL',)
+    assert nodes[1:3] == [('NORTH', 'ALL'), ('SOUTH', 'ALL')]
+    assert nodes[3] == ('NORTH', 'A')
+    np.testing.assert_array_equal(S[0], np.ones(6))
+    np.testing.assert_array_equal(S[1], [1, 1, 1, 0, 0, 0])
+    np.testing.assert_array_equal(S[3:], np.eye(6))
+    np.testing.assert_allclose((S @ hierarchy['bottom'])[0], hierarchy['bottom'].sum(axis=0))
+
+@pytest.mark.parametrize('method', ['ols', 'wls', 'mint_shrink'])
+def test_reconciled_forecasts_are_coherent(method):
+    S = build_hierarchy(make_df())['S']
+    residuals = np.random.default_rng(1).standard_normal((24, S.shape[0]))
+    reconciled = reconcile(incoherent_base(S), S, method, residuals)
+
+    np.testing.assert_allclose(reconciled[0], reconciled[3:].sum(axis=0))
+    np.testing.assert_allclose(reconciled[1], reconciled[3:6].sum(axis=0))
+    np.testing.assert_allclose(reconciled[2], reconciled[6:].sum(axis=0))
+
+@pytest.mark.parametrize('method', ['ols', 'wls', 'mint_shrink'])
+def test_coherent_forecasts_are_unchanged(method):
+    S = build_hierarchy(make_df())['S']
+    residuals = np.random.default_rng(1).standard_normal((24, S.shape[0]))
+    coherent = S @ np.random.default_rng(2).uniform(10, 20, (S.shape[1], 3))
+
+    np.testing.assert_allclose(reconcile(coherent, S, method, residuals), coherent)
+
+def test_bottom_up_keeps_bottom_forecasts():
+    S = build_hierarchy(make_df())['S']
+    base = incoherent_base(S)
+    reconciled = reconcile(base, S, 'bottom_up')
+
+    np.testing.assert_array_equal(reconciled[3:], base[3:])
+    np.testing.assert_allclose(reconciled, S @ base[3:])
+
+def test_mint_needs_residuals():
+    S = build_hierarchy(make_df())['S']
+    with pytest.raises(ValueError):
+        reconcile(incoherent_base(S), S, 'mint_shrink')
+
+class _LastValueModel:
+    def __init__(self, ts_data):
+        self.last = ts_data['TOTAL_COST'].iloc[-1]
+        self.last_date = ts_data['YEAR_MONTH'].iloc[-1]
+        self.n_obs = len(ts_data)
+
+    def forecast(self, periods, alpha=0.05):
+        return pd.DataFrame({
+            'YEAR_MONTH': pd.date_range(self.last_date + pd.DateOffset(months=1), periods=periods, freq='MS'),
+            'FORECAST': np.full(periods, self.last),
+            'CONFIDENCE_LOWER': np.full(periods, self.last - 1),
+            'CONFIDENCE_UPPER': np.full(periods, self.last + 1)
+        })
+
+    def residuals(self):
+        return np.zeros(self.n_obs)
+
+def test_unselected_categories_are_fitted_as_one_remainder():
+    region_data = make_df(categories=('A', 'B', 'C', 'D'), regions=('NORTH',))
+    fitted = []
+
+    def get_model(key, ts_data):
+        fitted.append(key)
+        return _LastValueModel(ts_data)
+
+    forecasts = hierarchical_forecast(region_data, 2, get_model, method='ols', levels=('BNF_CHAPTER_PLUS_CODE',),
+                                      key_prefix=('NORTH',), categories=['A'])
+
+    assert sorted(fitted) == [('NORTH', 'A'), ('NORTH', 'ALL'), ('NORTH', REMAINDER)]
+    total = forecasts[forecasts['NODE'] == ('NORTH', 'ALL')]['FORECAST'].values
+    parts = forecasts[forecasts['LEVEL'] == 1].groupby('YEAR_MONTH')['FORECAST'].sum().values
+    np.testing.assert_allclose(total, parts)
+    # The region total still covers every category
+    assert total[0] == pytest.approx(region_data[region_data['YEAR_MONTH'] == MONTHS[-1]]['TOTAL_COST'].sum())
+
+def test_compact_registry_supplies_residuals():
+    rng = np.random.default_rng(3)
+    months = pd.date_range('2020-01-01', periods=30, freq='MS')
+    region_data = pd.DataFrame([
+        {'REGIONAL_OFFICE_NAME': 'NORTH', 'BNF_CHAPTER_PLUS_CODE': category, 'YEAR_MONTH': month,
+         'TOTAL_COST': 100.0 + 10 * c + m + rng.normal()}
+        for c, category in enumerate(('A', 'B')) for m, month in enumerate(months)
+    ])
+    registry = ModelRegistry(compact=True)
+
+    forecasts = hierarchical_forecast(region_data, 3, registry.get, method='mint_shrink',
+                                      levels=('BNF_CHAPTER_PLUS_CODE',), key_prefix=('NORTH',))
+
+    total = forecasts[forecasts['NODE'] == ('NORTH', 'ALL')]['FORECAST'].values
+    parts = forecasts[forecasts['LEVEL'] == 1].groupby('YEAR_MONTH')['FORECAST'].sum().values
+    np.testing.assert_allclose(total, parts)
+    assert np.isfinite(forecasts['FORECAST']).all()
+
+def test_bottom_up_aggregates_get_combined_intervals():
+    region_data = make_df(categories=('A', 'B', 'C', 'D'), regions=('NORTH',))
+    forecasts = hierarchical_forecast(region_data, 2, lambda key, ts_data: _LastValueModel(ts_data), method='bottom_up',
+                                      levels=('BNF_CHAPTER_PLUS_CODE',), key_prefix=('NORTH',))
+
+    total = forecasts[forecasts['NODE'] == ('NORTH', 'ALL')]
+    # Four independent bottom series, each +-1, give +-2 on the total
+    np.testing.assert_allclose(total['CONFIDENCE_UPPER'] - total['FORECAST'], 2.0)
+    np.testing.assert_allclose(total['FORECAST'] - total['CONFIDENCE_LOWER'], 2.0)
+    bottom = forecasts[forecasts['LEVEL'] == 1]
+    np.testing.assert_allclose(bottom['CONFIDENCE_UPPER'] - bottom['FORECAST'], 1.0)
+    assert total['BASE_FORECAST'].isna().all()
@@ -0,0 +1,39 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from model_selection import _shared_mae, load_selections, save_selections, selected_model
+from models import series_fingerprint
+
+def selections_frame(categories, model='ets'):
+    return pd.DataFrame({
+        'REGIONAL_OFFICE_NAME': 'NORTH',
+        'BNF_CHAPTER_PLUS_CODE': categories,
+        'MODEL': model,
+        'MAE': 1.0,
+        'FINGERPRINT': 'abc'
+    })
+
+def test_shared_mae_compares_common_origins_only():
+    scores = {'fast': {24: 1.0, 30: 5.0}, 'slow': {30: 4.0}}
+    assert _shared_mae(scores, ['fast', 'slow']) == {'fast': 5.0, 'slow': 4.0}
+
+def test_concurrent_saves_keep_every_entry(tmp_path):
+    path = str(tmp_path / 'selections.json')
+    threads = [threading.Thread(target=save_selections, args=(selections_frame([f'C{i}', f'D{i}']), path)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(load_selections(path)) == 32
+    assert [p.name for p in tmp_path.iterdir()] == ['selections.json']
+
+def test_selection_only_applies_to_the_same_data():
+    ts_data = pd.DataFrame({'YEAR_MONTH': pd.date_range('2020-01-01', periods=30, freq='MS'), 'TOTAL_COST': np.arange(30.0)})
+    selections = {'NORTH|A': {'model': 'ets', 'mae': 1.0, 'fingerprint': series_fingerprint(ts_data)}}
+
+    assert selected_model(selections, ('NORTH', 'A'), ts_data) == 'ets'
+    assert selected_model(selections, ('NORTH', 'A'), ts_data.assign(TOTAL_COST=ts_data['TOTAL_COST'] + 1)) is None
+    assert selected_model(selections, ('NORTH', 'B'), ts_data) is None
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+from statsmodels.tsa.arima.model import ARIMA
+
+from models import ARIMA_ORDERS, ArimaArtifact, FittedArima, ModelRegistry
+
+def make_series(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    months = pd.date_range('2020-01-01', periods=n, freq='MS')
+    values = 1000 + 5 * np.arange(n) + 50 * np.sin(np.arange(n) * 2 * np.pi / 12) + np.cumsum(rng.normal(0, 10, n))
+    return pd.DataFrame({'YEAR_MONTH': months, 'TOTAL_COST': values})
+
+def fitted(ts_data, order, seasonal_order=(0, 0, 0, 0)):
+    results = ARIMA(ts_data['TOTAL_COST'].reset_index(drop=True), order=order, seasonal_order=seasonal_order).fit()
+    return FittedArima(results, order, ts_data['YEAR_MONTH'].iloc[-1])
+
+def assert_same_forecast(a, b, rtol=1e-6):
+    for column in ('FORECAST', 'CONFIDENCE_LOWER', 'CONFIDENCE_UPPER'):
+        np.testing.assert_allclose(a[column], b[column], rtol=rtol)
+    assert (a['YEAR_MONTH'].values == b['YEAR_MONTH'].values).all()
+
+CASES = [(order, (0, 0, 0, 0)) for order in ARIMA_ORDERS] + [((1, 1, 1), (0, 1, 1, 12))]
+
+@pytest.mark.parametrize('order, seasonal_order', CASES)
+def test_artifact_forecasts_like_statsmodels(order, seasonal_order):
+    model = fitted(make_series(), order, seasonal_order)
+    artifact = ArimaArtifact.from_bytes(model.artifact().to_bytes())
+
+    assert_same_forecast(artifact.forecast(12, alpha=0.2), model.forecast(12, alpha=0.2))
+    np.testing.assert_allclose(artifact.residuals(), model.residuals())
+    assert artifact.aic == pytest.approx(model.aic)
+
+@pytest.mark.parametrize('order, seasonal_order', CASES)
+def test_artifact_updates_like_statsmodels(order, seasonal_order):
+    ts_data = make_series()
+    model = fitted(ts_data.iloc[:52], order, seasonal_order)
+    new_months = ts_data.iloc[52:]
+    updated_model = model.update(new_months)
+    updated_artifact = model.artifact().update(new_months)
+
+    assert_same_forecast(updated_artifact.forecast(6), updated_model.forecast(6))
+    np.testing.assert_allclose(updated_artifact.residuals(), updated_model.residuals(), rtol=1e-6, atol=1e-6)
+    np.testing.assert_allclose(updated_artifact.recent, updated_model.recent_errors(), rtol=1e-6)
+    assert updated_artifact.needs_refit() == updated_model.needs_refit()
+    assert updated_artifact.n_obs == updated_model.n_obs == len(ts_data)
+
+def test_compact_registry_stores_artifacts_and_extends_them():
+    ts_data = make_series()
+    registry = ModelRegistry(compact=True)
+    first = registry.get(('NORTH', 'A'), ts_data.iloc[:56])
+    extended = registry.get(('NORTH', 'A'), ts_data)
+
+    assert isinstance(first, ArimaArtifact) and isinstance(extended, ArimaArtifact)
+    # Four new months are filtered onto the stored state instead of refitting
+    assert extended.months_since_refit == 4
+    assert extended.last_date == ts_data['YEAR_MONTH'].iloc[-1]
+    assert registry.peek(('NORTH', 'A'), ts_data) is extended
@@ -0,0 +1,59 @@
+import numpy as np
+import plotly.graph_objects as go
+import pytest
+
+from rendering import lttb_indices, optimize_figure
+
+def reference_lttb(x, y, n_out):
+    # Plain per-bucket loop over the same buckets lttb_indices uses
+    n = len(y)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = [0]
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x, avg_y = np.mean(x[next_lo:next_hi]), np.mean(y[next_lo:next_hi])
+        a = selected[-1]
+        areas = [abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a])) for j in range(lo, hi)]
+        selected.append(lo + int(np.argmax(areas)))
+    return np.array(selected + [n - 1])
+
+@pytest.mark.parametrize('n, n_out', [(1000, 100), (5003, 1500), (50, 7)])
+def test_lttb_matches_reference(n, n_out):
+    rng = np.random.default_rng(n)
+    x = np.sort(rng.uniform(0, 100, n))
+    y = np.cumsum(rng.normal(size=n))
+    indices = lttb_indices(x, y, n_out)
+
+    np.testing.assert_array_equal(indices, reference_lttb(x, y, n_out))
+    assert len(indices) == n_out
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert (np.diff(indices) > 0).all()
+
+def test_lttb_keeps_spikes():
+    y = np.zeros(2000)
+    y[[321, 1555]] = [50, -40]
+    indices = lttb_indices(np.arange(2000.0), y, 100)
+    assert {321, 1555} <= set(indices)
+
+def test_short_series_are_left_alone():
+    np.testing.assert_array_equal(lttb_indices(np.arange(10.0), np.arange(10.0), 20), np.arange(10))
+
+def test_stacked_traces_stay_aligned():
+    x = np.arange(4000)
+    rng = np.random.default_rng(0)
+    fig = go.Figure([go.Scatter(x=x, y=rng.uniform(1, 2, 4000), stackgroup='one', customdata=x),
+                     go.Scatter(x=x, y=rng.uniform(1, 2, 4000), stackgroup='one')])
+    fig = optimize_figure(fig, max_points=500)
+
+    assert len(fig.data[0].x) == len(fig.data[1].x) == 500
+    np.testing.assert_array_equal(fig.data[0].x, fig.data[1].x)
+    np.testing.assert_array_equal(fig.data[0].customdata, fig.data[0].x)
+    # Stacked areas have no WebGL equivalent
+    assert all(trace.type == 'scatter' for trace in fig.data)
+
+def test_long_unstacked_traces_switch_to_webgl():
+    fig = go.Figure([go.Scatter(x=np.arange(3000), y=np.arange(3000.0)) for _ in range(3)])
+    fig = optimize_figure(fig, max_points=2000, webgl_points=5000)
+
+    assert all(trace.type == 'scattergl' and len(trace.x) == 2000 for trace in fig.data)
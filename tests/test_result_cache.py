@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from result_cache import SingleFlightCache
+
+def test_concurrent_callers_share_one_computation():
+    cache = SingleFlightCache()
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('key', compute))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    # Let every thread reach the cache before the leader finishes
+    while cache.misses + cache.waits < 8:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['value'] * 8
+    assert len(calls) == 1
+    assert (cache.misses, cache.waits) == (1, 7)
+    assert cache.get_or_compute('key', compute) == 'value' and cache.hits == 1
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    cache = SingleFlightCache()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("no fit")
+
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_compute('key', fail)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while cache.misses + cache.waits < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == ["no fit"] * 4
+    assert 'key' not in cache
+    assert cache.get_or_compute('key', lambda: 'retried') == 'retried'
+
+def test_least_recently_used_entries_are_evicted():
+    cache = SingleFlightCache(max_entries=2)
+    cache.get_or_compute('a', lambda: 1)
+    cache.get_or_compute('b', lambda: 2)
+    cache.get_or_compute('a', lambda: pytest.fail("a should be cached"))
+    cache.get_or_compute('c', lambda: 3)
+
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+    assert len(cache) == 2
+    assert cache.get('b', 'missing') == 'missing'
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scenarios import MAX_CORRELATION, ScenarioSimulator, Shock, common_correlation
+
+KEYS = [('NORTH', 'A'), ('NORTH', 'B'), ('SOUTH', 'A')]
+
+class _Forecaster:
+    # Flat forecasts of 1000 with a one-month 95% half-width of 100
+    def __init__(self, history):
+        self.keys = KEYS
+        self.history = history
+
+    def predict(self, forecast_periods, alpha):
+        mean = np.full((len(KEYS), forecast_periods), 1000.0)
+        return {
+            'dates': pd.date_range('2025-01-01', periods=forecast_periods, freq='MS'),
+            'mean': mean,
+            'lower': mean - 100 * np.sqrt(np.arange(1, forecast_periods + 1)),
+            'upper': mean + 100 * np.sqrt(np.arange(1, forecast_periods + 1))
+        }
+
+@pytest.fixture(scope='module')
+def simulator():
+    history = np.random.default_rng(0).normal(1, 0.1, (len(KEYS), 36))
+    return ScenarioSimulator(_Forecaster(history), forecast_periods=6, n_draws=4000)
+
+def test_baseline_paths_follow_the_forecast(simulator):
+    first_month = simulator.paths[:, :, 0]
+    np.testing.assert_allclose(first_month.mean(axis=0), 1000, rtol=0.01)
+    # Standard deviation is the one-month half-width over z
+    np.testing.assert_allclose(first_month.std(axis=0), 100 / 1.96, rtol=0.05)
+    np.testing.assert_allclose(simulator.paths[:, :, 3].std(axis=0), 2 * 100 / 1.96, rtol=0.05)
+
+def test_certain_shock_scales_only_its_series_from_its_month(simulator):
+    result = simulator.run([Shock(0.1, regions=['NORTH'], categories=['A'], start=3)])
+    baseline = simulator.run()
+
+    expected = baseline.series_totals.copy()
+    expected[:, 0] += 0.1 * simulator.paths[:, 0, 2:].sum(axis=1)
+    np.testing.assert_allclose(result.series_totals, expected, rtol=1e-5)
+    budgets = result.region_budgets().set_index('REGIONAL_OFFICE_NAME')
+    assert budgets.loc['SOUTH', 'Change'] == pytest.approx(0)
+    assert budgets.loc['NORTH', 'Change'] > 0
+
+def test_shorter_periods_use_the_same_paths(simulator):
+    short = simulator.run(periods=2)
+    np.testing.assert_allclose(short.series_totals, simulator.paths[:, :, :2].sum(axis=2))
+    assert list(short.dates) == list(simulator.dates[:2])
+    assert len(short.national_bands()) == 2
+
+def test_shock_draws_are_independent_and_stable(simulator):
+    draws = simulator.shock_draws(2)
+    assert abs(np.corrcoef(draws)[0, 1]) < 0.05
+    np.testing.assert_array_equal(simulator.shock_draws(3)[:2], draws)
+
+def test_common_correlation():
+    rng = np.random.default_rng(1)
+    shared = np.cumsum(rng.normal(size=60))
+    assert common_correlation(np.vstack([shared, shared * 2, shared + 5])) == MAX_CORRELATION
+    assert common_correlation(np.cumsum(rng.normal(size=(20, 400)), axis=1)) == pytest.approx(0, abs=0.02)
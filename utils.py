@@ -1,12 +1,14 @@
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from statsmodels.tsa.arima.model import ARIMA
-from sklearn.ensemble import IsolationForest
-from sklearn.cluster import KMeans, AgglomerativeClustering, DBSCAN
-from scipy.stats import f_oneway, kruskal
+from itertools import combinations
+import os
+import threading
+import uuid
 import warnings
+from models import fit_arima
+from global_model import GlobalForecaster
+from profiling import profiled
+from result_cache import SingleFlightCache
 warnings.filterwarnings('ignore')
 
 REGION_COORDINATES = {
@@ -23,13 +25,26 @@ REGION_COORDINATES = {
     'UNIDENTIFIED': {'lat': 52.3555, 'lon': -1.1743, 'size_multiplier': 0.5}
 }
 
+# EPD_MAP_MODE=auto draws region boundaries when a boundary file is available
+# and points on street tiles otherwise; offline never fetches tiles; tiles
+# always uses points on street tiles
+MAP_MODE = os.environ.get("EPD_MAP_MODE", "auto").lower()
+
 def load_data():
+    from data_access import CSV_SOURCE, MEASURES, get_backend, parquet_configured
+    
+    if parquet_configured():
+        # Aggregated to the month x region x BNF chapter grain inside DuckDB
+        return get_backend().summary(), "real"
+    
     try:
-        df = pd.read_csv("monthly_summary.csv")
+        df = pd.read_csv(CSV_SOURCE)
         df["YEAR_MONTH"] = pd.to_datetime(df["YEAR_MONTH"])
-        df["TOTAL_COST"] = pd.to_numeric(df["TOTAL_COST"], errors="coerce")
+        for measure in MEASURES:
+            if measure in df.columns:
+                df[measure] = pd.to_numeric(df[measure], errors="coerce")
         df = df.dropna(subset=['TOTAL_COST'])
-        return df, "real"
+        return df.sort_values('YEAR_MONTH', kind='stable').reset_index(drop=True), "real"
     except FileNotFoundError:
         return gen_sample_data(), "sample"
     except Exception:
@@ -83,47 +98,90 @@ def gen_sample_data():
                     'TOTAL_COST': cost
                 })
     
-    return pd.DataFrame(data)
+    df = pd.DataFrame(data)
+    
+    # The other measures follow cost through a per-chapter item price, a
+    # quantity per item and the dispensing discount; a separate generator
+    # leaves the cost series unchanged
+    rng = np.random.default_rng(7)
+    chapter = df['BNF_CHAPTER_PLUS_CODE'].map({code: i for i, code in enumerate(bnf_codes)}).values
+    item_price = rng.uniform(6, 40, len(bnf_codes))[chapter]
+    units_per_item = rng.uniform(20, 90, len(bnf_codes))[chapter]
+    df['ITEMS'] = np.round(df['TOTAL_COST'].values / item_price * rng.normal(1, 0.03, len(df)))
+    df['QUANTITY'] = np.round(df['ITEMS'].values * units_per_item * rng.normal(1, 0.05, len(df)))
+    df['NIC'] = df['TOTAL_COST'].values * rng.normal(1.08, 0.01, len(df))
+    df['ACTUAL_COST'] = df['NIC'].values * rng.normal(0.93, 0.005, len(df))
+    
+    return df.sort_values('YEAR_MONTH', kind='stable').reset_index(drop=True)
+
+SERIES_KEYS = ['REGIONAL_OFFICE_NAME', 'BNF_CHAPTER_PLUS_CODE']
+CACHE_DIR = os.environ.get("EPD_CACHE_DIR", ".epd_cache")
+
+_pred_error_cache = SingleFlightCache(max_entries=16)
+
+def temp_path(path):
+    # Where to write a cache file before renaming it into place. Sessions are
+    # threads of one process, so the name has to be unique per writer, not per pid.
+    return f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
 
 def train_arima(ts_data, forecast_periods=5):
-    if len(ts_data) < 3:
-        raise ValueError("Insufficient data for ARIMA modeling. Need at least 3 data points.")
-    
-    orders = [(1,1,1), (2,1,1), (1,0,1), (0,1,1), (1,1,0)]
-    best_model = None
-    best_aic = float('inf')
+    return fit_arima(ts_data).forecast(forecast_periods)
+
+def build_series_matrix(df, value='TOTAL_COST'):
+    pivot = df.pivot_table(index=SERIES_KEYS, columns='YEAR_MONTH', values=value, aggfunc='sum')
+    return pivot.values.astype(float), list(pivot.index), pivot.columns
+
+def build_measure_tensor(df, measures=None):
+    from data_access import measure_columns
     
-    for order in orders:
-        try:
-            model = ARIMA(ts_data['TOTAL_COST'], order=order)
-            fitted_model = model.fit()
-            if fitted_model.aic < best_aic:
-                best_aic = fitted_model.aic
-                best_model = fitted_model
-        except:
-            continue
+    # One groupby for every measure, shaped (series, measure, month); months a
+    # series has no rows for are NaN, as in build_series_matrix
+    measures = list(measures or measure_columns(df))
+    sums = df.groupby(SERIES_KEYS + ['YEAR_MONTH'])[measures].sum()
+    wide = sums.unstack('YEAR_MONTH')
+    months = wide.columns.get_level_values('YEAR_MONTH').unique().sort_values()
+    wide = wide.reindex(columns=pd.MultiIndex.from_product([measures, months]))
+    tensor = wide.values.astype(float).reshape(len(wide), len(measures), len(months))
+    return tensor, list(wide.index), months, measures
+
+def forecast_measures(df, forecast_periods=5, measures=None, alpha=0.05, model_type='gbm'):
+    # Every (series, measure) row goes through one global model fit and one
+    # batched predict per month. The fit samples as many training windows as a
+    # single measure has, so extra measures add predict rows, not fit time.
+    tensor, keys, months, measures = build_measure_tensor(df, measures)
+    n_series, n_measures, n_months = tensor.shape
+    row_keys = [key + (measure,) for key in keys for measure in measures]
+    forecaster = GlobalForecaster(model_type=model_type, max_train_rows=n_series * max(n_months - 12, 1))
+    forecaster.fit(tensor.reshape(-1, n_months), months, row_keys)
+    result = forecaster.predict(forecast_periods, alpha)
     
-    if best_model is None:
-        raise ValueError("All ARIMA models failed to converge. Cannot generate forecast.")
+    shape = (n_series, n_measures, forecast_periods)
+    return {
+        'keys': keys,
+        'measures': measures,
+        'dates': result['dates'],
+        'mean': result['mean'].reshape(shape),
+        'lower': result['lower'].reshape(shape),
+        'upper': result['upper'].reshape(shape)
+    }
+
+def train_global(df, holdout=0, model_type='gbm'):
+    matrix, keys, months = build_series_matrix(df)
+    train_end = len(months) - holdout
+    return GlobalForecaster(model_type=model_type).fit(matrix[:, :train_end], months[:train_end], keys)
+
+def region_geometries():
+    from geometry import load_region_geometries
     
-    forecast_result = best_model.get_forecast(steps=forecast_periods)
-    forecast = forecast_result.predicted_mean
-    conf_int = forecast_result.conf_int()
+    # None when the map should use region points instead of boundaries
+    return None if MAP_MODE == "tiles" else load_region_geometries()
+
+def create_map(df, selected_region=None, geometries=None, focus=False):
+    import plotly.express as px
     
-    forecast_dates = pd.date_range(
-        start=ts_data['YEAR_MONTH'].iloc[-1] + pd.DateOffset(months=1),
-        periods=forecast_periods,
-        freq='MS'
-    )
+    if geometries is not None:
+        return create_region_choropleth(df, geometries, selected_region, focus)
     
-    return pd.DataFrame({
-        'YEAR_MONTH': forecast_dates,
-        'FORECAST': forecast.values,
-        'CONFIDENCE_LOWER': conf_int.iloc[:, 0].values,
-        'CONFIDENCE_UPPER': conf_int.iloc[:, 1].values
-    })
-
-def create_map(df, selected_region=None):
     region_totals = df.groupby('REGIONAL_OFFICE_NAME')['TOTAL_COST'].sum()
     
     map_data = []
@@ -163,7 +221,7 @@ def create_map(df, selected_region=None):
         size_max=35,
         zoom=5.5,
         center={"lat": 54.0, "lon": -2.0},
-        mapbox_style="open-street-map",
+        mapbox_style="white-bg" if MAP_MODE == "offline" else "open-street-map",
         title="NHS Regional Prescription Costs"
     )
     
@@ -176,6 +234,62 @@ def create_map(df, selected_region=None):
     
     return fig
 
+def create_region_choropleth(df, geometries, selected_region=None, focus=False):
+    import plotly.graph_objects as go
+    from geometry import zoom_for_bounds
+    
+    # Drawn on a blank background, so nothing is fetched from a tile server.
+    # The zoom decides how simplified the boundaries sent to the browser are.
+    region_totals = df.groupby('REGIONAL_OFFICE_NAME')['TOTAL_COST'].sum()
+    ranks = region_totals.rank(ascending=False)
+    shown = [region for region in region_totals.index if region in geometries.bounds]
+    if not shown:
+        raise ValueError("None of the regions in the data appear in the region boundary file.")
+    
+    focused = focus and selected_region in geometries.bounds
+    view = geometries.region_bounds([selected_region] if focused else shown)
+    zoom = zoom_for_bounds(view)
+    regions_geojson = geometries.feature_collection(zoom, view if focused else None)
+    
+    fig = go.Figure(go.Choroplethmapbox(
+        geojson=regions_geojson,
+        locations=shown,
+        z=region_totals[shown].values,
+        customdata=ranks[shown].values,
+        colorscale='Teal',
+        marker_line_color='white',
+        marker_line_width=1,
+        colorbar=dict(title='Total Cost (£)'),
+        hovertemplate='<b>%{location}</b><br>Total Cost: £%{z:,.0f}<br>Rank: #%{customdata:.0f}<extra></extra>'
+    ))
+    if selected_region in shown:
+        selected_geojson = {'type': 'FeatureCollection', 'features': [
+            feature for feature in regions_geojson['features'] if feature['id'] == selected_region
+        ]}
+        fig.add_trace(go.Choroplethmapbox(
+            geojson=selected_geojson,
+            locations=[selected_region],
+            z=[0],
+            colorscale=[[0, 'rgba(0,0,0,0)'], [1, 'rgba(0,0,0,0)']],
+            showscale=False,
+            marker_line_color='#FF6B6B',
+            marker_line_width=3,
+            hoverinfo='skip'
+        ))
+    
+    fig.update_layout(
+        title="NHS Regional Prescription Costs",
+        mapbox=dict(
+            style="white-bg",
+            zoom=zoom,
+            center={"lat": (view[1] + view[3]) / 2, "lon": (view[0] + view[2]) / 2}
+        ),
+        height=500,
+        margin={"r":0,"t":50,"l":0,"b":0}
+    )
+    
+    return fig
+
 def gen_pred_errors(df):
     np.random.seed(42)
     
@@ -206,52 +320,133 @@ def gen_pred_errors(df):
     
     return pd.DataFrame(regional_data)
 
-def calc_fairness_metrics(df_errors):
-    cost_threshold = df_errors['Mean_Actual'].quantile(0.75)
+FAIRNESS_DIMENSIONS = ['REGIONAL_OFFICE_NAME', 'BNF_CATEGORY', 'COST_TIER']
+COST_TIERS = ['Q1', 'Q2', 'Q3', 'Q4']
+
+def add_cost_tier(df_errors):
+    df_errors = df_errors.copy()
+    n = len(df_errors)
+    if n == 0:
+        df_errors['COST_TIER'] = pd.Categorical([], categories=COST_TIERS)
+        return df_errors
+    ranks = df_errors['Mean_Actual'].rank(method='first').values
+    tier_idx = ((ranks - 1) * len(COST_TIERS) // n).astype(int)
+    df_errors['COST_TIER'] = pd.Categorical.from_codes(tier_idx, categories=COST_TIERS)
+    return df_errors
+
+def grouped_anova(n, s, sq):
+    from scipy.stats import f as f_dist
     
-    region_parity = []
-    for region in df_errors['REGIONAL_OFFICE_NAME'].unique():
-        region_data = df_errors[df_errors['REGIONAL_OFFICE_NAME'] == region]
-        high_cost_rate = (region_data['Mean_Actual'] >= cost_threshold).mean()
-        avg_prediction_error = region_data['MAE'].mean() / region_data['Mean_Actual'].mean()
-        
-        region_parity.append({
-            'Region': region,
-            'High_Cost_Rate': high_cost_rate,
-            'Relative_Error_Rate': avg_prediction_error,
-            'MAE_Mean': region_data['MAE'].mean(),
-            'Bias_Mean': region_data['Bias'].mean()
-        })
+    n, s, sq = np.asarray(n, float), np.asarray(s, float), np.asarray(sq, float)
+    total_n, k = n.sum(), len(n)
+    if k < 2 or total_n <= k:
+        return 0, 1
+    correction = s.sum() ** 2 / total_n
+    ss_between = (s ** 2 / n).sum() - correction
+    ss_within = sq.sum() - correction - ss_between
+    if ss_within <= 0:
+        return 0, 1
+    f_stat = (ss_between / (k - 1)) / (ss_within / (total_n - k))
+    return f_stat, f_dist.sf(f_stat, k - 1, total_n - k)
+
+def grouped_kruskal(n, rank_sum, tie_correction):
+    from scipy.stats import chi2
     
-    parity_df = pd.DataFrame(region_parity)
-    parity_gap = parity_df['Relative_Error_Rate'].max() - parity_df['Relative_Error_Rate'].min()
+    n, rank_sum = np.asarray(n, float), np.asarray(rank_sum, float)
+    total_n, k = n.sum(), len(n)
+    if k < 2 or tie_correction <= 0:
+        return 0, 1
+    h_stat = 12.0 / (total_n * (total_n + 1)) * (rank_sum ** 2 / n).sum() - 3 * (total_n + 1)
+    h_stat /= tie_correction
+    return h_stat, chi2.sf(h_stat, k - 1)
+
+def _tie_correction(values):
+    _, counts = np.unique(values, return_counts=True)
+    n = len(values)
+    return 1 - ((counts ** 3 - counts).sum() / (n ** 3 - n)) if n > 1 else 0
+
+def calc_fairness_cube(df_errors, dimensions=FAIRNESS_DIMENSIONS):
+    from scipy.stats import rankdata
     
-    regional_mae_groups = [group['MAE'].values for name, group in df_errors.groupby('REGIONAL_OFFICE_NAME')]
-    regional_bias_groups = [group['Bias'].values for name, group in df_errors.groupby('REGIONAL_OFFICE_NAME')]
+    df_errors = add_cost_tier(df_errors) if 'COST_TIER' not in df_errors.columns else df_errors
+    df_errors = df_errors.dropna(subset=['MAE', 'Bias', 'Mean_Actual'])
+    if df_errors.empty:
+        return {}
     
-    try:
-        f_stat_bias, p_val_bias = f_oneway(*regional_bias_groups)
-        kw_stat_mae, kw_p_mae = kruskal(*regional_mae_groups)
-        kw_stat_bias, kw_p_bias = kruskal(*regional_bias_groups)
-    except:
-        f_stat_bias, p_val_bias = 0, 1
-        kw_stat_mae, kw_p_mae = 0, 1
-        kw_stat_bias, kw_p_bias = 0, 1
+    cost_threshold = df_errors['Mean_Actual'].quantile(0.75)
+    stats = pd.DataFrame({
+        'Count': 1,
+        'High_Cost': (df_errors['Mean_Actual'] >= cost_threshold).astype(int),
+        'Actual_Sum': df_errors['Mean_Actual'],
+        'MAE_Sum': df_errors['MAE'],
+        'MAE_Sq': df_errors['MAE'] ** 2,
+        'MAE_Rank': rankdata(df_errors['MAE']),
+        'Bias_Sum': df_errors['Bias'],
+        'Bias_Sq': df_errors['Bias'] ** 2,
+        'Bias_Rank': rankdata(df_errors['Bias'])
+    }, index=df_errors.index)
+    for dim in dimensions:
+        stats[dim] = df_errors[dim].astype(str)
+    
+    # Single pass over the error frame; every coarser cell is a sum of finest cells
+    finest = stats.groupby(list(dimensions), observed=True).sum().reset_index()
+    mae_ties = _tie_correction(df_errors['MAE'].values)
+    bias_ties = _tie_correction(df_errors['Bias'].values)
+    
+    cube = {}
+    for size in range(1, len(dimensions) + 1):
+        for dims in combinations(dimensions, size):
+            cells = finest.groupby(list(dims)).sum(numeric_only=True).reset_index()
+            cells['High_Cost_Rate'] = cells['High_Cost'] / cells['Count']
+            cells['Relative_Error_Rate'] = cells['MAE_Sum'] / cells['Actual_Sum']
+            cells['MAE_Mean'] = cells['MAE_Sum'] / cells['Count']
+            cells['Bias_Mean'] = cells['Bias_Sum'] / cells['Count']
+            
+            f_stat_bias, p_val_bias = grouped_anova(cells['Count'], cells['Bias_Sum'], cells['Bias_Sq'])
+            f_stat_mae, p_val_mae = grouped_anova(cells['Count'], cells['MAE_Sum'], cells['MAE_Sq'])
+            kw_stat_mae, kw_p_mae = grouped_kruskal(cells['Count'], cells['MAE_Rank'], mae_ties)
+            kw_stat_bias, kw_p_bias = grouped_kruskal(cells['Count'], cells['Bias_Rank'], bias_ties)
+            
+            cube[dims] = {
+                'parity_df': cells[list(dims) + ['Count', 'High_Cost_Rate', 'Relative_Error_Rate', 'MAE_Mean', 'Bias_Mean']],
+                'parity_gap': cells['Relative_Error_Rate'].max() - cells['Relative_Error_Rate'].min(),
+                'statistical_tests': {
+                    'f_stat_bias': f_stat_bias,
+                    'p_val_bias': p_val_bias,
+                    'f_stat_mae': f_stat_mae,
+                    'p_val_mae': p_val_mae,
+                    'kw_stat_mae': kw_stat_mae,
+                    'kw_p_mae': kw_p_mae,
+                    'kw_stat_bias': kw_stat_bias,
+                    'kw_p_bias': kw_p_bias
+                }
+            }
+    
+    return cube
+
+def calc_fairness_metrics(df_errors):
+    cube = calc_fairness_cube(df_errors, dimensions=['REGIONAL_OFFICE_NAME'])
+    regional = cube[('REGIONAL_OFFICE_NAME',)]
+    parity_df = regional['parity_df'].rename(columns={'REGIONAL_OFFICE_NAME': 'Region'})
+    tests = regional['statistical_tests']
     
     return {
-        'parity_df': parity_df,
-        'parity_gap': parity_gap,
+        'parity_df': parity_df[['Region', 'High_Cost_Rate', 'Relative_Error_Rate', 'MAE_Mean', 'Bias_Mean']],
+        'parity_gap': regional['parity_gap'],
         'statistical_tests': {
-            'f_stat_bias': f_stat_bias,
-            'p_val_bias': p_val_bias,
-            'kw_stat_mae': kw_stat_mae,
-            'kw_p_mae': kw_p_mae,
-            'kw_stat_bias': kw_stat_bias,
-            'kw_p_bias': kw_p_bias
+            'f_stat_bias': tests['f_stat_bias'],
+            'p_val_bias': tests['p_val_bias'],
+            'kw_stat_mae': tests['kw_stat_mae'],
+            'kw_p_mae': tests['kw_p_mae'],
+            'kw_stat_bias': tests['kw_stat_bias'],
+            'kw_p_bias': tests['kw_p_bias']
         }
     }
 
+@profiled
 def detect_outliers(df, method, threshold, contamination, analysis_type):
+    from sklearn.ensemble import IsolationForest
+    
     if analysis_type == 'temporal':
         monthly_data = df.groupby('YEAR_MONTH')['TOTAL_COST'].sum()
         outlier_months = set()
@@ -357,6 +552,8 @@ def detect_outliers(df, method, threshold, contamination, analysis_type):
             return pd.DataFrame()
 
 def apply_clustering(X_scaled, algorithm, n_clusters):
+    from sklearn.cluster import KMeans, AgglomerativeClustering, DBSCAN
+    
     if algorithm == "K-Means":
         clusterer = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
     elif algorithm == "Hierarchical":
@@ -367,34 +564,208 @@ def apply_clustering(X_scaled, algorithm, n_clusters):
     cluster_labels = clusterer.fit_predict(X_scaled)
     return cluster_labels.astype(str)
 
-def gen_real_pred_errors(df, test_periods=6):
+def _backtest_rows(task):
+    from series_store import attach
+    
+    path, rows, test_periods = task
+    store = attach(path)
     errors = []
-    for region in df['REGIONAL_OFFICE_NAME'].unique():
-        region_data = df[df['REGIONAL_OFFICE_NAME'] == region]
-        for bnf_code in region_data['BNF_CHAPTER_PLUS_CODE'].unique():
-            bnf_data = region_data[region_data['BNF_CHAPTER_PLUS_CODE'] == bnf_code]
-            ts_data = bnf_data.groupby('YEAR_MONTH')['TOTAL_COST'].sum().reset_index()
-            if len(ts_data) < test_periods + 3:
-                continue  
-            train = ts_data.iloc[:-test_periods]
-            test = ts_data.iloc[-test_periods:]
-            try:
-                forecast_df = train_arima(train, test_periods)
-                if len(forecast_df) != len(test):
-                    continue
-                y_true = test['TOTAL_COST'].values
-                y_pred = forecast_df['FORECAST'].values
-                mae = np.mean(np.abs(y_true - y_pred))
-                bias = np.mean(y_pred - y_true)
-                mape = np.mean(np.abs((y_true - y_pred) / y_true)) * 100 if np.all(y_true != 0) else np.nan
-                errors.append({
-                    'REGIONAL_OFFICE_NAME': region,
-                    'BNF_CATEGORY': bnf_code.split(':')[0].strip(),
-                    'Mean_Actual': np.mean(y_true),
-                    'MAE': mae,
-                    'Bias': bias,
-                    'MAPE': mape
-                })
-            except Exception:
+    for i in rows:
+        region, bnf_code = store.keys[i]
+        ts_data = store.series(i)
+        if len(ts_data) < test_periods + 3:
+            continue  
+        train = ts_data.iloc[:-test_periods]
+        test = ts_data.iloc[-test_periods:]
+        try:
+            forecast_df = train_arima(train, test_periods)
+            if len(forecast_df) != len(test):
                 continue
-    return pd.DataFrame(errors)
\ No newline at end of file
+            y_true = test['TOTAL_COST'].values
+            y_pred = forecast_df['FORECAST'].values
+            mae = np.mean(np.abs(y_true - y_pred))
+            bias = np.mean(y_pred - y_true)
+            mape = np.mean(np.abs((y_true - y_pred) / y_true)) * 100 if np.all(y_true != 0) else np.nan
+            errors.append({
+                'REGIONAL_OFFICE_NAME': region,
+                'BNF_CATEGORY': bnf_code.split(':')[0].strip(),
+                'Mean_Actual': np.mean(y_true),
+                'MAE': mae,
+                'Bias': bias,
+                'MAPE': mape
+            })
+        except Exception:
+            continue
+    return errors
+
+# Series per worker task; small enough that progress arrives every few seconds
+BACKTEST_CHUNK = 8
+
+def iter_pred_errors(df, test_periods=6, max_workers=None, chunk_size=BACKTEST_CHUNK, executor=None):
+    from executors import get_executor
+    from series_store import attach, write_series_matrix
+    
+    # Workers map the shared matrix file instead of receiving pickled frames
+    path = write_series_matrix(df)
+    n_series = len(attach(path))
+    chunks = [(path, range(start, min(start + chunk_size, n_series)), test_periods) for start in range(0, n_series, chunk_size)]
+    completed = 0
+    
+    # Yields (chunk index, error rows, series done, series total) as each chunk finishes
+    with get_executor(executor, max_workers, cpu_bound=True) as pool:
+        for i, errors in pool.map_unordered(_backtest_rows, chunks):
+            completed += len(chunks[i][1])
+            yield i, errors, completed, n_series
+
+@profiled
+def gen_real_pred_errors(df, test_periods=6, engine='arima', max_workers=None, on_progress=None, executor=None):
+    if engine == 'global':
+        return gen_global_pred_errors(df, test_periods)
+    
+    results = {}
+    for i, errors, completed, total in iter_pred_errors(df, test_periods, max_workers, executor=executor):
+        results[i] = errors
+        if on_progress is not None:
+            # Only the chunk that just finished, so listeners can add it to what they have
+            on_progress(errors, completed, total)
+    # Chunks finish out of order; the result keeps series order
+    return pd.DataFrame([row for i in sorted(results) for row in results[i]])
+
+class SweepProgress:
+    # Published by the thread running a prediction-error sweep and polled by
+    # any number of sessions. Regional sums are kept as chunks arrive, so a
+    # reader's snapshot costs the same however far the sweep has got.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._done.set()
+        self.running = False
+        self.error = None
+        self.completed = 0
+        self.total = 0
+        self._regions = {}
+
+    def start(self):
+        with self._lock:
+            self.running = True
+            self.error = None
+            self.completed = 0
+            self.total = 0
+            self._regions = {}
+            self._done.clear()
+
+    def add(self, rows, completed, total):
+        with self._lock:
+            for row in rows:
+                stats = self._regions.setdefault(row['REGIONAL_OFFICE_NAME'], [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += row['MAE']
+                stats[2] += row['Bias']
+            self.completed = completed
+            self.total = total
+
+    def finish(self, error=None):
+        with self._lock:
+            self.running = False
+            self.error = error
+            self._done.set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def regional_summary(self):
+        # One row per region with its mean MAE and Bias so far, and the number
+        # of series behind them
+        with self._lock:
+            summary = pd.DataFrame([
+                {'REGIONAL_OFFICE_NAME': region, 'MAE': mae / n, 'Bias': bias / n}
+                for region, (n, mae, bias) in self._regions.items()
+            ], columns=['REGIONAL_OFFICE_NAME', 'MAE', 'Bias'])
+            return summary, sum(stats[0] for stats in self._regions.values())
+
+def _pred_errors_path(version, test_periods, engine):
+    return os.path.join(CACHE_DIR, f"pred_errors_{engine}_{test_periods}_{version}.pkl")
+
+def pred_errors_ready(df, test_periods=6, engine='arima'):
+    from data_access import dataset_version
+    
+    version = dataset_version(df)
+    return (version, test_periods, engine) in _pred_error_cache or os.path.exists(_pred_errors_path(version, test_periods, engine))
+
+_sweep_lock = threading.Lock()
+_sweeps = {}
+
+def sweep_progress(df, test_periods=6, engine='arima'):
+    from data_access import dataset_version
+    
+    key = (dataset_version(df), test_periods, engine)
+    with _sweep_lock:
+        return _sweeps.setdefault(key, SweepProgress())
+
+def shared_pred_errors(df, test_periods=6, engine='arima'):
+    from data_access import dataset_version
+    
+    # Every caller in the process shares one sweep per dataset version, and the
+    # result is kept on disk so a restart over the same data skips it. Progress
+    # goes to a shared SweepProgress rather than to any caller, so nothing a
+    # session does while waiting can interrupt the sweep for the others.
+    version = dataset_version(df)
+    path = _pred_errors_path(version, test_periods, engine)
+    progress = sweep_progress(df, test_periods, engine)
+
+    def compute():
+        if os.path.exists(path):
+            return pd.read_pickle(path)
+        errors = gen_real_pred_errors(df, test_periods, engine, on_progress=progress.add)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = temp_path(path)
+        errors.to_pickle(tmp)
+        os.replace(tmp, path)
+        return errors
+    
+    return _pred_error_cache.get_or_compute((version, test_periods, engine), compute).copy()
+
+def start_pred_errors(df, test_periods=6, engine='arima'):
+    # Runs the shared sweep on its own thread and returns its progress for the
+    # caller to poll; a sweep that is already running is not started twice
+    progress = sweep_progress(df, test_periods, engine)
+    with _sweep_lock:
+        if progress.running:
+            return progress
+        progress.start()
+
+    def run():
+        try:
+            shared_pred_errors(df, test_periods, engine)
+        except Exception as e:
+            progress.finish(e)
+        else:
+            progress.finish()
+    
+    threading.Thread(target=run, name="epd-pred-errors", daemon=True).start()
+    return progress
+
+def gen_global_pred_errors(df, test_periods=6):
+    matrix, keys, months = build_series_matrix(df)
+    if len(months) < test_periods + 13:
+        return pd.DataFrame()
+    
+    forecaster = train_global(df, holdout=test_periods)
+    y_pred = forecaster.predict(test_periods)['mean']
+    y_true = matrix[:, -test_periods:]
+    
+    # Same eligibility as the ARIMA sweep: enough history and a complete test window
+    history_length = np.isfinite(matrix).sum(axis=1)
+    valid = (history_length >= test_periods + 3) & np.isfinite(y_true).all(axis=1)
+    errors = y_pred - y_true
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mape = np.where((y_true != 0).all(axis=1), np.mean(np.abs(errors / y_true), axis=1) * 100, np.nan)
+    
+    return pd.DataFrame({
+        'REGIONAL_OFFICE_NAME': [key[0] for key in keys],
+        'BNF_CATEGORY': [key[1].split(':')[0].strip() for key in keys],
+        'Mean_Actual': y_true.mean(axis=1),
+        'MAE': np.abs(errors).mean(axis=1),
+        'Bias': errors.mean(axis=1),
+        'MAPE': mape
+    })[valid].reset_index(drop=True)
\ No newline at end of file